@@ -1,6 +1,13 @@
 from flask import Flask
 from flask_login import LoginManager
 from models import db, User, Attraction
+from utils import migrations
+from utils.content_version import content_versions
+from utils.email_sender import mailer
+from utils.image_proxy import image_proxy
+from utils.page_cache import page_cache
+from utils.uploads import image_pipeline
+from utils.view_buffer import view_buffer
 import json
 import os
 from datetime import datetime
@@ -12,10 +19,108 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'mp4'}
 
+# Responsive variants of uploaded images (see utils/uploads.py); needs Pillow
+app.config['IMAGE_VARIANT_WIDTHS'] = (320, 640, 1024, 1600)
+app.config['IMAGE_WEBP_QUALITY'] = 80
+app.config['IMAGE_JPEG_QUALITY'] = 82
+app.config['UPLOAD_WORKERS'] = 2                # Image processing threads per process
+app.config['UPLOAD_PROCESS_ASYNC'] = os.environ.get('UPLOAD_PROCESS_ASYNC', '1') != '0'
+
+# Resumable gallery uploads (tus protocol, see routes/uploads.py); partial files go to instance/upload_sessions
+app.config['UPLOAD_MAX_BYTES'] = 512 * 1024 * 1024
+app.config['UPLOAD_MAX_CONCURRENT_PER_USER'] = 3
+app.config['UPLOAD_SESSION_EXPIRY_HOURS'] = 24  # Idle uploads are discarded after this
+app.config['UPLOAD_CHUNK_BYTES'] = 4 * 1024 * 1024  # Chunk size used by the browser client
+
+# Local cache of external images (see utils/image_proxy.py); URLs on other hosts are linked directly
+app.config['IMAGE_PROXY_ENABLED'] = os.environ.get('IMAGE_PROXY_ENABLED', '1') != '0'
+app.config['IMAGE_PROXY_HOSTS'] = ('placehold.co', 'mangatarem.gov.ph', 'images.unsplash.com', 'via.placeholder.com')
+app.config['IMAGE_PROXY_CACHE_BYTES'] = 256 * 1024 * 1024  # Least recently used files are evicted past this
+app.config['IMAGE_PROXY_MAX_SOURCE_BYTES'] = 20 * 1024 * 1024
+app.config['IMAGE_PROXY_TIMEOUT'] = 10           # Seconds to wait for the remote server
+app.config['IMAGE_PROXY_ERROR_TTL'] = 300        # Failed fetches redirect to the original for this long
+
+# Gallery video processing (see utils/media_jobs.py, run with 'flask media-worker').
+# Without ffmpeg installed, "python utils/ffmpeg_stub.py" stands in for both binaries.
+app.config['FFMPEG_BINARY'] = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+app.config['FFPROBE_BINARY'] = os.environ.get('FFPROBE_BINARY', 'ffprobe')
+app.config['MEDIA_RENDITION_HEIGHT'] = 720       # Streaming rendition is scaled down to this height
+app.config['MEDIA_RENDITION_CRF'] = 28           # x264 quality; higher means smaller files
+app.config['MEDIA_JOB_MAX_ATTEMPTS'] = 3
+app.config['MEDIA_JOB_RETRY_SECONDS'] = 60       # Doubles after each failed attempt
+app.config['MEDIA_JOB_TIMEOUT_SECONDS'] = 1800   # Running jobs older than this are re-queued
+app.config['MEDIA_WORKER_POLL_SECONDS'] = 5
+
+# Outbound email queue (see utils/email_sender.py); sent by a background thread or `flask send-mail`
+app.config['MAIL_SERVER'] = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
+app.config['MAIL_PORT'] = int(os.environ.get('SMTP_PORT', 587))
+app.config['MAIL_USE_TLS'] = os.environ.get('SMTP_STARTTLS', '1') != '0'
+app.config['MAIL_USERNAME'] = os.environ.get('SMTP_EMAIL')
+app.config['MAIL_PASSWORD'] = os.environ.get('SMTP_PASSWORD')
+app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_FROM')  # Defaults to SMTP_EMAIL
+app.config['MAIL_SENDER_ENABLED'] = os.environ.get('MAIL_SENDER_ENABLED', '1') != '0'
+app.config['MAIL_BATCH_SIZE'] = 50              # Messages sent over one SMTP connection
+app.config['MAIL_RATE_PER_MINUTE'] = 30         # Per process; keeps us under the provider's limits
+app.config['MAIL_MAX_ATTEMPTS'] = 6
+app.config['MAIL_RETRY_SECONDS'] = 60           # Doubles after each failed attempt
+app.config['MAIL_POLL_SECONDS'] = 30            # How often the sender looks for due retries
+
+# Admin and contributor listing pages (see utils/pagination.py)
+app.config['LIST_PAGE_SIZE'] = 25
+app.config['LIST_PENDING_PREVIEW'] = 10         # Pending items shown above a list; the rest are in the moderation queue
+
+# Page view buffering (see utils/view_buffer.py)
+app.config['VIEW_BUFFER_ENABLED'] = os.environ.get('VIEW_BUFFER_ENABLED', '1') != '0'
+app.config['VIEW_BUFFER_SIZE'] = 10000          # Max queued views before new ones are dropped
+app.config['VIEW_BUFFER_BATCH_SIZE'] = 200      # Flush as soon as this many views are queued
+app.config['VIEW_BUFFER_FLUSH_MS'] = 2000       # ...or at least this often
+app.config['PAGEVIEW_RETENTION_DAYS'] = 90      # Raw views older than this are compacted by `flask compact-views`
+
+# Pre-rendered attraction tiles (see utils/tiles.py), written to static/tiles/attractions
+app.config['TILE_MIN_ZOOM'] = 10
+app.config['TILE_MAX_ZOOM'] = 16
+app.config['TILE_PRUNE_GRACE_SECONDS'] = 86400  # Superseded hashed tiles stay this long for clients holding an old manifest
+
+# Rendered public page cache (see utils/page_cache.py)
+app.config['PAGE_CACHE_ENABLED'] = os.environ.get('PAGE_CACHE_ENABLED', '1') != '0'
+app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'memory')  # 'memory', 'filesystem' or 'redis'
+app.config['PAGE_CACHE_REDIS_URL'] = os.environ.get('PAGE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+app.config['PAGE_CACHE_TTL'] = 300              # Seconds; content changes invalidate sooner
+app.config['PAGE_CACHE_MAX_ENTRIES'] = 512
+app.config['PAGE_CACHE_MAX_BYTES'] = 64 * 1024 * 1024  # Memory and filesystem backends
+
+# sitemap.xml becomes an index of per-type sitemaps above this many URLs (see utils/sitemap.py)
+app.config['SITEMAP_SPLIT_THRESHOLD'] = 1000
+app.config['SITEMAP_MAX_URLS'] = 50000
+
+# Static export of the public site (`flask export-static`, see utils/static_export.py)
+app.config['SITE_URL'] = os.environ.get('SITE_URL')  # e.g. https://example.org; canonical URLs of exported pages
+
 # Initialize database
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    # create_all() never alters existing tables; indexes and columns added
+    # later are applied by the migrations in utils/migrations.py
+    migrations.upgrade()
+
+# Initialize page view buffer
+view_buffer.init_app(app)
+
+# Initialize outbound email queue
+mailer.init_app(app)
+
+# Track content versions for cache invalidation
+content_versions.init_app(app)
+
+# Initialize rendered page cache
+page_cache.init_app(app)
+
+# Initialize uploaded image processing
+image_pipeline.init_app(app)
+
+# Initialize external image proxy
+image_proxy.init_app(app)
 
 # Initialize login manager
 login_manager = LoginManager()
@@ -69,6 +174,10 @@ def seed_database():
 from routes import register_blueprints
 register_blueprints(app)
 
+# Register maintenance CLI commands
+from utils.commands import register_commands
+register_commands(app)
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
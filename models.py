@@ -13,6 +13,12 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(20), default='contributor') # 'admin' or 'contributor'
     barangay = db.Column(db.String(100), nullable=True)
     is_approved = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow) # Registration time (NULL for accounts created before it was tracked)
+
+    __table_args__ = (
+        db.Index('ix_user_barangay_role', 'barangay', 'role', 'is_approved'),
+        db.Index('ix_user_role_approved_created', 'role', 'is_approved', 'created_at'),
+    )
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -33,6 +39,13 @@ class Attraction(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_attraction_status_barangay', 'status', 'barangay'),
+        db.Index('ix_attraction_status_created', 'status', 'created_at'),
+        db.Index('ix_attraction_user_created', 'user_id', 'created_at'),
+        db.Index('ix_attraction_created', 'created_at'),
+    )
+
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -46,6 +59,14 @@ class Event(db.Model):
     category = db.Column(db.String(50), nullable=False, default='Civic')  # 'Religious', 'Civic', 'Entertainment'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_event_status_date', 'status', 'date'),
+        db.Index('ix_event_barangay_status_date', 'barangay', 'status', 'date'),
+        db.Index('ix_event_user_date', 'user_id', 'date'),
+        db.Index('ix_event_status_created', 'status', 'created_at'),
+        db.Index('ix_event_date', 'date'),
+    )
+
 class GalleryItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(20), nullable=False) # 'photo' or 'video'
@@ -54,6 +75,17 @@ class GalleryItem(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     status = db.Column(db.String(20), default='pending') # 'pending', 'approved'
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Filled in by the media worker for uploaded videos (see utils/media_jobs.py)
+    poster_url = db.Column(db.String(200), nullable=True) # Still frame shown until the video is played
+    rendition_url = db.Column(db.String(200), nullable=True) # Lower-bitrate MP4 served instead of the original
+    duration = db.Column(db.Float, nullable=True) # Seconds
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_gallery_item_status_uploaded', 'status', 'uploaded_at'),
+        db.Index('ix_gallery_item_user_uploaded', 'user_id', 'uploaded_at'),
+    )
 
 class BarangayInfo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -71,5 +103,75 @@ class PageView(db.Model):
     view_type = db.Column(db.String(50), nullable=False) # 'attraction', 'event', 'page'
     item_id = db.Column(db.Integer, nullable=True) # ID of the attraction or event, if applicable
     page_name = db.Column(db.String(100), nullable=True) # Name of the page (e.g., 'home', 'map', 'events')
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     user_id = db.Column(db.Integer, nullable=True) # Optional, if logged in
+
+    __table_args__ = (
+        db.Index('ix_page_view_type_item', 'view_type', 'item_id'),
+    )
+
+class PageViewRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False) # 'hour', 'day' or 'total'
+    bucket = db.Column(db.DateTime, nullable=False) # Start of the hour/day (epoch for 'total')
+    view_type = db.Column(db.String(50), nullable=False)
+    item_id = db.Column(db.Integer, nullable=False, default=0) # 0 when the view has no item
+    page_name = db.Column(db.String(100), nullable=False, default='') # '' when the view has no page name
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket', 'view_type', 'item_id', 'page_name', name='uq_page_view_rollup_key'),
+    )
+
+class UploadSession(db.Model):
+    id = db.Column(db.String(32), primary_key=True) # Random token, part of the upload URL
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    filename = db.Column(db.String(200), nullable=False) # Client file name (only its extension is used)
+    caption = db.Column(db.String(200), nullable=True)
+    upload_length = db.Column(db.BigInteger, nullable=False) # Total size announced by the client
+    received = db.Column(db.BigInteger, nullable=False, default=0) # Bytes written so far
+    status = db.Column(db.String(20), default='active') # 'active', 'complete', 'aborted', 'expired'
+    gallery_item_id = db.Column(db.Integer, db.ForeignKey('gallery_item.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_upload_session_user_status', 'user_id', 'status'),
+    )
+
+class MediaJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False, default='video') # 'video': poster, rendition and metadata
+    gallery_item_id = db.Column(db.Integer, db.ForeignKey('gallery_item.id'), nullable=False)
+    source_url = db.Column(db.String(200), nullable=False) # Upload the job was queued for
+    status = db.Column(db.String(20), nullable=False, default='queued') # 'queued', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow) # Retries are delayed with backoff
+    worker = db.Column(db.String(100), nullable=True) # Worker that claimed the job
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_media_job_status_run_after', 'status', 'run_after'),
+        db.Index('ix_media_job_gallery_item', 'gallery_item_id'),
+    )
+
+class OutboundEmail(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    html_body = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued') # 'queued', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    send_after = db.Column(db.DateTime, default=datetime.utcnow) # Retries are delayed with backoff
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_outbound_email_status_send_after', 'status', 'send_after'),
+    )
@@ -4,6 +4,9 @@ from .auth import auth_bp
 from .admin import admin_bp
 from .barangay import barangay_bp
 from .update import update_bp
+from .tiles import tiles_bp
+from .uploads import uploads_bp
+from .images import images_bp
 
 def register_blueprints(app):
     """Register all application blueprints"""
@@ -12,4 +15,7 @@ def register_blueprints(app):
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(barangay_bp)
-    app.register_blueprint(update_bp)
\ No newline at end of file
+    app.register_blueprint(update_bp)
+    app.register_blueprint(tiles_bp)
+    app.register_blueprint(uploads_bp)
+    app.register_blueprint(images_bp)
\ No newline at end of file
@@ -1,10 +1,11 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from models import db, User, Attraction, Event, GalleryItem, PageView
+from models import db, User, Attraction, Event, GalleryItem
+from utils import analytics, moderation
+from utils.pagination import cached_count, keyset_page, paginate
+from utils.view_buffer import view_buffer
 from datetime import datetime, timedelta
-from werkzeug.utils import secure_filename
-from sqlalchemy import func
-import os
+from utils.uploads import allowed_file, save_upload
 import logging
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -32,61 +33,49 @@ def admin_dashboard():
         return redirect(url_for('public.index'))
     
     stats = {
-        'attractions': Attraction.query.count(),
-        'events': Event.query.count(),
-        'gallery': GalleryItem.query.count()
+        'attractions': cached_count('attractions', Attraction.query, 'attraction'),
+        'events': cached_count('events', Event.query, 'event'),
+        'gallery': cached_count('gallery', GalleryItem.query, 'gallery')
     }
 
-    # Analytics: Most Viewed Attractions
-    top_attractions_query = db.session.query(
-        Attraction.name, 
-        func.count(PageView.id).label('view_count')
-    ).join(PageView, PageView.item_id == Attraction.id).filter(
-        PageView.view_type == 'attraction'
-    ).group_by(Attraction.id).order_by(func.count(PageView.id).desc()).limit(5).all()
-
-    top_attractions = [{'name': name, 'views': count} for name, count in top_attractions_query]
-
-    # Analytics: Engagement Trends (Last 7 Days)
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    # SQLite has limited date functions, this works for many, but for SQLite specifically:
-    # We might need to handle date extraction carefully if using SQLite directly.
-    # Flask-SQLAlchemy usually handles dialects but func.date() in SQLite returns string 'YYYY-MM-DD'
-    daily_views_query = db.session.query(
-        func.date(PageView.timestamp).label('date'),
-        func.count(PageView.id).label('count')
-    ).filter(
-        PageView.timestamp >= seven_days_ago
-    ).group_by(func.date(PageView.timestamp)).all()
-
-    daily_views_dict = {str(d): c for d, c in daily_views_query}
-    
+    # Analytics: Most Viewed Attractions (read from the lifetime rollups)
+    top_attractions = analytics.top_attractions(limit=5)
+
+    # Analytics: Engagement Trends (Last 7 Days, read from the daily rollups)
+    daily_views_dict = analytics.daily_view_counts(days=7)
+
     trend_dates = []
     trend_counts = []
     
     for i in range(6, -1, -1):
         d = (datetime.utcnow() - timedelta(days=i)).date()
-        d_str = str(d)
         trend_dates.append(d.strftime('%b %d'))
-        trend_counts.append(daily_views_dict.get(d_str, 0))
+        trend_counts.append(daily_views_dict.get(d, 0))
 
     engagement_data = {
         'dates': trend_dates,
         'counts': trend_counts
     }
 
-    pending_users = User.query.filter_by(is_approved=False, role='contributor').all()
-    pending_gallery = GalleryItem.query.filter_by(status='pending').all()
+    # Oldest submissions first; the full backlog is in the moderation queue
+    preview = current_app.config['LIST_PENDING_PREVIEW']
+    users = User.query.filter_by(is_approved=False, role='contributor')
+    pending_users = keyset_page(users, (User.created_at, User.id), per_page=preview,
+                                total=cached_count('users:pending', users, 'user'))
+    gallery = GalleryItem.query.filter_by(status='pending')
+    pending_gallery = keyset_page(gallery, (GalleryItem.uploaded_at, GalleryItem.id), per_page=preview,
+                                  total=cached_count('gallery:pending', gallery, 'gallery'))
     
     print(f"=== ADMIN: Dashboard loaded with {stats['attractions']} attractions, {stats['events']} events ===")
-    logger.info(f"Dashboard data loaded: {stats['attractions']} attractions, {stats['events']} events, {len(pending_users)} pending users")
+    logger.info(f"Dashboard data loaded: {stats['attractions']} attractions, {stats['events']} events, {pending_users.total} pending users")
     
     return render_template('admin/dashboard.html', 
                          stats=stats, 
                          pending_users=pending_users, 
                          pending_gallery=pending_gallery,
                          top_attractions=top_attractions,
-                         engagement_data=engagement_data)
+                         engagement_data=engagement_data,
+                         view_buffer_stats=view_buffer.stats())
 
 @admin_bp.route('/users/approve/<int:id>')
 @login_required
@@ -109,6 +98,8 @@ def approve_user(id):
         
     user = User.query.get_or_404(id)
     user.is_approved = True
+    # Sent by the background mailer once this commits
+    moderation.notify_user_approved(user)
     db.session.commit()
     
     print(f"=== ADMIN: User '{user.username}' approved ===")
@@ -153,7 +144,8 @@ def admin_attractions():
     """
     Display the attractions management page for admins.
     
-    Shows all attractions with pending items highlighted for review.
+    Shows the oldest pending attractions for review above a keyset-paginated
+    list of all attractions, newest first.
     
     Returns:
         Rendered attractions management template with pending and all attractions.
@@ -165,11 +157,15 @@ def admin_attractions():
         flash('Access denied.')
         return redirect(url_for('public.index'))
     
-    pending_attractions = Attraction.query.filter_by(status='pending').all()
-    all_attractions = Attraction.query.order_by(Attraction.created_at.desc()).all()
+    pending = Attraction.query.filter_by(status='pending')
+    pending_attractions = keyset_page(pending, (Attraction.created_at, Attraction.id),
+                                      total=cached_count('attractions:pending', pending, 'attraction'),
+                                      per_page=current_app.config['LIST_PENDING_PREVIEW'])
+    all_attractions = paginate(Attraction.query, (Attraction.created_at, Attraction.id), descending=True,
+                               total=cached_count('attractions', Attraction.query, 'attraction'))
     
-    print(f"=== ADMIN: Loaded {len(all_attractions)} attractions ({len(pending_attractions)} pending) ===")
-    logger.info(f"Attractions page loaded: {len(all_attractions)} total, {len(pending_attractions)} pending")
+    print(f"=== ADMIN: Loaded {len(all_attractions)} of {all_attractions.total} attractions ({pending_attractions.total} pending) ===")
+    logger.info(f"Attractions page loaded: {len(all_attractions)} of {all_attractions.total} shown, {pending_attractions.total} pending")
     
     return render_template('admin/attractions.html', pending_attractions=pending_attractions, all_attractions=all_attractions)
 
@@ -179,7 +175,8 @@ def admin_events():
     """
     Display the events management page for admins.
     
-    Shows all events with pending items highlighted for review.
+    Shows the oldest pending events for review above a keyset-paginated
+    list of all events by date.
     
     Returns:
         Rendered events management template with pending and all events.
@@ -191,11 +188,15 @@ def admin_events():
         flash('Access denied.')
         return redirect(url_for('public.index'))
     
-    pending_events = Event.query.filter_by(status='pending').all()
-    all_events = Event.query.order_by(Event.date.asc()).all()
+    pending = Event.query.filter_by(status='pending')
+    pending_events = keyset_page(pending, (Event.created_at, Event.id),
+                                 total=cached_count('events:pending', pending, 'event'),
+                                 per_page=current_app.config['LIST_PENDING_PREVIEW'])
+    all_events = paginate(Event.query, (Event.date, Event.id),
+                          total=cached_count('events', Event.query, 'event'))
     
-    print(f"=== ADMIN: Loaded {len(all_events)} events ({len(pending_events)} pending) ===")
-    logger.info(f"Events page loaded: {len(all_events)} total, {len(pending_events)} pending")
+    print(f"=== ADMIN: Loaded {len(all_events)} of {all_events.total} events ({pending_events.total} pending) ===")
+    logger.info(f"Events page loaded: {len(all_events)} of {all_events.total} shown, {pending_events.total} pending")
     
     return render_template('admin/events.html', pending_events=pending_events, all_events=all_events)
 
@@ -220,6 +221,7 @@ def approve_attraction(id):
     
     attraction = Attraction.query.get_or_404(id)
     attraction.status = 'approved'
+    moderation.notify_attraction_approved(attraction)
     db.session.commit()
     
     print(f"=== ADMIN: Attraction '{attraction.name}' approved ===")
@@ -281,8 +283,6 @@ def edit_attraction(id):
     print(f"=== ADMIN: Editing attraction ID {id} ===")
     logger.info(f"Attraction edit requested for ID {id}")
     
-    from flask import current_app
-    
     attraction = Attraction.query.get_or_404(id)
     
     # Check permission
@@ -301,9 +301,7 @@ def edit_attraction(id):
         if 'image' in request.files:
             file = request.files['image']
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                attraction.image_url = url_for('static', filename='uploads/' + filename)
+                attraction.image_url = save_upload(file)
         
         # Fallback to URL if provided and no file uploaded (or to update URL)
         if request.form.get('image_url'):
@@ -440,15 +438,91 @@ def reject_gallery(id):
     flash('Gallery item rejected and removed.')
     return redirect(url_for('admin.admin_dashboard'))
 
-def allowed_file(filename):
+@admin_bp.route('/moderation')
+@login_required
+def moderation_queue():
     """
-    Check if a file has an allowed extension.
-    
-    Args:
-        filename: The name of the file to check.
-    
+    Display the moderation queue: pending users, attractions, events and
+    gallery items in one list, with bulk approve/reject.
+
+    Returns:
+        Rendered moderation template; rows are loaded from the JSON API.
+    """
+    print("=== ADMIN: Moderation queue accessed ===")
+    logger.info("Moderation queue accessed")
+
+    if current_user.role != 'admin':
+        flash('Access denied.')
+        return redirect(url_for('public.index'))
+
+    return render_template('admin/moderation.html', counts=moderation.pending_counts())
+
+def _api_admin_only():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required.'}), 403
+    return None
+
+@admin_bp.errorhandler(moderation.ModerationError)
+def moderation_error(error):
+    return jsonify({'error': error.message}), error.status
+
+@admin_bp.route('/api/moderation')
+@login_required
+def api_moderation_queue():
+    """
+    List pending submissions across all content types, oldest first.
+
+    Query parameters:
+        type: Comma-separated content types (user, attraction, event,
+            gallery); default all.
+        limit: Page size (default 50, max 200).
+        cursor: The `next_cursor` value of the previous page.
+
+    Returns:
+        JSON: {'items': [...], 'next_cursor': str or None, 'counts': {type: n}}.
+    """
+    denied = _api_admin_only()
+    if denied:
+        return denied
+
+    kinds = [k for k in request.args.get('type', '').split(',') if k]
+    unknown = [k for k in kinds if k not in moderation.QUEUES]
+    if unknown:
+        return jsonify({'error': f"Unknown type: {', '.join(unknown)}."}), 400
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+
+    page = moderation.pending_page(kinds=kinds or None, cursor=request.args.get('cursor'), limit=limit)
+    page['counts'] = moderation.pending_counts(kinds or None)
+    response = jsonify(page)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@admin_bp.route('/api/moderation/bulk', methods=['POST'])
+@login_required
+def api_moderation_bulk():
+    """
+    Approve or reject many pending submissions in a single transaction.
+
+    JSON body:
+        action: 'approve' or 'reject' (reject deletes, like the single-item routes).
+        items: List of {'type': 'user'|'attraction'|'event'|'gallery', 'id': int}.
+
     Returns:
-        bool: True if the file extension is allowed, False otherwise.
+        JSON: 'applied', 'skipped' (no longer pending) and 'missing' item
+        lists, plus the remaining pending 'counts'.
     """
-    from flask import current_app
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+    denied = _api_admin_only()
+    if denied:
+        return denied
+
+    # Requiring a JSON body also keeps cross-site form posts out
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object body.'}), 415
+
+    result = moderation.apply_bulk(payload.get('action'), payload.get('items'))
+    print(f"=== ADMIN: {current_user.username} bulk {payload.get('action')} of {len(result['applied'])} items ===")
+    logger.info(f"Bulk {payload.get('action')} by {current_user.username}: {len(result['applied'])} items")
+
+    result['counts'] = moderation.pending_counts()
+    return jsonify(result)
@@ -1,10 +1,54 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify, url_for
 from models import Attraction
+from utils.clustering import cluster_store, to_feature, project, unproject, MAX_ZOOM
+from utils.json_cache import VersionedJSONCache
+from utils.spatial import nearby_attractions, spatial_index
+from utils.suggest import suggest_index
 import logging
+import math
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 logger = logging.getLogger(__name__)
 
+# Serialized API payloads, rebuilt only when the attraction content version changes
+api_cache = VersionedJSONCache()
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+MAX_NEARBY_KM = 100.0
+
+# Query parameters that switch /api/attractions to the viewport/paginated mode
+VIEWPORT_PARAMS = ('bbox', 'zoom', 'category', 'barangay', 'limit', 'cursor')
+
+def _approved_attractions():
+    """
+    Build the list of approved attraction dicts served by /api/attractions.
+
+    Returns:
+        list: Approved attractions with their details.
+    """
+    print("=== API: Building attractions payload ===")
+    logger.info("Rebuilding /api/attractions payload from the database")
+
+    attractions = Attraction.query.filter_by(status='approved').all()
+    result = []
+    for a in attractions:
+        result.append({
+            'id': a.id,
+            'name': a.name,
+            'category': a.category,
+            'barangay': a.barangay,
+            'description': a.description,
+            'lat': a.lat,
+            'lng': a.lng,
+            'image': a.image_url,
+            'rating': 4.5  # Placeholder rating until we implement reviews
+        })
+
+    print(f"=== API: Built payload with {len(result)} attractions ===")
+    logger.info(f"Cached {len(result)} approved attractions")
+    return result
+
 @api_bp.route('/attractions')
 def api_attractions():
     """
@@ -13,17 +57,215 @@ def api_attractions():
     Returns JSON array of attraction objects with properties:
     - id, name, category, barangay, description
     - lat, lng, image, rating
+
+    When any of bbox, zoom, category, barangay, limit or cursor is given,
+    returns a compact, paginated page for a map viewport instead (see
+    viewport_attractions).
+
+    The serialized payload is cached until an attraction is added, edited,
+    approved or deleted. Responses carry a strong ETag, and requests with a
+    matching If-None-Match header get 304 Not Modified.
     
     Returns:
         JSON: List of approved attractions with their details.
     """
-    print("=== API: Fetching attractions ===")
     logger.info("API endpoint /api/attractions called")
-    
-    attractions = Attraction.query.filter_by(status='approved').all()
-    result = []
-    for a in attractions:
-        result.append({
+    if any(param in request.args for param in VIEWPORT_PARAMS):
+        return viewport_attractions()
+    return api_cache.response('attractions', ('attraction',), _approved_attractions)
+
+def parse_bbox(value):
+    """
+    Parse a `bbox=west,south,east,north` query parameter.
+
+    Args:
+        value (str): Comma separated min lng, min lat, max lng, max lat.
+
+    Returns:
+        tuple: (min_lat, min_lng, max_lat, max_lng), or None if absent.
+
+    Raises:
+        ValueError: If the value is not four numbers.
+    """
+    if not value:
+        return None
+    west, south, east, north = (float(v) for v in value.split(','))
+    return min(south, north), min(west, east), max(south, north), max(west, east)
+
+def coordinate_precision(zoom):
+    """
+    Return how many decimals of lat/lng are worth sending at a zoom level.
+
+    One more decimal every two zoom levels, from two (~1 km) at zoom 8
+    and below to six at zoom 16; at zoom 10 three decimals (~100 m) is
+    already sub-pixel.
+    """
+    if zoom is None:
+        return 6
+    return max(2, min(6, (zoom - 4) // 2))
+
+def _viewport_page(bbox, zoom, category, barangay, cursor, limit):
+    """
+    Build one page of compact attraction rows for a map viewport.
+
+    Args:
+        bbox (tuple): (min_lat, min_lng, max_lat, max_lng) or None.
+        zoom (int): Map zoom level, used to round coordinates.
+        category (str): Category filter, or None.
+        barangay (str): Barangay filter, or None.
+        cursor (int): Return attractions with an ID greater than this.
+        limit (int): Page size.
+
+    Returns:
+        dict: 'items' and 'next_cursor' (None on the last page).
+    """
+    query = Attraction.query.filter(Attraction.status == 'approved')
+    if bbox:
+        query = query.filter(spatial_index.bbox_clause(*bbox))
+    if category:
+        query = query.filter(Attraction.category == category)
+    if barangay:
+        query = query.filter(Attraction.barangay == barangay)
+    if cursor:
+        query = query.filter(Attraction.id > cursor)
+
+    rows = query.with_entities(
+        Attraction.id, Attraction.name, Attraction.category, Attraction.barangay,
+        Attraction.lat, Attraction.lng, Attraction.image_url
+    ).order_by(Attraction.id).limit(limit + 1).all()
+
+    precision = coordinate_precision(zoom)
+    items = [{
+        'id': r.id,
+        'name': r.name,
+        'category': r.category,
+        'barangay': r.barangay,
+        'lat': round(r.lat, precision),
+        'lng': round(r.lng, precision),
+        'image': r.image_url
+    } for r in rows[:limit]]
+
+    return {
+        'items': items,
+        'next_cursor': items[-1]['id'] if len(rows) > limit else None
+    }
+
+def viewport_attractions():
+    """
+    Serve the viewport/paginated variant of /api/attractions.
+
+    Query parameters:
+        bbox: west,south,east,north bounds of the visible map.
+        zoom: Current map zoom; coordinates are rounded to what it can show,
+            and the bbox is grown to whole tiles at this zoom.
+        category, barangay: Optional filters ('all' is ignored).
+        limit: Page size (default 500, max 1000).
+        cursor: The `next_cursor` value of the previous page.
+
+    Returns:
+        JSON: {'items': [...], 'next_cursor': int or null}. Items carry
+        only id, name, category, barangay, lat, lng and image; fetch
+        /api/attractions/<id> for the description.
+    """
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+        zoom = request.args.get('zoom', type=int)
+        if zoom is not None:
+            zoom = max(0, min(zoom, MAX_ZOOM))
+        cursor = int(request.args.get('cursor') or 0)
+        limit = min(max(int(request.args.get('limit') or DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        # Nearby viewports share a cache entry instead of each raw bbox getting one
+        if bbox:
+            bbox = snap_bbox_to_tiles(bbox, MAX_ZOOM if zoom is None else zoom)
+    except (ValueError, OverflowError):
+        return jsonify({'error': 'Invalid bbox, zoom, cursor or limit parameter.'}), 400
+
+    category = request.args.get('category')
+    barangay = request.args.get('barangay')
+    category = None if category in (None, '', 'all') else category
+    barangay = None if barangay in (None, '', 'all') else barangay
+
+    key = ('viewport', bbox, zoom, category, barangay, cursor, limit)
+    return api_cache.response(
+        key, ('attraction',),
+        lambda: _viewport_page(bbox, zoom, category, barangay, cursor, limit)
+    )
+
+def snap_bbox_to_tiles(bbox, zoom):
+    """
+    Grow a bbox outwards to whole map tiles at a zoom level.
+
+    Nearby viewports then share the same cache key, and panning a little
+    does not need a new request on the client either.
+    """
+    tiles = 2 ** zoom
+    min_lat, min_lng, max_lat, max_lng = bbox
+    min_x, min_y = project(max_lat, min_lng)
+    max_x, max_y = project(min_lat, max_lng)
+    north, west = unproject(math.floor(min_x * tiles) / tiles, math.floor(min_y * tiles) / tiles)
+    south, east = unproject(math.ceil(max_x * tiles) / tiles, math.ceil(max_y * tiles) / tiles)
+    return round(south, 6), round(west, 6), round(north, 6), round(east, 6)
+
+@api_bp.route('/attractions/clusters')
+def api_attraction_clusters():
+    """
+    API endpoint returning server-side marker clusters for a map viewport.
+
+    Clusters come from per-zoom cluster trees precomputed from the approved
+    attractions (see utils/clustering.py) and rebuilt whenever an
+    attraction is approved, edited or deleted.
+
+    Query parameters:
+        z: Map zoom level (required).
+        bbox: west,south,east,north bounds of the visible map (optional).
+        category, barangay: Optional filters ('all' is ignored).
+
+    Returns:
+        JSON: GeoJSON FeatureCollection. Cluster features have
+        'cluster', 'cluster_id', 'point_count' and 'expansion_zoom'
+        properties; single attractions carry id, name, category,
+        barangay and image.
+    """
+    try:
+        zoom = max(0, min(int(request.args['z']), MAX_ZOOM + 1))
+        bbox = parse_bbox(request.args.get('bbox'))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Parameter z is required; bbox must be west,south,east,north.'}), 400
+
+    category = request.args.get('category')
+    barangay = request.args.get('barangay')
+    category = None if category in (None, '', 'all') else category
+    barangay = None if barangay in (None, '', 'all') else barangay
+    if bbox:
+        bbox = snap_bbox_to_tiles(bbox, zoom)
+
+    def build():
+        index = cluster_store.get(category, barangay)
+        return {
+            'type': 'FeatureCollection',
+            'features': [to_feature(node) for node in index.get_clusters(bbox, zoom)]
+        }
+
+    return api_cache.response(('clusters', zoom, bbox, category, barangay), ('attraction',), build)
+
+@api_bp.route('/attractions/<int:id>')
+def api_attraction_detail(id):
+    """
+    API endpoint to retrieve one approved attraction with its full description.
+
+    Used by the map to load descriptions lazily when a card is opened.
+
+    Args:
+        id: The ID of the attraction.
+
+    Returns:
+        JSON: The attraction's details, or 404 if it is not approved.
+    """
+    def build():
+        a = Attraction.query.filter_by(id=id, status='approved').first()
+        if a is None:
+            return None
+        return {
             'id': a.id,
             'name': a.name,
             'category': a.category,
@@ -32,9 +274,90 @@ def api_attractions():
             'lat': a.lat,
             'lng': a.lng,
             'image': a.image_url,
-            'rating': 4.5  # Placeholder rating until we implement reviews
-        })
-    
-    print(f"=== API: Returning {len(result)} attractions ===")
-    logger.info(f"Returning {len(result)} approved attractions")
-    return jsonify(result)
+            'rating': 4.5
+        }
+
+    return api_cache.response(('detail', id), ('attraction',), build, not_found='Attraction not found.')
+
+@api_bp.route('/attractions/<int:id>/nearby')
+def api_attraction_nearby(id):
+    """
+    API endpoint to retrieve the approved attractions closest to another one.
+
+    Query parameters:
+        k: Number of attractions to return (default 4, max 20).
+        max_km: Search radius in kilometres (default 50, max 100).
+
+    Args:
+        id: The ID of the reference attraction.
+
+    Returns:
+        JSON: List of compact attraction dicts with a 'distance_km' field.
+    """
+    k = min(max(request.args.get('k', 4, type=int), 1), 20)
+    max_km = request.args.get('max_km', 50.0, type=float)
+    if not math.isfinite(max_km) or max_km <= 0:
+        return jsonify({'error': 'max_km must be a positive number.'}), 400
+    # Rounded so near-identical radii share one cache entry
+    max_km = max(round(min(max_km, MAX_NEARBY_KM), 1), 0.1)
+
+    def build():
+        origin = Attraction.query.filter_by(id=id, status='approved').first()
+        if origin is None:
+            return None
+        return [
+            {
+                'id': a.id,
+                'name': a.name,
+                'category': a.category,
+                'barangay': a.barangay,
+                'lat': a.lat,
+                'lng': a.lng,
+                'image': a.image_url,
+                'distance_km': round(distance, 2)
+            }
+            for a, distance in nearby_attractions(origin, k=k, max_km=max_km)
+        ]
+
+    return api_cache.response(('nearby', id, k, max_km), ('attraction',), build, not_found='Attraction not found.')
+
+@api_bp.route('/suggest')
+def api_suggest():
+    """
+    API endpoint for search-as-you-type suggestions.
+
+    Matches the typed prefix against attraction names, event titles,
+    categories and barangay names (see utils/suggest.py), tolerating one
+    typo when there are too few exact prefix matches.
+
+    Query parameters:
+        q: The text typed so far.
+        k: Number of suggestions (default 8, max 20).
+        types: Comma-separated suggestion types to include
+               (attraction, event, category, barangay).
+
+    Returns:
+        JSON: List of {'text', 'type', 'url', 'fuzzy'} dicts; attraction
+        suggestions also carry their id, category, barangay, coordinates
+        and image.
+    """
+    query = request.args.get('q', '')
+    k = min(max(request.args.get('k', 8, type=int), 1), 20)
+    types = {t for t in request.args.get('types', '').split(',') if t} or None
+
+    suggestions = []
+    for text, kind, payload, fuzzy in suggest_index.lookup(query, k=k, types=types):
+        if kind == 'attraction':
+            url = url_for('public.attraction_detail', id=payload['id'])
+        elif kind == 'barangay':
+            url = url_for('public.barangay_profile', name=text)
+        elif kind == 'category':
+            url = url_for('public.search', category=text)
+        else:
+            url = url_for('public.search', q=text)
+        suggestions.append(dict(payload, text=text, type=kind, url=url, fuzzy=fuzzy))
+
+    response = jsonify(suggestions)
+    response.cache_control.public = True
+    response.cache_control.max_age = 30
+    return response
@@ -2,8 +2,9 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from models import db, Attraction, Event, GalleryItem, BarangayInfo
 from datetime import datetime
-from werkzeug.utils import secure_filename
-import os
+from utils import media_jobs
+from utils.pagination import cached_count, paginate
+from utils.uploads import allowed_file, is_video, save_upload
 import logging
 
 barangay_bp = Blueprint('barangay', __name__, url_prefix='/barangay')
@@ -29,9 +30,12 @@ def barangay_dashboard():
         return redirect(url_for('public.index'))
     
     stats = {
-        'attractions': Attraction.query.filter_by(user_id=current_user.id).count(),
-        'events': Event.query.filter_by(user_id=current_user.id).count(),
-        'gallery': GalleryItem.query.filter_by(user_id=current_user.id).count()
+        'attractions': cached_count(f'attractions:user:{current_user.id}',
+                                    Attraction.query.filter_by(user_id=current_user.id), 'attraction'),
+        'events': cached_count(f'events:user:{current_user.id}',
+                               Event.query.filter_by(user_id=current_user.id), 'event'),
+        'gallery': cached_count(f'gallery:user:{current_user.id}',
+                                GalleryItem.query.filter_by(user_id=current_user.id), 'gallery')
     }
     
     print(f"=== BARANGAY: Dashboard loaded with {stats['attractions']} attractions, {stats['events']} events ===")
@@ -43,7 +47,7 @@ def barangay_dashboard():
 @login_required
 def barangay_attractions():
     """
-    Display all attractions created by the current contributor.
+    Display the attractions created by the current contributor, one page at a time.
     
     Shows a list of the contributor's attractions with their approval status.
     
@@ -57,10 +61,12 @@ def barangay_attractions():
         flash('Access denied.')
         return redirect(url_for('public.index'))
     
-    attractions = Attraction.query.filter_by(user_id=current_user.id).order_by(Attraction.created_at.desc()).all()
+    query = Attraction.query.filter_by(user_id=current_user.id)
+    attractions = paginate(query, (Attraction.created_at, Attraction.id), descending=True,
+                           total=cached_count(f'attractions:user:{current_user.id}', query, 'attraction'))
     
-    print(f"=== BARANGAY: Displaying {len(attractions)} attractions ===")
-    logger.info(f"Loaded {len(attractions)} attractions for {current_user.username}")
+    print(f"=== BARANGAY: Displaying {len(attractions)} of {attractions.total} attractions ===")
+    logger.info(f"Loaded {len(attractions)} of {attractions.total} attractions for {current_user.username}")
     
     return render_template('barangay/attractions.html', attractions=attractions)
 
@@ -68,7 +74,7 @@ def barangay_attractions():
 @login_required
 def barangay_events():
     """
-    Display all events created by the current contributor.
+    Display the events created by the current contributor, one page at a time.
     
     Shows a list of the contributor's events with their approval status.
     
@@ -82,10 +88,12 @@ def barangay_events():
         flash('Access denied.')
         return redirect(url_for('public.index'))
     
-    events = Event.query.filter_by(user_id=current_user.id).order_by(Event.date.asc()).all()
+    query = Event.query.filter_by(user_id=current_user.id)
+    events = paginate(query, (Event.date, Event.id),
+                      total=cached_count(f'events:user:{current_user.id}', query, 'event'))
     
-    print(f"=== BARANGAY: Displaying {len(events)} events ===")
-    logger.info(f"Loaded {len(events)} events for {current_user.username}")
+    print(f"=== BARANGAY: Displaying {len(events)} of {events.total} events ===")
+    logger.info(f"Loaded {len(events)} of {events.total} events for {current_user.username}")
     
     return render_template('barangay/events.html', events=events)
 
@@ -93,7 +101,7 @@ def barangay_events():
 @login_required
 def barangay_gallery():
     """
-    Display all gallery items created by the current contributor.
+    Display the gallery items created by the current contributor, one page at a time.
     
     Shows a list of the contributor's gallery items with their approval status.
     
@@ -107,10 +115,12 @@ def barangay_gallery():
         flash('Access denied.')
         return redirect(url_for('public.index'))
     
-    gallery_items = GalleryItem.query.filter_by(user_id=current_user.id).order_by(GalleryItem.uploaded_at.desc()).all()
+    query = GalleryItem.query.filter_by(user_id=current_user.id)
+    gallery_items = paginate(query, (GalleryItem.uploaded_at, GalleryItem.id), descending=True,
+                             total=cached_count(f'gallery:user:{current_user.id}', query, 'gallery'))
     
-    print(f"=== BARANGAY: Displaying {len(gallery_items)} gallery items ===")
-    logger.info(f"Loaded {len(gallery_items)} gallery items for {current_user.username}")
+    print(f"=== BARANGAY: Displaying {len(gallery_items)} of {gallery_items.total} gallery items ===")
+    logger.info(f"Loaded {len(gallery_items)} of {gallery_items.total} gallery items for {current_user.username}")
     
     return render_template('barangay/gallery.html', gallery_items=gallery_items)
 
@@ -130,8 +140,6 @@ def barangay_add_attraction():
     print(f"=== BARANGAY: Add attraction form accessed by {current_user.username} ===")
     logger.info(f"Add attraction page accessed by {current_user.username}")
     
-    from flask import current_app
-    
     if current_user.role != 'contributor':
         flash('Access denied.')
         return redirect(url_for('public.index'))
@@ -143,9 +151,7 @@ def barangay_add_attraction():
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                image_url = url_for('static', filename='uploads/' + filename)
+                image_url = save_upload(file)
         
         attraction = Attraction(
             name=request.form['name'],
@@ -188,8 +194,6 @@ def barangay_edit_attraction(id):
     print(f"=== BARANGAY: Edit attraction ID {id} by {current_user.username} ===")
     logger.info(f"Edit attraction requested for ID {id} by {current_user.username}")
     
-    from flask import current_app
-    
     attraction = Attraction.query.get_or_404(id)
     
     # Only allow editing own attractions
@@ -208,9 +212,7 @@ def barangay_edit_attraction(id):
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                attraction.image_url = url_for('static', filename='uploads/' + filename)
+                attraction.image_url = save_upload(file)
         
         # Fallback to URL if provided and no file uploaded
         if request.form.get('image_url') and not ('image' in request.files and request.files['image'].filename):
@@ -276,7 +278,6 @@ def barangay_add_event():
         GET: Rendered add event form.
         POST: Redirect to dashboard after successful submission.
     """
-    from flask import current_app
     
     if current_user.role != 'contributor':
         flash('Access denied.')
@@ -289,9 +290,7 @@ def barangay_add_event():
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                image_url = url_for('static', filename='uploads/' + filename)
+                image_url = save_upload(file)
         
         event = Event(
             title=request.form['title'],
@@ -334,8 +333,6 @@ def barangay_edit_event(id):
     print(f"=== BARANGAY: Edit event ID {id} by {current_user.username} ===")
     logger.info(f"Edit event requested for ID {id} by {current_user.username}")
     
-    from flask import current_app
-    
     event = Event.query.get_or_404(id)
     
     # Only allow editing own events
@@ -354,9 +351,7 @@ def barangay_edit_event(id):
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                event.image_url = url_for('static', filename='uploads/' + filename)
+                event.image_url = save_upload(file)
         
         # Fallback to URL if provided and no file uploaded
         if request.form.get('image_url') and not ('image' in request.files and request.files['image'].filename):
@@ -466,7 +461,6 @@ def barangay_add_gallery():
         GET: Rendered add gallery form.
         POST: Redirect to dashboard after successful submission.
     """
-    from flask import current_app
     
     if current_user.role != 'contributor':
         flash('Access denied.')
@@ -480,13 +474,10 @@ def barangay_add_gallery():
         if 'media_file' in request.files:
             file = request.files['media_file']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                url = url_for('static', filename='uploads/' + filename)
+                url = save_upload(file)
                 
                 # Automatically detect type based on file extension
-                ext = filename.rsplit('.', 1)[1].lower()
-                if ext in ['mp4', 'avi', 'mov', 'wmv']:
+                if is_video(file.filename):
                     item_type = 'video'
                 else:
                     item_type = 'photo'
@@ -504,6 +495,7 @@ def barangay_add_gallery():
         )
         db.session.add(gallery_item)
         db.session.commit()
+        media_jobs.enqueue(gallery_item)
         
         print(f"=== BARANGAY: New gallery item ({item_type}) submitted by {current_user.username} ===")
         logger.info(f"New gallery item (type: {item_type}) submitted by {current_user.username} for approval")
@@ -532,8 +524,6 @@ def barangay_edit_gallery(id):
     print(f"=== BARANGAY: Edit gallery item ID {id} by {current_user.username} ===")
     logger.info(f"Edit gallery item requested for ID {id} by {current_user.username}")
     
-    from flask import current_app
-    
     gallery_item = GalleryItem.query.get_or_404(id)
     
     # Only allow editing own gallery items
@@ -542,19 +532,17 @@ def barangay_edit_gallery(id):
         return redirect(url_for('barangay.barangay_dashboard'))
     
     if request.method == 'POST':
+        previous_url = gallery_item.url
         gallery_item.caption = request.form.get('caption')
         
         # Handle file replacement
         if 'media_file' in request.files:
             file = request.files['media_file']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                gallery_item.url = url_for('static', filename='uploads/' + filename)
+                gallery_item.url = save_upload(file)
                 
                 # Update type based on new file
-                ext = filename.rsplit('.', 1)[1].lower()
-                if ext in ['mp4', 'avi', 'mov', 'wmv']:
+                if is_video(file.filename):
                     gallery_item.type = 'video'
                 else:
                     gallery_item.type = 'photo'
@@ -569,6 +557,10 @@ def barangay_edit_gallery(id):
         gallery_item.status = 'pending'
         db.session.commit()
         
+        # New file: drop the old poster/rendition and queue video processing
+        if gallery_item.url != previous_url:
+            media_jobs.enqueue(gallery_item)
+        
         print(f"=== BARANGAY: Gallery item (ID: {id}) updated by {current_user.username} ===")
         logger.info(f"Gallery item ID {id} updated by {current_user.username} and resubmitted for approval")
         
@@ -609,16 +601,3 @@ def barangay_delete_gallery(id):
     
     flash('Gallery item deleted.')
     return redirect(url_for('barangay.barangay_dashboard'))
-
-def allowed_file(filename):
-    """
-    Check if a file has an allowed extension.
-    
-    Args:
-        filename: The name of the file to check.
-    
-    Returns:
-        bool: True if the file extension is allowed, False otherwise.
-    """
-    from flask import current_app
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
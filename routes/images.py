@@ -0,0 +1,47 @@
+from flask import Blueprint, abort, redirect, request, send_file
+from utils.image_proxy import FORMATS, ProxyError, image_proxy
+import hmac
+import logging
+
+images_bp = Blueprint('images', __name__, url_prefix='/img')
+logger = logging.getLogger(__name__)
+
+ONE_YEAR = 31536000
+
+@images_bp.route('/<sig>/<int:width>.<fmt>')
+def proxy(sig, width, fmt):
+    """
+    Serve a resized WebP/JPEG copy of an external image from the local cache.
+
+    URLs are generated by the `proxied` template filter; the signature
+    covers the source URL, width and format.
+
+    Query Parameters:
+        url: The external image URL.
+
+    Returns:
+        The image with immutable cache headers, a redirect to the original
+        if it cannot be fetched right now, or 404 for invalid requests.
+    """
+    url = request.args.get('url', '')
+    if (not image_proxy.enabled or fmt not in FORMATS or width not in image_proxy.widths
+            or not image_proxy.allowed(url)
+            or not hmac.compare_digest(sig, image_proxy.signature(url, width, fmt))):
+        abort(404)
+
+    try:
+        path, mimetype = image_proxy.render(url, width, fmt)
+    except ProxyError:
+        # Let the browser try the original; retried after IMAGE_PROXY_ERROR_TTL
+        response = redirect(url)
+        response.cache_control.max_age = image_proxy.error_ttl
+        return response
+
+    response = send_file(path, mimetype=mimetype, max_age=ONE_YEAR)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if mimetype == 'image/svg+xml':
+        # Passed through unchanged: never let a remote SVG run scripts on our origin
+        response.headers['Content-Security-Policy'] = "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
@@ -1,7 +1,14 @@
-from flask import Blueprint, render_template, jsonify, request
-from models import db, User, Attraction, Event, GalleryItem, BarangayInfo, PageView
+from flask import Blueprint, Response, abort, render_template, jsonify, request
+from models import User, Attraction, Event, GalleryItem, BarangayInfo
+from utils.view_buffer import view_buffer
+from utils import barangays as barangays_util
+from utils import search as search_util
+from utils.facets import facets, facet_indexes, merge_counts
+from utils.page_cache import page_cache
+from utils.static_export import EXPORT_ENVIRON_KEY
+from utils.sitemap import sitemap_cache
+from utils.spatial import nearby_attractions
 from flask_login import current_user
-from datetime import datetime
 import logging
 
 public_bp = Blueprint('public', __name__)
@@ -23,33 +30,35 @@ def index():
     # Record view
     record_view('page', page_name='home')
 
-    # Get featured attractions (limit 3)
-    featured = Attraction.query.filter_by(status='approved').limit(3).all()
-    
-    print(f"=== PUBLIC: Displaying {len(featured)} featured attractions ===")
-    logger.info(f"Home page loaded with {len(featured)} featured attractions")
-    
-    return render_template('index.html', featured=featured)
+    def render():
+        # Get featured attractions (limit 3)
+        featured = Attraction.query.filter_by(status='approved').limit(3).all()
+
+        print(f"=== PUBLIC: Displaying {len(featured)} featured attractions ===")
+        logger.info(f"Home page loaded with {len(featured)} featured attractions")
+
+        return render_template('index.html', featured=featured)
+
+    return page_cache.page(('attraction',), render)
 
 def record_view(view_type, item_id=None, page_name=None):
     """
     Helper function to record a page view.
+
+    Views are queued on the in-process view buffer and written in
+    batches by its background flusher, so the request never waits on
+    a database write.
     """
+    # `flask export-static` renders pages through the app; those are not visits
+    if request.environ.get(EXPORT_ENVIRON_KEY):
+        return
+
     try:
         user_id = current_user.id if current_user.is_authenticated else None
-        view = PageView(
-            view_type=view_type,
-            item_id=item_id,
-            page_name=page_name,
-            user_id=user_id,
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(view)
-        db.session.commit()
+        view_buffer.record(view_type, item_id=item_id, page_name=page_name, user_id=user_id)
     except Exception as e:
         # Silently fail to not disrupt user experience
         print(f"Error recording view: {e}")
-        db.session.rollback()
 
 @public_bp.route('/map')
 def map_view():
@@ -65,24 +74,19 @@ def map_view():
     print("=== PUBLIC: Map page accessed ===")
     logger.info("Interactive map page accessed")
     
-    # Pass all approved attractions to the map
-    attractions = Attraction.query.filter_by(status='approved').all()
-    
     # Record view
     record_view('page', page_name='map')
 
-    # Get list of unique barangays from approved attractions for the filter
-    barangays = db.session.query(Attraction.barangay).filter(
-        Attraction.status == 'approved',
-        Attraction.barangay != None
-    ).distinct().order_by(Attraction.barangay).all()
+    # Filter options with counts, cached until approved attractions change
+    categories = facets.counts('attraction_categories')
+    barangay_list = facets.get('attraction_barangays')
+    attraction_count = sum(categories.values())
 
-    barangay_list = [b[0] for b in barangays]
-    
-    print(f"=== PUBLIC: Map loaded with {len(attractions)} attractions, {len(barangay_list)} barangays ===")
-    logger.info(f"Map page loaded with {len(attractions)} attractions and {len(barangay_list)} barangays")
+    print(f"=== PUBLIC: Map loaded with {attraction_count} attractions, {len(barangay_list)} barangays ===")
+    logger.info(f"Map page loaded with {attraction_count} attractions and {len(barangay_list)} barangays")
 
-    return render_template('map.html', barangays=barangay_list)
+    return render_template('map.html', barangays=barangay_list, category_counts=categories,
+                           attraction_count=attraction_count)
 
 @public_bp.route('/attraction/<int:id>')
 def attraction_detail(id):
@@ -101,11 +105,14 @@ def attraction_detail(id):
     attraction = Attraction.query.get_or_404(id)
     # Record view
     record_view('attraction', item_id=id)
+
+    # Closest approved attractions, from the spatial index
+    nearby = nearby_attractions(attraction, k=3)
     
     print(f"=== PUBLIC: Displaying attraction '{attraction.name}' ===")
     logger.info(f"Showing attraction '{attraction.name}' (ID: {id})")
     
-    return render_template('detail.html', attraction=attraction)
+    return render_template('detail.html', attraction=attraction, nearby=nearby)
 
 @public_bp.route('/events')
 def events():
@@ -124,12 +131,15 @@ def events():
     # Record view
     record_view('page', page_name='events')
     
-    events = Event.query.filter_by(status='approved').order_by(Event.date.asc()).all()
-    
-    print(f"=== PUBLIC: Displaying {len(events)} approved events ===")
-    logger.info(f"Events page loaded with {len(events)} approved events")
-    
-    return render_template('events.html', events=events)
+    def render():
+        events = Event.query.filter_by(status='approved').order_by(Event.date.asc()).all()
+
+        print(f"=== PUBLIC: Displaying {len(events)} approved events ===")
+        logger.info(f"Events page loaded with {len(events)} approved events")
+
+        return render_template('events.html', events=events)
+
+    return page_cache.page(('event',), render)
 
 @public_bp.route('/gallery')
 def gallery():
@@ -148,26 +158,29 @@ def gallery():
     # Record view
     record_view('page', page_name='gallery')
     
-    items = GalleryItem.query.filter_by(status='approved').order_by(GalleryItem.uploaded_at.desc()).all()
+    def render():
+        items = GalleryItem.query.filter_by(status='approved').order_by(GalleryItem.uploaded_at.desc()).all()
 
-    # Get list of unique barangays from approved gallery items for the filter
-    # We need to join with User table to get the barangay
-    barangays = db.session.query(User.barangay).join(GalleryItem).filter(
-        GalleryItem.status == 'approved',
-        User.barangay != None
-    ).distinct().order_by(User.barangay).all()
+        # Barangays of the contributors of approved items, with item counts
+        barangay_list = facets.get('gallery_barangays')
 
-    barangay_list = [b[0] for b in barangays]
-    
-    print(f"=== PUBLIC: Gallery loaded with {len(items)} items from {len(barangay_list)} barangays ===")
-    logger.info(f"Gallery page loaded with {len(items)} approved items")
+        print(f"=== PUBLIC: Gallery loaded with {len(items)} items from {len(barangay_list)} barangays ===")
+        logger.info(f"Gallery page loaded with {len(items)} approved items")
+
+        return render_template('gallery.html', gallery_items=items, barangays=barangay_list)
 
-    return render_template('gallery.html', gallery_items=items, barangays=barangay_list)
+    # Items show their contributor's barangay and username, and image variants once processed
+    return page_cache.page(('gallery', 'user', 'media'), render)
 
 @public_bp.route('/search')
 def search():
     """
-    Search for attractions and events with advanced filtering.
+    Search for attractions, events, gallery items and barangay profiles.
+
+    Text queries use the full-text index (see utils/search.py), so results
+    are ranked by relevance and carry highlighted snippets. The category
+    and barangay dropdowns show how many results each option would give.
+
     Args:
         q (str): The search query.
         category (str): Filter by category (Nature, Historical, etc.)
@@ -180,47 +193,60 @@ def search():
     category_filter = request.args.get('category', '')
     barangay_filter = request.args.get('barangay', '')
     
-    # Start with base approved query
-    attractions_query = Attraction.query.filter_by(status='approved')
-    events_query = Event.query.filter_by(status='approved')
-
-    # Apply Text Search if exists
-    if query:
-        attractions_query = attractions_query.filter(
-            (Attraction.name.ilike(f'%{query}%')) | 
-            (Attraction.description.ilike(f'%{query}%'))
-        )
-        events_query = events_query.filter(
-            (Event.title.ilike(f'%{query}%')) | 
-            (Event.description.ilike(f'%{query}%'))
-        )
-
-    # Apply Category Filter
-    if category_filter and category_filter != 'all':
-        attractions_query = attractions_query.filter(Attraction.category == category_filter)
-        events_query = events_query.filter(Event.category == category_filter)
-
-    # Apply Barangay Filter
-    if barangay_filter and barangay_filter != 'all':
-        attractions_query = attractions_query.filter(Attraction.barangay == barangay_filter)
-        events_query = events_query.filter(Event.barangay == barangay_filter)
-
-    attractions = attractions_query.all()
-    events = events_query.all()
-
-    # Fetch unique options for the filter dropdowns
-    available_categories = db.session.query(Attraction.category).distinct().all()
-    available_barangays = db.session.query(Attraction.barangay).filter(Attraction.barangay != None).distinct().all()
-    
-    print(f"=== PUBLIC: Search found {len(attractions)} attractions, {len(events)} events ===")
+    category = None if category_filter in ('', 'all') else category_filter
+    barangay = None if barangay_filter in ('', 'all') else barangay_filter
+
+    # Attractions and events: text matches filtered and faceted in one pass
+    # over bitset posting lists (utils/facets.py), so every dropdown option
+    # can show how many results it would give
+    snippets = {}
+    results = {}
+    category_counts = []
+    barangay_counts = []
+    for kind, model in (('attraction', Attraction), ('event', Event)):
+        ranked_ids = None
+        if query:
+            ranked_ids, snippets[kind] = search_util.matches(kind, query)
+        faceted = facet_indexes.get(kind).search(ranked_ids, category, barangay)
+        category_counts.append(faceted.categories)
+        barangay_counts.append(faceted.barangays)
+
+        items = model.query.filter(model.id.in_(faceted.hits)).all() if faceted.hits else []
+        if ranked_ids is not None:
+            rank = {item_id: i for i, item_id in enumerate(ranked_ids)}
+            items.sort(key=lambda item: rank[item.id])
+        results[kind] = items
+    attractions = results['attraction']
+    events = results['event']
+
+    # Gallery items and barangay profiles have no category
+    gallery_items = []
+    barangay_infos = []
+    if query and not category:
+        gallery_query = GalleryItem.query.filter_by(status='approved')
+        barangay_info_query = BarangayInfo.query
+        if barangay:
+            gallery_query = gallery_query.join(User, GalleryItem.user_id == User.id).filter(User.barangay == barangay)
+            barangay_info_query = barangay_info_query.filter(BarangayInfo.barangay_name == barangay)
+        gallery_items, snippets['gallery'] = search_util.search('gallery', query, gallery_query)
+        barangay_infos, snippets['barangay_info'] = search_util.search('barangay_info', query, barangay_info_query)
+
+    available_categories = merge_counts(*category_counts)
+    available_barangays = merge_counts(*barangay_counts)
+
+    print(f"=== PUBLIC: Search found {len(attractions)} attractions, {len(events)} events, "
+          f"{len(gallery_items)} gallery items, {len(barangay_infos)} barangay profiles ===")
     logger.info(f"Search results: {len(attractions)} attractions, {len(events)} events for query '{query}'")
 
     return render_template('search_results.html', 
                          query=query, 
                          attractions=attractions, 
                          events=events,
-                         categories=[c[0] for c in available_categories],
-                         barangays=[b[0] for b in available_barangays],
+                         gallery_items=gallery_items,
+                         barangay_infos=barangay_infos,
+                         snippets=snippets,
+                         categories=available_categories,
+                         barangays=available_barangays,
                          selected_category=category_filter,
                          selected_barangay=barangay_filter)
 
@@ -234,7 +260,7 @@ def routes():
     """
     print("=== PUBLIC: Routes page accessed ===")
     logger.info("Tourism routes page accessed")
-    return render_template('routes.html')
+    return page_cache.page((), lambda: render_template('routes.html'))
 
 @public_bp.route('/barangays')
 def barangays():
@@ -253,55 +279,9 @@ def barangays():
     # Record view
     record_view('page', page_name='barangays_list')
     
-    # Get list of barangays that have active contributors
-    # We use a set to ensure uniqueness
-    barangay_names = db.session.query(User.barangay).filter(
-        User.role == 'contributor',
-        User.is_approved == True,
-        User.barangay != None
-    ).distinct().all()
-
-    barangay_list = []
-    for b in barangay_names:
-        name = b[0]
-        # Get all approved attractions for this barangay to calculate metadata
-        attractions = Attraction.query.filter(
-            Attraction.barangay == name,
-            Attraction.status == 'approved'
-        ).all()
-
-        # Find a representative image (first attraction with an image)
-        image_url = None
-        for attraction in attractions:
-            if attraction.image_url:
-                image_url = attraction.image_url
-                break
-
-        # Calculate center coordinates (centroid)
-        lat = 15.9949 # Default
-        lng = 120.4869 # Default
-        if attractions:
-            lat = sum(a.lat for a in attractions) / len(attractions)
-            lng = sum(a.lng for a in attractions) / len(attractions)
-
-        # Collect unique categories as tags
-        tags = list(set(a.category for a in attractions))
-
-        # Count attractions
-        attraction_count = len(attractions)
-
-        barangay_list.append({
-            'name': name,
-            'image_url': image_url,
-            'lat': lat,
-            'lng': lng,
-            'tags': tags,
-            'attraction_count': attraction_count
-        })
-
-    # Sort by name
-    barangay_list.sort(key=lambda x: x['name'])
-    
+    # Count, centroid, image and tags for every barangay in one grouped query
+    barangay_list = barangays_util.directory()
+
     print(f"=== PUBLIC: Barangays directory loaded with {len(barangay_list)} barangays ===")
     logger.info(f"Barangays directory page loaded with {len(barangay_list)} barangays")
 
@@ -327,151 +307,104 @@ def barangay_profile(name):
     # Record view
     record_view('page', page_name='barangay_profile', item_id=None) # We could count specific barangays if we had IDs
 
-    # Get all approved content for this barangay
-    attractions = Attraction.query.filter_by(barangay=name, status='approved').all()
-    events = Event.query.filter_by(barangay=name, status='approved').order_by(Event.date.asc()).all()
-
-    # For gallery, we need to join with User since GalleryItem doesn't have barangay field
-    gallery_items = GalleryItem.query.join(User).filter(
-        User.barangay == name,
-        GalleryItem.status == 'approved'
-    ).order_by(GalleryItem.uploaded_at.desc()).all()
-
-    # Get barangay info (cultural assets, traditions, etc.)
-    barangay_info = BarangayInfo.query.filter_by(barangay_name=name).first()
-
-    # Calculate center coordinates for map (average of all attraction coordinates)
-    center_lat, center_lng = 15.9949, 120.4869  # Default: Mangatarem coordinates
-    if attractions:
-        center_lat = sum(a.lat for a in attractions) / len(attractions)
-        center_lng = sum(a.lng for a in attractions) / len(attractions)
-
-    # Convert attractions to dictionaries for JSON serialization
-    attractions_json = []
-    for a in attractions:
-        attractions_json.append({
-            'id': a.id,
-            'name': a.name,
-            'category': a.category,
-            'barangay': a.barangay,
-            'description': a.description,
-            'lat': a.lat,
-            'lng': a.lng,
-            'image_url': a.image_url
-        })
-    
-    print(f"=== PUBLIC: Barangay '{name}' profile loaded with {len(attractions)} attractions, {len(events)} events ===")
-    logger.info(f"Barangay profile for '{name}': {len(attractions)} attractions, {len(events)} events, {len(gallery_items)} gallery items")
+    def render():
+        # Get all approved content for this barangay
+        attractions = Attraction.query.filter_by(barangay=name, status='approved').all()
+        events = Event.query.filter_by(barangay=name, status='approved').order_by(Event.date.asc()).all()
 
-    return render_template('barangay_profile.html',
-                         barangay_name=name,
-                         attractions=attractions,
-                         attractions_json=attractions_json,
-                         events=events,
-                         gallery_items=gallery_items,
-                         barangay_info=barangay_info,
-                         center_lat=center_lat,
-                         center_lng=center_lng)
+        # For gallery, we need to join with User since GalleryItem doesn't have barangay field
+        gallery_items = GalleryItem.query.join(User).filter(
+            User.barangay == name,
+            GalleryItem.status == 'approved'
+        ).order_by(GalleryItem.uploaded_at.desc()).all()
+
+        # Get barangay info (cultural assets, traditions, etc.)
+        barangay_info = BarangayInfo.query.filter_by(barangay_name=name).first()
+
+        # Calculate center coordinates for map (average of all attraction coordinates)
+        center_lat, center_lng = 15.9949, 120.4869  # Default: Mangatarem coordinates
+        if attractions:
+            center_lat = sum(a.lat for a in attractions) / len(attractions)
+            center_lng = sum(a.lng for a in attractions) / len(attractions)
+
+        # Convert attractions to dictionaries for JSON serialization
+        attractions_json = []
+        for a in attractions:
+            attractions_json.append({
+                'id': a.id,
+                'name': a.name,
+                'category': a.category,
+                'barangay': a.barangay,
+                'description': a.description,
+                'lat': a.lat,
+                'lng': a.lng,
+                'image_url': a.image_url
+            })
+
+        print(f"=== PUBLIC: Barangay '{name}' profile loaded with {len(attractions)} attractions, {len(events)} events ===")
+        logger.info(f"Barangay profile for '{name}': {len(attractions)} attractions, {len(events)} events, {len(gallery_items)} gallery items")
+
+        return render_template('barangay_profile.html',
+                             barangay_name=name,
+                             attractions=attractions,
+                             attractions_json=attractions_json,
+                             events=events,
+                             gallery_items=gallery_items,
+                             barangay_info=barangay_info,
+                             center_lat=center_lat,
+                             center_lng=center_lng)
+
+    return page_cache.page(('attraction', 'event', 'gallery', 'barangay_info', 'user', 'media'), render)
 
 @public_bp.route('/sitemap.xml')
 def sitemap():
     """
-    Generate a dynamic sitemap.xml for SEO.
+    Serve sitemap.xml for SEO.
 
     Lists all static pages, approved attractions, and active barangays.
+    The document is generated once and reused until content changes or
+    the app is redeployed (see utils/sitemap.py); large sites get a
+    sitemap index pointing at per-type sitemaps.
 
     Returns:
-        XML response containing the sitemap.
+        XML response containing the sitemap (or sitemap index).
     """
-    from flask import make_response, url_for
-    from datetime import datetime, timedelta
-
-    host_components = url_for('public.index', _external=True).split('/')
-    host_url = '/'.join(host_components[:3]) # e.g., http://localhost:5000
-
-    pages = []
-    import subprocess
-    import os
-
-    def get_last_commit_date():
-        """
-        Get the last commit date from git history.
-        
-        Attempts to read from the production source repository path first,
-        then falls back to the current directory (for dev environment).
-        Returns today's date if git command fails.
-        """
-        source_repo = "/home/GoMangatarem/Interactive-Digital-Cultural-Map-and-Local-Tourism-Information-system-for-Mangatarem--Pangasinan"
-        try:
-            cmd = ['git', 'log', '-1', '--format=%cd', '--date=iso']
-            
-            # Check if production path exists
-            if os.path.exists(source_repo):
-                cmd = ['git', '-C', source_repo, 'log', '-1', '--format=%cd', '--date=iso']
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            # The date comes back like "2023-10-27 10:00:00 +0000", verify/parse if needed
-            # For simplicity, we just want the date part YYYY-MM-DD
-            # Simple ISO date format from git log is usually YYYY-MM-DD HH:MM:SS +/-TZ
-            return result.stdout.strip().split(' ')[0]
-        except Exception as e:
-            # Fallback to today's date if anything fails
-            return datetime.now().date().isoformat()
-
-    last_update = get_last_commit_date()
-
-    # Static pages
-    static_urls = [
-        'public.index',
-        'public.map_view',
-        'public.events',
-        'public.gallery',
-        'public.routes',
-        'public.barangays'
-    ]
-
-    for url in static_urls:
-        pages.append({
-            'loc': url_for(url, _external=True),
-            'lastmod': last_update,
-            'changefreq': 'weekly',
-            'priority': '0.8' if url == 'public.index' else '0.5'
-        })
-
-    # Dynamic pages: Attractions
-    attractions = Attraction.query.filter_by(status='approved').all()
-    for attraction in attractions:
-        pages.append({
-            'loc': url_for('public.attraction_detail', id=attraction.id, _external=True),
-            'lastmod': attraction.created_at.date().isoformat() if attraction.created_at else last_update,
-            'changefreq': 'monthly',
-            'priority': '0.6'
-        })
-
-    # Dynamic pages: Barangays
-    # Get unique barangays from users/attractions
-    barangay_names = db.session.query(User.barangay).filter(
-        User.role == 'contributor',
-        User.is_approved == True,
-        User.barangay != None
-    ).distinct().all()
-
-    for b in barangay_names:
-        pages.append({
-            'loc': url_for('public.barangay_profile', name=b[0], _external=True),
-            'lastmod': last_update, # Ideally fetch latest update for barangay
-            'changefreq': 'weekly',
-            'priority': '0.7'
-        })
-    
-    print(f"=== PUBLIC: Sitemap generated with {len(pages)} pages ===")
-    logger.info(f"Sitemap.xml generated with {len(pages)} total pages")
+    return _sitemap_response('sitemap.xml')
+
+@public_bp.route('/sitemap-<name>.xml')
+def sitemap_section(name):
+    """
+    Serve one per-type sitemap listed in the sitemap index.
+
+    Args:
+        name: Section name, e.g. 'attractions' or 'attractions-2'.
 
-    sitemap_xml = render_template('sitemap.xml', pages=pages)
-    response = make_response(sitemap_xml)
-    response.headers["Content-Type"] = "application/xml"
+    Returns:
+        XML response, or 404 if the sitemap is not split or has no such section.
+    """
+    return _sitemap_response(f'sitemap-{name}.xml')
 
-    return response
+def _sitemap_response(filename):
+    """
+    Build the response for a cached sitemap document.
+
+    Clients that accept gzip get the precompressed bytes.
+    """
+    document = sitemap_cache.documents().get(filename)
+    if document is None:
+        abort(404)
+    data, compressed, etag = document
+
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = Response(compressed, mimetype='application/xml')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(data, mimetype='application/xml')
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
 
 
 
@@ -0,0 +1,77 @@
+from flask import Blueprint, Response, request, send_from_directory, url_for
+from utils import tiles
+import hashlib
+import json
+import logging
+
+tiles_bp = Blueprint('tiles', __name__, url_prefix='/tiles')
+logger = logging.getLogger(__name__)
+
+ONE_YEAR = 31536000
+
+@tiles_bp.route('/attractions/manifest.json')
+def attraction_tiles_manifest():
+    """
+    Return the tile manifest for the approved attractions.
+
+    Maps each non-empty tile ("z/x/y") to the content-hashed URL that
+    can be cached forever. Tiles touched by an approval, edit or delete
+    are regenerated before the manifest is served.
+
+    Returns:
+        JSON: {'zooms': [min, max], 'tiles': {'z/x/y': url}}.
+    """
+    manifest = tiles.ensure_fresh()
+    payload = {
+        'zooms': manifest['zooms'],
+        'tiles': {
+            name: url_for('tiles.attraction_tile_hashed', z=int(name.split('/')[0]), x=int(name.split('/')[1]),
+                          y=int(name.split('/')[2]), digest=digest)
+            for name, digest in manifest['tiles'].items()
+        }
+    }
+    body = json.dumps(payload, separators=(',', ':'))
+    response = Response(body, mimetype='application/json')
+    response.set_etag(hashlib.sha256(body.encode('utf-8')).hexdigest()[:32])
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    return response.make_conditional(request)
+
+@tiles_bp.route('/attractions/<int:z>/<int:x>/<int:y>')
+@tiles_bp.route('/attractions/<int:z>/<int:x>/<int:y>.geojson')
+def attraction_tile(z, x, y):
+    """
+    Return the current GeoJSON tile for z/x/y.
+
+    The ETag is the tile's content hash, so clients revalidate cheaply.
+    Prefer the hashed URLs listed in the manifest, which never change.
+
+    Returns:
+        GeoJSON FeatureCollection (empty if no attraction is in the tile).
+    """
+    manifest = tiles.ensure_fresh()
+    digest = manifest['tiles'].get(f"{z}/{x}/{y}")
+    if digest is None:
+        response = Response(tiles.EMPTY_TILE, mimetype='application/geo+json')
+        response.set_etag('empty')
+    else:
+        response = send_from_directory(tiles.tiles_folder(), f"{z}/{x}/{y}.{digest}.geojson",
+                                       mimetype='application/geo+json', etag=False)
+        response.set_etag(digest)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
+
+@tiles_bp.route('/attractions/<int:z>/<int:x>/<int:y>.<digest>.geojson')
+def attraction_tile_hashed(z, x, y, digest):
+    """
+    Return a content-addressed tile with a one-year immutable cache header.
+
+    These files live in static/tiles/attractions, so nginx or a CDN can
+    serve them directly without reaching Flask.
+    """
+    response = send_from_directory(tiles.tiles_folder(), f"{z}/{x}/{y}.{digest}.geojson",
+                                   mimetype='application/geo+json', max_age=ONE_YEAR)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
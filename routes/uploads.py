@@ -0,0 +1,160 @@
+from flask import Blueprint, request, jsonify, url_for, flash, make_response, current_app
+from flask_login import current_user
+from functools import wraps
+from models import UploadSession
+from utils import resumable
+import logging
+
+uploads_bp = Blueprint('uploads', __name__, url_prefix='/api/uploads')
+logger = logging.getLogger(__name__)
+
+# Resumable gallery uploads following the tus 1.0 protocol (https://tus.io/protocols/resumable-upload):
+# core protocol plus the creation, checksum and termination extensions.
+
+def _error(message, status):
+    return jsonify({'error': message}), status
+
+def contributor_required(view):
+    """Allow only logged-in, approved contributors; answer JSON instead of redirecting to the login page."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return _error('Login required.', 401)
+        if current_user.role != 'contributor' or not current_user.is_approved:
+            return _error('Only approved barangay contributors can upload.', 403)
+        return view(*args, **kwargs)
+    return wrapper
+
+def _own_session(id):
+    upload = UploadSession.query.get(id)
+    if upload is None or upload.user_id != current_user.id:
+        return None
+    return upload
+
+@uploads_bp.after_request
+def tus_headers(response):
+    response.headers['Tus-Resumable'] = resumable.TUS_VERSION
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@uploads_bp.errorhandler(resumable.UploadError)
+def upload_error(error):
+    return _error(error.message, error.status)
+
+@uploads_bp.route('/', methods=['OPTIONS'])
+def upload_options():
+    """
+    Describe the server's tus capabilities.
+
+    Returns:
+        204 response with the Tus-Version, Tus-Extension, Tus-Max-Size and
+        Tus-Checksum-Algorithm headers.
+    """
+    response = make_response('', 204)
+    response.headers['Tus-Version'] = resumable.TUS_VERSION
+    response.headers['Tus-Extension'] = 'creation,checksum,termination'
+    response.headers['Tus-Max-Size'] = str(current_app.config.get('UPLOAD_MAX_BYTES', 512 * 1024 * 1024))
+    response.headers['Tus-Checksum-Algorithm'] = ','.join(resumable.CHECKSUM_ALGORITHMS)
+    return response
+
+@uploads_bp.route('/', methods=['POST'])
+@contributor_required
+def create_upload():
+    """
+    Start a resumable upload.
+
+    Headers:
+        Upload-Length: Total file size in bytes.
+        Upload-Metadata: tus metadata with 'filename' and optional 'caption'.
+
+    Returns:
+        201 response with the upload URL in Location.
+    """
+    try:
+        length = int(request.headers.get('Upload-Length', ''))
+    except ValueError:
+        return _error('Upload-Length header is required.', 400)
+    metadata = resumable.parse_metadata(request.headers.get('Upload-Metadata'))
+    upload = resumable.create_session(current_user, length, metadata)
+
+    response = make_response('', 201)
+    response.headers['Location'] = url_for('uploads.upload_chunk', id=upload.id)
+    response.headers['Upload-Offset'] = '0'
+    return response
+
+@uploads_bp.route('/<id>', methods=['HEAD'])
+@contributor_required
+def upload_status(id):
+    """
+    Return how much of an upload the server has, so the client can resume.
+
+    Completed uploads answer 410 too: there is nothing left to resume,
+    and a client holding a stale session URL starts a new upload.
+
+    Returns:
+        200 response with Upload-Offset and Upload-Length, or 404/410.
+    """
+    upload = _own_session(id)
+    if upload is None:
+        return '', 404
+    if upload.status in ('aborted', 'expired', 'complete'):
+        return '', 410
+    response = make_response('', 200)
+    response.headers['Upload-Offset'] = str(upload.received)
+    response.headers['Upload-Length'] = str(upload.upload_length)
+    return response
+
+@uploads_bp.route('/<id>', methods=['PATCH'])
+@contributor_required
+def upload_chunk(id):
+    """
+    Append a chunk to an upload.
+
+    Headers:
+        Content-Type: application/offset+octet-stream
+        Upload-Offset: Where this chunk starts; must equal the server's offset.
+        Upload-Checksum (optional): "<algorithm> <base64 digest>" of the chunk.
+
+    Returns:
+        204 response with the new Upload-Offset. The response to the last
+        chunk also carries X-Gallery-Item-Id and Location (the contributor's
+        dashboard), where a confirmation message is waiting.
+    """
+    upload = _own_session(id)
+    if upload is None:
+        return _error('Upload not found.', 404)
+    if request.mimetype != 'application/offset+octet-stream':
+        return _error('Content-Type must be application/offset+octet-stream.', 415)
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return _error('Upload-Offset header is required.', 400)
+
+    resumable.append(upload, request.stream, offset, request.content_length,
+                     checksum=request.headers.get('Upload-Checksum'))
+
+    response = make_response('', 204)
+    response.headers['Upload-Offset'] = str(upload.received)
+    if upload.status == 'complete':
+        print(f"=== UPLOADS: Gallery item {upload.gallery_item_id} submitted by {current_user.username} ===")
+        logger.info(f"Gallery item {upload.gallery_item_id} submitted by {current_user.username} via resumable upload")
+        flash('Gallery item submitted for approval!')
+        response.headers['X-Gallery-Item-Id'] = str(upload.gallery_item_id)
+        response.headers['Location'] = url_for('barangay.barangay_dashboard')
+    return response
+
+@uploads_bp.route('/<id>', methods=['DELETE'])
+@contributor_required
+def cancel_upload(id):
+    """
+    Cancel an upload and delete the received data.
+
+    Returns:
+        204 response, 404 for unknown uploads, or 423 while a chunk is
+        being written (retry once it has arrived).
+    """
+    upload = _own_session(id)
+    if upload is None:
+        return _error('Upload not found.', 404)
+    resumable.abort(upload)
+    return '', 204
@@ -43,20 +43,9 @@ document.addEventListener('DOMContentLoaded', function () {
     // 3. DATA & MARKER MANAGEMENT
     // ========================================
     let attractionsData = [];
-    let markersLayer = L.markerClusterGroup({
-        maxClusterRadius: 50,
-        spiderfyOnMaxZoom: true,
-        showCoverageOnHover: false,
-        zoomToBoundsOnClick: true,
-        iconCreateFunction: function (cluster) {
-            const count = cluster.getChildCount();
-            return L.divIcon({
-                html: `<div class="cluster-icon"><span>${count}</span></div>`,
-                className: 'custom-cluster',
-                iconSize: [40, 40]
-            });
-        }
-    });
+    // Clustering is done by the server (/api/attractions/clusters), so the
+    // browser only ever draws what is visible at the current zoom.
+    let markersLayer = L.layerGroup();
     map.addLayer(markersLayer);
 
     // Store marker references for flyTo functionality
@@ -96,14 +85,103 @@ document.addEventListener('DOMContentLoaded', function () {
     // ========================================
     // 5. FETCH & RENDER ATTRACTIONS
     // ========================================
-    fetch('/api/attractions')
-        .then(response => response.json())
-        .then(data => {
-            attractionsData = data;
-            renderAttractions(data);
-            addMarkers(data);
-        })
-        .catch(error => console.error('Error fetching attractions:', error));
+    // Only the attractions inside the current viewport are requested, one
+    // page at a time, with a compact field set. Descriptions are loaded
+    // lazily when a card is opened (see updateCard).
+    let currentCategory = 'all';
+    let currentBarangay = 'all';
+    let viewportRequest = 0;
+
+    function clusterIcon(count) {
+        return L.divIcon({
+            html: `<div class="cluster-icon"><span>${count}</span></div>`,
+            className: 'custom-cluster',
+            iconSize: [40, 40]
+        });
+    }
+
+    let clusterRequest = 0;
+
+    async function loadClusters() {
+        const requestId = ++clusterRequest;
+        const b = map.getBounds();
+        const params = new URLSearchParams({
+            z: map.getZoom(),
+            bbox: [b.getWest(), b.getSouth(), b.getEast(), b.getNorth()].map(v => v.toFixed(5)).join(','),
+            category: currentCategory,
+            barangay: currentBarangay
+        });
+
+        let data;
+        try {
+            const response = await fetch(`/api/attractions/clusters?${params.toString()}`);
+            data = await response.json();
+        } catch (error) {
+            console.error('Error fetching clusters:', error);
+            return;
+        }
+        if (requestId !== clusterRequest || searchInput.value) return;
+
+        markersLayer.clearLayers();
+        data.features.forEach(feature => {
+            const [lng, lat] = feature.geometry.coordinates;
+            const props = feature.properties;
+
+            if (props.cluster) {
+                const marker = L.marker([lat, lng], { icon: clusterIcon(props.point_count) });
+                marker.on('click', () => map.flyTo([lat, lng], props.expansion_zoom));
+                markersLayer.addLayer(marker);
+            } else {
+                addMarker({ ...props, lat: lat, lng: lng });
+            }
+        });
+    }
+
+    function viewportUrl(cursor) {
+        const b = map.getBounds();
+        const params = new URLSearchParams({
+            bbox: [b.getWest(), b.getSouth(), b.getEast(), b.getNorth()].map(v => v.toFixed(5)).join(','),
+            zoom: map.getZoom(),
+            category: currentCategory,
+            barangay: currentBarangay,
+            limit: 500
+        });
+        if (cursor) params.set('cursor', cursor);
+        return `/api/attractions?${params.toString()}`;
+    }
+
+    async function loadViewport() {
+        const requestId = ++viewportRequest;
+        const items = [];
+        let cursor = null;
+
+        try {
+            do {
+                const response = await fetch(viewportUrl(cursor));
+                const page = await response.json();
+                if (requestId !== viewportRequest) return; // A newer pan/zoom superseded this one
+                items.push(...page.items);
+                cursor = page.next_cursor;
+            } while (cursor);
+        } catch (error) {
+            console.error('Error fetching attractions:', error);
+            return;
+        }
+
+        attractionsData = items;
+        filterAttractions();
+    }
+
+    let viewportTimer = null;
+    map.on('moveend', () => {
+        clearTimeout(viewportTimer);
+        viewportTimer = setTimeout(() => {
+            loadViewport();
+            loadClusters();
+        }, 250);
+    });
+    loadViewport();
+    loadClusters();
 
     // ========================================
     // 10. CARD MANAGEMENT
@@ -116,13 +194,33 @@ document.addEventListener('DOMContentLoaded', function () {
     const cardDistance = document.getElementById('card-distance');
     const cardDescription = document.getElementById('card-description');
 
+    const descriptionCache = {};
+
+    function loadDescription(id) {
+        if (!descriptionCache[id]) {
+            descriptionCache[id] = fetch(`/api/attractions/${id}`)
+                .then(response => response.json())
+                .then(detail => detail.description || '')
+                .catch(() => {
+                    delete descriptionCache[id];
+                    return '';
+                });
+        }
+        return descriptionCache[id];
+    }
+
     function updateCard(attraction) {
         if (!placeCard) return;
 
         // Populate data
         cardTitle.textContent = attraction.name;
         cardAddress.textContent = attraction.barangay ? `${attraction.barangay}, Mangatarem` : 'Mangatarem, Pangasinan';
-        cardDescription.textContent = attraction.description;
+        cardDescription.textContent = 'Loading...';
+        loadDescription(attraction.id).then(description => {
+            if (cardTitle.textContent === attraction.name) {
+                cardDescription.textContent = description;
+            }
+        });
 
         // Mock data for now (since not in DB)
         cardRating.textContent = (Math.random() * (5.0 - 4.0) + 4.0).toFixed(1);
@@ -163,32 +261,42 @@ document.addEventListener('DOMContentLoaded', function () {
         }, 1600);
     }
 
-    // Update marker click to show card
-    function addMarkers(attractions) {
-        // Clear existing markers
-        markersLayer.clearLayers();
-
-        attractions.forEach(attraction => {
-            const icon = getCustomIcon(attraction.category);
-            const marker = L.marker([attraction.lat, attraction.lng], { icon: icon });
+    function addMarker(attraction) {
+        const icon = getCustomIcon(attraction.category);
+        const marker = L.marker([attraction.lat, attraction.lng], { icon: icon });
 
-            // Add click event to show card
-            marker.on('click', () => {
-                updateCard(attraction);
+        // Add click event to show card
+        marker.on('click', () => {
+            updateCard(attraction);
 
-                // Also center map on click (optional, but good UX)
-                map.flyTo([attraction.lat, attraction.lng], 16, {
-                    animate: true,
-                    duration: 1.0
-                });
+            // Also center map on click (optional, but good UX)
+            map.flyTo([attraction.lat, attraction.lng], 16, {
+                animate: true,
+                duration: 1.0
             });
+        });
 
-            // Add to cluster layer
-            markersLayer.addLayer(marker);
+        markersLayer.addLayer(marker);
 
-            // Store reference for flyTo
-            markerMap[attraction.id] = marker;
-        });
+        // Store reference for flyTo
+        markerMap[attraction.id] = marker;
+    }
+
+    // Draw individual markers for a text search; otherwise show the server clusters
+    let showingSearchMarkers = false;
+
+    function addMarkers(attractions) {
+        if (!searchInput.value) {
+            if (showingSearchMarkers) {
+                showingSearchMarkers = false;
+                loadClusters();
+            }
+            return;
+        }
+
+        showingSearchMarkers = true;
+        markersLayer.clearLayers();
+        attractions.forEach(addMarker);
     }
 
     function renderAttractions(attractions) {
@@ -220,7 +328,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 <div class="w-2/3 p-3 flex flex-col justify-between">
                     <div>
                         <h3 class="font-bold text-gray-800 text-sm leading-tight mb-1 group-hover:text-green-700 transition line-clamp-1">${attraction.name}</h3>
-                        <p class="text-xs text-gray-500 line-clamp-2">${attraction.description}</p>
+                        <p class="text-xs text-gray-500 line-clamp-2">${attraction.barangay ? `${attraction.barangay}, Mangatarem` : 'Mangatarem, Pangasinan'}</p>
                     </div>
                     <div class="flex justify-between items-end mt-2">
                         <div class="text-xs text-amber-500 font-bold">${stars} <span class="text-gray-400 font-normal">(${reviewCount})</span></div>
@@ -242,25 +350,50 @@ document.addEventListener('DOMContentLoaded', function () {
     const filterBtns = document.querySelectorAll('.filter-btn');
     const barangayFilter = document.getElementById('barangay-filter');
 
-    let currentCategory = 'all';
-    let currentBarangay = 'all';
+    // Category and barangay filters are applied by the API. The search box
+    // asks /api/suggest, which searches every approved attraction (not just
+    // the viewport) and tolerates typos.
+    let searchResults = [];
+    let suggestRequest = 0;
+    let suggestTimer = null;
 
     function filterAttractions() {
-        const term = searchInput.value.toLowerCase();
+        const results = searchInput.value.trim() ? searchResults : attractionsData;
+        renderAttractions(results);
+        addMarkers(results);
+    }
 
-        const filtered = attractionsData.filter(a => {
-            const matchesSearch = a.name.toLowerCase().includes(term) || a.description.toLowerCase().includes(term);
-            const matchesCategory = currentCategory === 'all' || a.category === currentCategory;
-            const matchesBarangay = currentBarangay === 'all' || a.barangay === currentBarangay;
+    async function loadSuggestions() {
+        const requestId = ++suggestRequest;
+        const term = searchInput.value.trim();
+        if (!term) {
+            searchResults = [];
+            filterAttractions();
+            return;
+        }
 
-            return matchesSearch && matchesCategory && matchesBarangay;
-        });
+        const params = new URLSearchParams({ q: term, types: 'attraction', k: 20 });
+        let suggestions;
+        try {
+            const response = await fetch(`/api/suggest?${params.toString()}`);
+            suggestions = await response.json();
+        } catch (error) {
+            console.error('Error fetching suggestions:', error);
+            return;
+        }
+        if (requestId !== suggestRequest) return; // The user kept typing
 
-        renderAttractions(filtered);
-        addMarkers(filtered);
+        searchResults = suggestions
+            .filter(s => currentCategory === 'all' || s.category === currentCategory)
+            .filter(s => currentBarangay === 'all' || s.barangay === currentBarangay)
+            .map(s => ({ ...s, name: s.text }));
+        filterAttractions();
     }
 
-    searchInput.addEventListener('input', filterAttractions);
+    searchInput.addEventListener('input', () => {
+        clearTimeout(suggestTimer);
+        suggestTimer = setTimeout(loadSuggestions, 120);
+    });
 
     // Category filter buttons
     filterBtns.forEach(btn => {
@@ -274,7 +407,9 @@ document.addEventListener('DOMContentLoaded', function () {
             btn.classList.add('bg-green-600', 'text-white');
 
             currentCategory = btn.dataset.category;
-            filterAttractions();
+            loadViewport();
+            if (searchInput.value.trim()) loadSuggestions();
+            loadClusters();
         });
     });
 
@@ -282,7 +417,9 @@ document.addEventListener('DOMContentLoaded', function () {
     if (barangayFilter) {
         barangayFilter.addEventListener('change', (e) => {
             currentBarangay = e.target.value;
-            filterAttractions();
+            loadViewport();
+            if (searchInput.value.trim()) loadSuggestions();
+            loadClusters();
         });
     }
 
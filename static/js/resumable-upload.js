@@ -0,0 +1,135 @@
+// Resumable gallery uploads over the tus protocol (see routes/uploads.py).
+// Forms with data-resumable-endpoint send their file in chunks; an interrupted
+// upload resumes from the server's offset on retry or after a page reload.
+document.addEventListener('DOMContentLoaded', function () {
+    const RETRY_DELAYS = [1000, 3000, 5000, 10000, 20000];
+
+    function encodeMetadata(values) {
+        return Object.entries(values)
+            .filter(([, value]) => value)
+            .map(([key, value]) => `${key} ${btoa(unescape(encodeURIComponent(value)))}`)
+            .join(',');
+    }
+
+    async function chunkChecksum(blob) {
+        // crypto.subtle only exists on HTTPS (and localhost); the checksum is optional
+        if (!window.crypto || !window.crypto.subtle) return null;
+        const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return 'sha256 ' + btoa(String.fromCharCode(...new Uint8Array(digest)));
+    }
+
+    function sleep(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function createUpload(endpoint, file, caption) {
+        const response = await fetch(endpoint, {
+            method: 'POST',
+            headers: {
+                'Tus-Resumable': '1.0.0',
+                'Upload-Length': String(file.size),
+                'Upload-Metadata': encodeMetadata({ filename: file.name, caption: caption })
+            }
+        });
+        if (response.status !== 201) {
+            const body = await response.json().catch(() => ({}));
+            throw new Error(body.error || `Upload could not start (${response.status}).`);
+        }
+        return response.headers.get('Location');
+    }
+
+    // Server offset of an upload, or null once it is gone (completed, cancelled or expired)
+    async function currentOffset(location) {
+        const response = await fetch(location, { method: 'HEAD', headers: { 'Tus-Resumable': '1.0.0' } });
+        if (response.status === 404 || response.status === 410) return null;
+        if (response.status !== 200) throw new Error(`Upload status unavailable (${response.status}).`);
+        return parseInt(response.headers.get('Upload-Offset'), 10);
+    }
+
+    async function upload(form, file, onProgress) {
+        const endpoint = form.dataset.resumableEndpoint;
+        const chunkSize = parseInt(form.dataset.chunkSize, 10) || 4 * 1024 * 1024;
+        const caption = form.querySelector('[name="caption"]').value;
+        const storageKey = `tus:${file.name}:${file.size}:${file.lastModified}`;
+
+        let location = localStorage.getItem(storageKey);
+        let offset = location ? await currentOffset(location).catch(() => null) : null;
+        // A fully received upload cannot take more chunks; start a new one
+        if (offset === null || offset >= file.size) {
+            location = await createUpload(endpoint, file, caption);
+            localStorage.setItem(storageKey, location);
+            offset = 0;
+        }
+
+        let attempt = 0;
+        while (true) {
+            const chunk = file.slice(offset, offset + chunkSize);
+            const headers = {
+                'Tus-Resumable': '1.0.0',
+                'Upload-Offset': String(offset),
+                'Content-Type': 'application/offset+octet-stream'
+            };
+            const checksum = await chunkChecksum(chunk);
+            if (checksum) headers['Upload-Checksum'] = checksum;
+
+            let response;
+            try {
+                response = await fetch(location, { method: 'PATCH', headers: headers, body: chunk });
+            } catch (error) {
+                response = null; // Network dropped; retry below
+            }
+
+            if (response && response.status === 204) {
+                attempt = 0;
+                offset = parseInt(response.headers.get('Upload-Offset'), 10);
+                onProgress(offset / file.size);
+                if (offset >= file.size) {
+                    localStorage.removeItem(storageKey);
+                    return response.headers.get('Location');
+                }
+                continue;
+            }
+            if (response && ![409, 423, 460].includes(response.status) && response.status < 500) {
+                const body = await response.json().catch(() => ({}));
+                localStorage.removeItem(storageKey);
+                throw new Error(body.error || `Upload failed (${response.status}).`);
+            }
+            if (attempt >= RETRY_DELAYS.length) {
+                throw new Error('Connection lost. Submit the form again to resume the upload.');
+            }
+            await sleep(RETRY_DELAYS[attempt++]);
+            // Ask the server where to continue from
+            const resumed = await currentOffset(location).catch(() => undefined);
+            if (resumed === null || resumed >= file.size) {
+                localStorage.removeItem(storageKey);
+                throw new Error('This upload is no longer available. Check your gallery before submitting it again.');
+            }
+            if (resumed !== undefined) offset = resumed;
+        }
+    }
+
+    document.querySelectorAll('form[data-resumable-endpoint]').forEach(form => {
+        const fileInput = form.querySelector('input[type="file"]');
+        const progress = form.querySelector('[data-upload-progress]');
+        const progressBar = progress ? progress.querySelector('div') : null;
+        const submitButton = form.querySelector('button[type="submit"]');
+
+        form.addEventListener('submit', async event => {
+            const file = fileInput.files[0];
+            if (!file) return; // URL-only submissions use the normal form post
+            event.preventDefault();
+            submitButton.disabled = true;
+            if (progress) progress.classList.remove('hidden');
+
+            try {
+                const next = await upload(form, file, fraction => {
+                    if (progressBar) progressBar.style.width = `${Math.round(fraction * 100)}%`;
+                });
+                window.location.href = next || form.dataset.doneUrl;
+            } catch (error) {
+                alert(error.message);
+                submitButton.disabled = false;
+            }
+        });
+    });
+});
@@ -0,0 +1,199 @@
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Attraction, PageView, PageViewRollup
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('hour', 'day', 'total')
+TOTAL_BUCKET = datetime(1970, 1, 1)
+
+
+def bucket_start(timestamp, granularity):
+    """
+    Truncate a timestamp to the start of its rollup bucket.
+
+    Args:
+        timestamp (datetime): The raw view timestamp.
+        granularity (str): 'hour', 'day' or 'total'.
+
+    Returns:
+        datetime: Start of the bucket.
+    """
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return TOTAL_BUCKET
+
+
+def aggregate_views(rows):
+    """
+    Aggregate raw page view rows into rollup counts.
+
+    Args:
+        rows (list): Dicts with view_type, item_id, page_name and timestamp.
+
+    Returns:
+        Counter: Counts keyed by (granularity, bucket, view_type, item_id, page_name).
+    """
+    counts = Counter()
+    for row in rows:
+        timestamp = row.get('timestamp') or datetime.utcnow()
+        item_id = row.get('item_id') or 0
+        page_name = row.get('page_name') or ''
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(timestamp, granularity), row['view_type'], item_id, page_name)
+            counts[key] += row.get('count', 1)
+    return counts
+
+
+def apply_rollups(rows):
+    """
+    Add a batch of raw page views to the rollup tables.
+
+    Runs in the caller's session without committing, so the rollups land
+    in the same transaction as the raw PageView rows.
+
+    Args:
+        rows (list): Dicts with view_type, item_id, page_name and timestamp.
+    """
+    counts = aggregate_views(rows)
+    if not counts:
+        return
+
+    values = [
+        {
+            'granularity': granularity,
+            'bucket': bucket,
+            'view_type': view_type,
+            'item_id': item_id,
+            'page_name': page_name,
+            'count': count
+        }
+        for (granularity, bucket, view_type, item_id, page_name), count in counts.items()
+    ]
+    stmt = sqlite_insert(PageViewRollup.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['granularity', 'bucket', 'view_type', 'item_id', 'page_name'],
+        set_={'count': PageViewRollup.__table__.c['count'] + stmt.excluded['count']}
+    )
+    db.session.execute(stmt, values)
+
+
+def backfill_rollups(since=None, batch_size=5000):
+    """
+    Rebuild the rollup tables from the raw PageView rows.
+
+    Hour and day buckets from `since` onwards are recomputed from scratch.
+    The lifetime ('total') counts are adjusted by the difference, so rollups
+    for raw rows that were already compacted away are preserved.
+
+    Args:
+        since (datetime, optional): Start of the range to rebuild. Defaults to
+            the day of the oldest raw view still stored.
+        batch_size (int): Number of raw rows aggregated per round.
+
+    Returns:
+        int: Number of raw views that were rolled up.
+    """
+    if since is None:
+        since = db.session.query(func.min(PageView.timestamp)).scalar()
+        if since is None:
+            return 0
+    since = bucket_start(since, 'day')
+
+    # Remove what the old hour/day rows contributed to the lifetime totals
+    stale = db.session.query(
+        PageViewRollup.view_type,
+        PageViewRollup.item_id,
+        PageViewRollup.page_name,
+        func.sum(PageViewRollup.count)
+    ).filter(
+        PageViewRollup.granularity == 'day',
+        PageViewRollup.bucket >= since
+    ).group_by(
+        PageViewRollup.view_type, PageViewRollup.item_id, PageViewRollup.page_name
+    ).all()
+
+    for view_type, item_id, page_name, count in stale:
+        PageViewRollup.query.filter_by(
+            granularity='total', bucket=TOTAL_BUCKET,
+            view_type=view_type, item_id=item_id, page_name=page_name
+        ).update({PageViewRollup.count: PageViewRollup.count - count}, synchronize_session=False)
+
+    PageViewRollup.query.filter(
+        PageViewRollup.granularity.in_(['hour', 'day']),
+        PageViewRollup.bucket >= since
+    ).delete(synchronize_session=False)
+
+    total = 0
+    last_id = 0
+    while True:
+        batch = db.session.query(
+            PageView.id, PageView.view_type, PageView.item_id, PageView.page_name, PageView.timestamp
+        ).filter(
+            PageView.timestamp >= since,
+            PageView.id > last_id
+        ).order_by(PageView.id).limit(batch_size).all()
+        if not batch:
+            break
+        apply_rollups([
+            {'view_type': v, 'item_id': i, 'page_name': p, 'timestamp': t}
+            for _, v, i, p, t in batch
+        ])
+        total += len(batch)
+        last_id = batch[-1][0]
+
+    PageViewRollup.query.filter(PageViewRollup.count <= 0).delete(synchronize_session=False)
+    db.session.commit()
+
+    logger.info(f"Rolled up {total} page views since {since.date()}")
+    return total
+
+
+def top_attractions(limit=5):
+    """
+    Return the most viewed attractions from the lifetime rollups.
+
+    Args:
+        limit (int): Number of attractions to return.
+
+    Returns:
+        list: Dicts with 'name' and 'views'.
+    """
+    rows = db.session.query(
+        Attraction.name,
+        PageViewRollup.count
+    ).join(Attraction, Attraction.id == PageViewRollup.item_id).filter(
+        PageViewRollup.granularity == 'total',
+        PageViewRollup.view_type == 'attraction'
+    ).order_by(PageViewRollup.count.desc()).limit(limit).all()
+
+    return [{'name': name, 'views': count} for name, count in rows]
+
+
+def daily_view_counts(days=7):
+    """
+    Return total views per day for the last `days` days from the day rollups.
+
+    Args:
+        days (int): Number of days, including today.
+
+    Returns:
+        dict: Mapping of date to view count.
+    """
+    start = bucket_start(datetime.utcnow(), 'day') - timedelta(days=days - 1)
+    rows = db.session.query(
+        PageViewRollup.bucket,
+        func.sum(PageViewRollup.count)
+    ).filter(
+        PageViewRollup.granularity == 'day',
+        PageViewRollup.bucket >= start
+    ).group_by(PageViewRollup.bucket).all()
+
+    return {bucket.date(): count for bucket, count in rows}
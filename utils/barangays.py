@@ -0,0 +1,95 @@
+import logging
+import threading
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.orm import aliased
+
+from models import db, User, Attraction
+from utils.content_version import content_versions
+
+logger = logging.getLogger(__name__)
+
+# Map centre of Mangatarem, used for barangays without approved attractions
+DEFAULT_CENTER = (15.9949, 120.4869)
+
+
+def directory_query():
+    """
+    Build the single grouped query behind the barangay directory.
+
+    Barangays with approved contributors are outer-joined to one
+    aggregate pass over their approved attractions (count, centroid,
+    distinct categories and the lowest id that has an image), and then
+    to that attraction for its image URL.
+
+    Returns:
+        Select: Rows of (name, attraction_count, lat, lng, categories, image_url).
+    """
+    contributors = select(User.barangay.label('name')).where(
+        User.role == 'contributor',
+        User.is_approved == True,
+        User.barangay != None
+    ).distinct().subquery()
+
+    has_image = and_(Attraction.image_url != None, Attraction.image_url != '')
+    stats = select(
+        Attraction.barangay.label('barangay'),
+        func.count(Attraction.id).label('attraction_count'),
+        func.avg(Attraction.lat).label('lat'),
+        func.avg(Attraction.lng).label('lng'),
+        func.group_concat(Attraction.category.distinct()).label('categories'),
+        func.min(case((has_image, Attraction.id))).label('image_id')
+    ).where(Attraction.status == 'approved').group_by(Attraction.barangay).subquery()
+
+    image = aliased(Attraction)
+    return select(
+        contributors.c.name,
+        stats.c.attraction_count,
+        stats.c.lat,
+        stats.c.lng,
+        stats.c.categories,
+        image.image_url
+    ).select_from(contributors).outerjoin(
+        stats, stats.c.barangay == contributors.c.name
+    ).outerjoin(
+        image, image.id == stats.c.image_id
+    ).order_by(contributors.c.name)
+
+
+_cache = {'version': None, 'barangays': None}
+_cache_lock = threading.Lock()
+
+
+def directory():
+    """
+    Return the barangay directory entries, sorted by name.
+
+    The result is cached until an attraction or user changes, so the
+    directory costs one query per content change rather than one per
+    barangay per request.
+
+    Returns:
+        list: Dicts with 'name', 'image_url', 'lat', 'lng', 'tags' and
+        'attraction_count'.
+    """
+    version = content_versions.snapshot('attraction', 'user')
+    with _cache_lock:
+        if _cache['version'] == version and _cache['barangays'] is not None:
+            return _cache['barangays']
+
+    barangays = []
+    for row in db.session.execute(directory_query()):
+        barangays.append({
+            'name': row.name,
+            'image_url': row.image_url,
+            'lat': row.lat if row.lat is not None else DEFAULT_CENTER[0],
+            'lng': row.lng if row.lng is not None else DEFAULT_CENTER[1],
+            'tags': sorted(row.categories.split(',')) if row.categories else [],
+            'attraction_count': row.attraction_count or 0
+        })
+
+    with _cache_lock:
+        _cache['version'] = version
+        _cache['barangays'] = barangays
+    logger.info(f"Barangay directory rebuilt with {len(barangays)} barangays")
+    return barangays
@@ -0,0 +1,212 @@
+import logging
+import math
+import threading
+from collections import defaultdict
+
+from models import db, Attraction
+from utils.content_version import content_versions
+
+logger = logging.getLogger(__name__)
+
+MIN_ZOOM = 0
+MAX_ZOOM = 16       # Above this every attraction is drawn as its own marker
+RADIUS_PX = 60      # Cluster radius in screen pixels
+EXTENT = 256        # Tile size in pixels (Leaflet default)
+
+
+def project(lat, lng):
+    """Project lat/lng to Web Mercator coordinates in the [0, 1] range."""
+    x = lng / 360.0 + 0.5
+    sin = math.sin(math.radians(max(min(lat, 85.05112878), -85.05112878)))
+    y = 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi
+    return x, y
+
+
+def unproject(x, y):
+    """Inverse of project()."""
+    lng = (x - 0.5) * 360.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lng
+
+
+class ClusterIndex:
+    """
+    Hierarchical point clusters precomputed for every zoom level.
+
+    Supercluster-style: starting from the individual points just above
+    MAX_ZOOM, each zoom level greedily merges points/clusters of the level
+    below that fall within RADIUS_PX screen pixels of each other into a
+    weighted-centroid cluster. Each level is bucketed by map tile so a
+    viewport query only looks at the visible tiles.
+    """
+
+    def __init__(self, points, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, radius=RADIUS_PX, extent=EXTENT):
+        """
+        Args:
+            points (list): Dicts with at least 'id', 'lat' and 'lng'.
+            min_zoom, max_zoom (int): Zoom range to precompute.
+            radius (int): Cluster radius in pixels.
+            extent (int): Tile size in pixels.
+        """
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.levels = {}
+        self.next_cluster_id = 1
+
+        nodes = []
+        for p in points:
+            x, y = project(p['lat'], p['lng'])
+            nodes.append({'x': x, 'y': y, 'count': 1, 'cluster_id': None, 'point': p})
+        self.levels[max_zoom + 1] = self._bucket(nodes, max_zoom + 1)
+
+        for zoom in range(max_zoom, min_zoom - 1, -1):
+            nodes = self._cluster(nodes, zoom, radius / (extent * 2 ** zoom))
+            self.levels[zoom] = self._bucket(nodes, zoom)
+
+    def _bucket(self, nodes, zoom):
+        tiles = 2 ** zoom
+        buckets = defaultdict(list)
+        for node in nodes:
+            buckets[(min(int(node['x'] * tiles), tiles - 1), min(int(node['y'] * tiles), tiles - 1))].append(node)
+        return buckets
+
+    def _cluster(self, nodes, zoom, r):
+        grid = defaultdict(list)
+        for i, node in enumerate(nodes):
+            grid[(int(node['x'] / r), int(node['y'] / r))].append(i)
+
+        merged = [False] * len(nodes)
+        result = []
+        for i, node in enumerate(nodes):
+            if merged[i]:
+                continue
+            merged[i] = True
+            cx, cy = int(node['x'] / r), int(node['y'] / r)
+            neighbours = []
+            for gx in (cx - 1, cx, cx + 1):
+                for gy in (cy - 1, cy, cy + 1):
+                    for j in grid.get((gx, gy), ()):
+                        if not merged[j] and (nodes[j]['x'] - node['x']) ** 2 + (nodes[j]['y'] - node['y']) ** 2 <= r * r:
+                            neighbours.append(j)
+
+            if not neighbours:
+                result.append(node)
+                continue
+
+            members = [node] + [nodes[j] for j in neighbours]
+            for j in neighbours:
+                merged[j] = True
+            count = sum(m['count'] for m in members)
+            result.append({
+                'x': sum(m['x'] * m['count'] for m in members) / count,
+                'y': sum(m['y'] * m['count'] for m in members) / count,
+                'count': count,
+                'cluster_id': self.next_cluster_id,
+                'expansion_zoom': zoom + 1,
+                'point': None
+            })
+            self.next_cluster_id += 1
+        return result
+
+    def get_clusters(self, bbox, zoom):
+        """
+        Return the clusters and single points visible in a viewport.
+
+        Args:
+            bbox (tuple): (min_lat, min_lng, max_lat, max_lng), or None for the whole world.
+            zoom (int): Map zoom level (clamped to the precomputed range).
+
+        Returns:
+            list: Node dicts with 'x', 'y', 'count' and either 'cluster_id'
+            or the original 'point'.
+        """
+        zoom = max(self.min_zoom, min(int(zoom), self.max_zoom + 1))
+        buckets = self.levels[zoom]
+        if bbox is None:
+            return [node for nodes in buckets.values() for node in nodes]
+
+        min_lat, min_lng, max_lat, max_lng = bbox
+        min_x, min_y = project(max_lat, min_lng)
+        max_x, max_y = project(min_lat, max_lng)
+        tiles = 2 ** zoom
+        result = []
+        for tx in range(max(int(min_x * tiles), 0), min(int(max_x * tiles), tiles - 1) + 1):
+            for ty in range(max(int(min_y * tiles), 0), min(int(max_y * tiles), tiles - 1) + 1):
+                for node in buckets.get((tx, ty), ()):
+                    if min_x <= node['x'] <= max_x and min_y <= node['y'] <= max_y:
+                        result.append(node)
+        return result
+
+
+def to_feature(node):
+    """Convert a cluster node into a GeoJSON feature."""
+    lat, lng = unproject(node['x'], node['y'])
+    if node['point'] is not None:
+        point = node['point']
+        return {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [point['lng'], point['lat']]},
+            'properties': {k: v for k, v in point.items() if k not in ('lat', 'lng')}
+        }
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [round(lng, 6), round(lat, 6)]},
+        'properties': {
+            'cluster': True,
+            'cluster_id': node['cluster_id'],
+            'point_count': node['count'],
+            'expansion_zoom': node['expansion_zoom']
+        }
+    }
+
+
+class ClusterStore:
+    """
+    Cluster indexes of approved attractions, one per (category, barangay) filter.
+
+    Indexes are built on first use and rebuilt when the attraction content
+    version changes (an approval, edit or delete anywhere in the app).
+    """
+
+    def __init__(self, max_indexes=32):
+        self.max_indexes = max_indexes
+        self._indexes = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, category=None, barangay=None):
+        """Return the ClusterIndex for a filter, building it if needed."""
+        version = content_versions.get('attraction')
+        key = (category, barangay)
+        with self._lock:
+            if self._version != version:
+                self._indexes = {}
+                self._version = version
+            index = self._indexes.get(key)
+            if index is None:
+                index = ClusterIndex(load_points(category, barangay))
+                if len(self._indexes) >= self.max_indexes:
+                    self._indexes.pop(next(iter(self._indexes)))
+                self._indexes[key] = index
+                logger.info(f"Built cluster index for category={category} barangay={barangay}")
+            return index
+
+
+def load_points(category=None, barangay=None):
+    """Load approved attractions as compact point dicts for clustering."""
+    query = db.session.query(
+        Attraction.id, Attraction.name, Attraction.category, Attraction.barangay,
+        Attraction.lat, Attraction.lng, Attraction.image_url
+    ).filter(Attraction.status == 'approved')
+    if category:
+        query = query.filter(Attraction.category == category)
+    if barangay:
+        query = query.filter(Attraction.barangay == barangay)
+    return [
+        {'id': r.id, 'name': r.name, 'category': r.category, 'barangay': r.barangay,
+         'lat': r.lat, 'lng': r.lng, 'image': r.image_url}
+        for r in query.all()
+    ]
+
+
+cluster_store = ClusterStore()
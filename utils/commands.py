@@ -0,0 +1,182 @@
+import click
+from datetime import datetime
+
+from utils import analytics, media_jobs, migrations, query_plans, resumable, retention, tiles, uploads
+from utils.content_version import content_versions
+from utils.email_sender import mailer
+from utils.image_proxy import image_proxy
+from utils.page_cache import page_cache
+from utils.static_export import export_site
+from utils.uploads import MEDIA_TAG, image_pipeline
+
+
+def register_commands(app):
+    """Register the maintenance CLI commands (run with `flask --app flask_app <command>`)."""
+
+    @app.cli.command('rollup-views')
+    @click.option('--since', default=None, help='Rebuild rollups from this date (YYYY-MM-DD). Defaults to the oldest raw view.')
+    def rollup_views(since):
+        """Backfill the page view rollup tables from the raw PageView rows."""
+        since_dt = datetime.strptime(since, '%Y-%m-%d') if since else None
+        total = analytics.backfill_rollups(since=since_dt)
+        click.echo(f"Rolled up {total} page views.")
+
+    @app.cli.command('compact-views')
+    @click.option('--days', type=int, default=None, help='Days of raw page views to keep. Defaults to PAGEVIEW_RETENTION_DAYS.')
+    @click.option('--archive/--no-archive', default=True, help='Copy compacted rows into the monthly archive tables first.')
+    @click.option('--vacuum', is_flag=True, help='VACUUM the database afterwards to shrink the file.')
+    def compact_views(days, archive, vacuum):
+        """Roll old raw page views into aggregates and delete them."""
+        before = retention.storage_report()['database_bytes']
+        result = retention.compact_views(retain_days=days, archive=archive)
+        click.echo(f"Compacted {result['deleted']} page views older than {result['cutoff'].date()} "
+                   f"({result['archived']} archived).")
+        if vacuum:
+            retention.vacuum()
+            after = retention.storage_report()['database_bytes']
+            click.echo(f"Database size: {before / 1024:.0f} KB -> {after / 1024:.0f} KB")
+
+    @app.cli.command('db-size')
+    def db_size():
+        """Show database, page view and archive sizes."""
+        report = retention.storage_report()
+        click.echo(f"Database:   {report['database_bytes'] / 1024:.0f} KB ({report['free_bytes'] / 1024:.0f} KB free)")
+        click.echo(f"Page views: {report['page_views']} raw rows "
+                   f"({report['oldest_view'] or '-'} to {report['newest_view'] or '-'})")
+        click.echo(f"Rollups:    {report['rollups']} rows")
+        click.echo(f"Archive:    {report['archive_path']} ({report['archive_bytes'] / 1024:.0f} KB)")
+        for table, count in report['archive_tables'].items():
+            click.echo(f"  {table}: {count} rows")
+
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Apply pending schema migrations (indexes, new columns)."""
+        applied = migrations.upgrade()
+        if not applied:
+            click.echo(f"Database is up to date (version {migrations.latest_version()}).")
+
+    @app.cli.command('check-migrations')
+    def check_migrations():
+        """Fail if upgrading a version 0 database does not produce the schema the models declare."""
+        problems = migrations.check_upgrade()
+        for problem in problems:
+            click.echo(problem)
+        if problems:
+            raise click.ClickException(f"{len(problems)} columns or indexes missing after upgrading from version 0.")
+        click.echo(f"Upgrade from version 0 to {migrations.latest_version()} matches the models.")
+
+    @app.cli.command('check-query-plans')
+    @click.option('--verbose', '-v', is_flag=True, help='Print the full plan for every query.')
+    def check_query_plans(verbose):
+        """Fail if any registered hot-path query does a full table scan."""
+        failures = 0
+        for name, plan, scans in query_plans.check_all():
+            status = 'FULL SCAN ' + ', '.join(scans) if scans else 'ok'
+            click.echo(f"{name}: {status}")
+            if verbose or scans:
+                for line in plan:
+                    click.echo(f"    {line}")
+            failures += bool(scans)
+        if failures:
+            raise click.ClickException(f"{failures} queries do a full table scan.")
+
+    @app.cli.command('build-tiles')
+    @click.option('--full', is_flag=True, help='Rewrite every tile instead of only the ones touched by changes.')
+    def build_tiles(full):
+        """Generate the z/x/y GeoJSON tiles of approved attractions."""
+        result = tiles.build_tiles(full=full)
+        click.echo(f"{result['written']} tiles written, {result['removed']} removed, "
+                   f"{result['pruned']} superseded files pruned.")
+
+    @app.cli.command('clear-page-cache')
+    def clear_page_cache():
+        """Drop every cached page and fragment (filesystem/Redis backends are shared across processes)."""
+        page_cache.clear()
+        click.echo("Page cache cleared.")
+
+    @app.cli.command('process-uploads')
+    @click.option('--all', 'reprocess', is_flag=True, help='Regenerate variants of every image, not just unprocessed ones.')
+    def process_uploads(reprocess):
+        """Strip EXIF from uploaded images and generate their responsive variants."""
+        if not image_pipeline.available:
+            raise click.ClickException("Pillow is not installed (pip install Pillow).")
+        paths = image_pipeline.uploads(pending_only=not reprocess)
+        processed = sum(image_pipeline.process(path) is not None for path in paths)
+        if processed:
+            content_versions.bump(MEDIA_TAG)
+        click.echo(f"{processed} of {len(paths)} images processed.")
+
+    @app.cli.command('gc-uploads')
+    @click.option('--grace-hours', type=float, default=24, help='Keep unreferenced files younger than this.')
+    @click.option('--dry-run', is_flag=True, help='Only report what would be deleted.')
+    def gc_uploads(grace_hours, dry_run):
+        """Delete uploaded files no attraction, event or gallery item points at."""
+        expired = resumable.expire_sessions()
+        if expired:
+            click.echo(f"Expired {expired} idle resumable uploads.")
+        result = uploads.collect_garbage(grace_seconds=int(grace_hours * 3600), dry_run=dry_run)
+        verb = 'Would remove' if dry_run else 'Removed'
+        click.echo(f"{verb} {result['removed']} files ({result['bytes'] / 1024:.0f} KB); "
+                   f"{result['kept']} referenced, {result['recent']} unreferenced but recent.")
+
+    @app.cli.command('image-proxy-cache')
+    @click.option('--clear', is_flag=True, help='Delete every cached external image.')
+    def image_proxy_cache(clear):
+        """Show (or clear) the local cache of external images."""
+        if clear:
+            image_proxy.clear()
+        stats = image_proxy.stats()
+        click.echo(f"{stats['files']} files, {stats['bytes'] / 1024 / 1024:.1f} MB "
+                   f"(limit {image_proxy.max_bytes / 1024 / 1024:.0f} MB) in {image_proxy.folder}")
+
+    @app.cli.command('media-worker')
+    @click.option('--once', is_flag=True, help='Exit when no job is due instead of polling.')
+    @click.option('--worker-id', default=None, help='Name recorded on claimed jobs (default: host:pid).')
+    def media_worker(once, worker_id):
+        """Extract poster frames, renditions and metadata of gallery videos."""
+        processed = media_jobs.run_worker(once=once, name=worker_id)
+        click.echo(f"{processed} media jobs processed.")
+
+    @app.cli.command('media-jobs')
+    @click.option('--retry-failed', is_flag=True, help='Queue failed jobs again with fresh attempts.')
+    @click.option('--enqueue-missing', is_flag=True, help='Queue uploaded videos that have no poster and no pending job.')
+    def media_jobs_status(retry_failed, enqueue_missing):
+        """Show media job counts by status."""
+        if retry_failed:
+            click.echo(f"{media_jobs.retry_failed()} failed jobs queued again.")
+        if enqueue_missing:
+            click.echo(f"{media_jobs.enqueue_missing()} videos queued.")
+        for status, count in media_jobs.status_counts().items():
+            click.echo(f"{status:<8} {count}")
+
+    @app.cli.command('send-mail')
+    @click.option('--limit', type=int, default=None, help='Maximum messages to send (default: MAIL_BATCH_SIZE).')
+    def send_mail(limit):
+        """Send due queued emails now, over one SMTP connection."""
+        if not mailer.sender:
+            raise click.ClickException("No sender address configured (set SMTP_EMAIL or MAIL_FROM).")
+        result = mailer.send_pending(limit=limit)
+        click.echo(f"{result['sent']} sent, {result['retrying']} will be retried, {result['failed']} failed.")
+
+    @app.cli.command('mail-queue')
+    @click.option('--retry-failed', is_flag=True, help='Queue failed emails again with fresh attempts.')
+    def mail_queue(retry_failed):
+        """Show outbound email counts by status."""
+        if retry_failed:
+            click.echo(f"{mailer.retry_failed()} failed emails queued again.")
+        for status, count in mailer.status_counts().items():
+            click.echo(f"{status:<8} {count}")
+
+    @app.cli.command('export-static')
+    @click.option('--output', '-o', default=None, help='Output folder (default: STATIC_EXPORT_DIR or ./export).')
+    @click.option('--full', is_flag=True, help='Render every page instead of only those affected by content changes.')
+    @click.option('--base-url', default=None, help='Site URL used in canonical links and the sitemap (default: SITE_URL).')
+    @click.option('--with-assets', is_flag=True, help='Also copy static/ (CSS, JS, uploads, tiles) into the export.')
+    def export_static(output, full, base_url, with_assets):
+        """Pre-render the public pages and read-only API JSON for static hosting."""
+        result = export_site(output, full=full, base_url=base_url, with_assets=with_assets)
+        click.echo(
+            f"{result['rendered']} rendered ({result['written']} written, {result['unchanged']} unchanged), "
+            f"{result['skipped']} up to date, {result['removed']} removed, {result['failed']} failed, "
+            f"{result['assets']} assets copied."
+        )
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import User, Attraction, Event, GalleryItem, BarangayInfo
+
+logger = logging.getLogger(__name__)
+
+# Content tags bumped whenever a row of the model is inserted, updated or deleted
+MODEL_TAGS = {
+    Attraction: 'attraction',
+    Event: 'event',
+    GalleryItem: 'gallery',
+    BarangayInfo: 'barangay_info',
+    User: 'user',
+}
+
+
+class ContentVersions:
+    """
+    Per-tag content versions used to invalidate caches.
+
+    Every committed insert, update or delete of a tracked model (see
+    `MODEL_TAGS`) bumps the version of its tag, whichever route made the
+    change. Versions live in a small JSON file in the instance folder so
+    all worker processes see the same values; reading a version costs a
+    `stat()` call and never touches the database.
+    """
+
+    def __init__(self, app=None):
+        self.path = None
+        self._versions = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the version file and start listening for commits.
+
+        Args:
+            app: The Flask application.
+        """
+        self.path = app.config.get('CONTENT_VERSION_PATH') or os.path.join(
+            app.instance_path, 'content_versions.json'
+        )
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        app.extensions['content_versions'] = self
+        _listen(self)
+
+    def get(self, tag):
+        """Return the current version of a content tag (0 if never changed)."""
+        self._refresh()
+        return self._versions.get(tag, 0)
+
+    def snapshot(self, *tags):
+        """Return the versions of several tags as a tuple, for use in cache keys."""
+        self._refresh()
+        return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def bump(self, *tags):
+        """
+        Mark content tags as changed.
+
+        Versions are microsecond timestamps rather than counters, so two
+        processes bumping the same tag at once still both produce a value
+        that differs from what any reader has cached.
+
+        Args:
+            *tags: Tags to bump.
+        """
+        if not tags or self.path is None:
+            return
+        with self._lock:
+            self._refresh(force=True)
+            now = time.time_ns() // 1000
+            for tag in tags:
+                self._versions[tag] = max(self._versions.get(tag, 0) + 1, now)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._versions, f)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+        logger.info(f"Content changed: {', '.join(sorted(tags))}")
+
+    def _refresh(self, force=False):
+        if self.path is None:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if force or mtime != self._mtime:
+            try:
+                with open(self.path) as f:
+                    self._versions = json.load(f)
+                self._mtime = mtime
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read content versions: {e}")
+
+
+def tag_for(obj_or_class):
+    """Return the content tag of a model instance or class, or None if untracked."""
+    cls = obj_or_class if isinstance(obj_or_class, type) else type(obj_or_class)
+    return MODEL_TAGS.get(cls)
+
+
+_listening = []
+
+
+def _listen(versions):
+    """Attach the session listeners that collect changed tags and bump them on commit."""
+    if _listening:
+        _listening[0] = versions
+        return
+    _listening.append(versions)
+
+    @event.listens_for(Session, 'after_flush')
+    def _collect_flushed(session, flush_context):
+        tags = session.info.setdefault('content_tags', set())
+        for obj in list(session.new) + list(session.deleted):
+            tag = tag_for(obj)
+            if tag:
+                tags.add(tag)
+        for obj in session.dirty:
+            tag = tag_for(obj)
+            if tag and session.is_modified(obj, include_collections=False):
+                tags.add(tag)
+
+    @event.listens_for(Session, 'do_orm_execute')
+    def _collect_bulk(orm_execute_state):
+        # Query.update() / Query.delete() bypass the flush
+        if orm_execute_state.is_update or orm_execute_state.is_delete:
+            mapper = orm_execute_state.bind_mapper
+            tag = tag_for(mapper.class_) if mapper is not None else None
+            if tag:
+                orm_execute_state.session.info.setdefault('content_tags', set()).add(tag)
+
+    @event.listens_for(Session, 'after_commit')
+    def _bump_committed(session):
+        tags = session.info.pop('content_tags', None)
+        if tags:
+            _listening[0].bump(*tags)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _discard_rolled_back(session):
+        session.info.pop('content_tags', None)
+
+
+content_versions = ContentVersions()
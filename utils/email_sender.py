@@ -1,12 +1,366 @@
+import atexit
+import logging
+import os
 import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import os
+
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session
+
+from models import db, OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('queued', 'sending', 'sent', 'failed')
+
+
+def build_message(subject, sender, recipient, body, html_body=None):
+    """Return a plain text (and optionally HTML) MIME message."""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg.attach(MIMEText(body, 'plain'))
+    if html_body:
+        msg.attach(MIMEText(html_body, 'html'))
+    return msg
+
+
+class SMTPConnection:
+    """
+    One SMTP session (EHLO, optional STARTTLS and login) reused for many messages.
+
+    Opened lazily by the first send() and reopened once if the server drops
+    it between messages.
+    """
+
+    def __init__(self, server, port, username=None, password=None, use_tls=True, timeout=30):
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._smtp = None
+
+    def open(self):
+        if self._smtp is not None:
+            return
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+
+    def send(self, sender, recipient, message):
+        self.open()
+        try:
+            self._smtp.sendmail(sender, recipient, message.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # Idle connection timed out on the server side; one fresh try
+            self._smtp = None
+            self.open()
+            self._smtp.sendmail(sender, recipient, message.as_string())
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+
+# Rejections of one message; the connection stays usable for the next one
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def _is_permanent(error):
+    """True for SMTP errors that retrying cannot fix (5xx replies about the message or recipient)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return error.smtp_code >= 500
+    return False
+
+
+class Mailer:
+    """
+    Persistent outbound email queue with a background sender.
+
+    enqueue() only adds an OutboundEmail row to the current session, so a
+    notification is stored in the same transaction as the change it is
+    about and nothing touches the network during the request. A sender
+    thread (started lazily in each process, and again after a fork) is
+    woken when such a transaction commits, and also polls every
+    `MAIL_POLL_SECONDS` for retries that became due.
+
+    The sender claims messages one at a time with a conditional UPDATE, so
+    several processes (or `flask send-mail`) can run it at once without
+    sending anything twice, and sends up to `MAIL_BATCH_SIZE` of them over
+    a single authenticated SMTP connection, at most `MAIL_RATE_PER_MINUTE`
+    per process. Temporary failures are retried with exponential backoff
+    up to `MAIL_MAX_ATTEMPTS`; permanent rejections (5xx) fail at once.
+
+    Set `MAIL_SENDER_ENABLED` to False to leave sending to `flask send-mail`.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.batch_size = 50
+        self.rate_per_minute = 30
+        self.poll_interval = 30
+        self.sent = 0
+        self.failed = 0
+        self._last_send = 0.0
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the mailer from the application config.
+
+        Args:
+            app: The Flask application.
+        """
+        self.app = app
+        self.sender = app.config.get('MAIL_DEFAULT_SENDER') or app.config.get('MAIL_USERNAME')
+        self.enabled = app.config.get('MAIL_SENDER_ENABLED', True) and bool(self.sender)
+        self.batch_size = app.config.get('MAIL_BATCH_SIZE', 50)
+        self.rate_per_minute = app.config.get('MAIL_RATE_PER_MINUTE', 30)
+        self.poll_interval = app.config.get('MAIL_POLL_SECONDS', 30)
+        self.max_attempts = app.config.get('MAIL_MAX_ATTEMPTS', 6)
+        self.retry_seconds = app.config.get('MAIL_RETRY_SECONDS', 60)
+        self.claim_timeout = app.config.get('MAIL_SEND_TIMEOUT_SECONDS', 600)
+        event.listen(Session, 'after_commit', self._after_commit)
+        # Also start the sender on the first request, for retries left over from a restart
+        app.before_request(self._before_request)
+        app.extensions['mailer'] = self
+        atexit.register(self.shutdown)
+        if not self.sender:
+            logger.warning("No MAIL_DEFAULT_SENDER/SMTP_EMAIL configured; emails stay queued until one is set")
+
+    def connection(self):
+        """Return a new (unopened) SMTP connection using the configured server."""
+        config = self.app.config
+        return SMTPConnection(
+            config.get('MAIL_SERVER', 'smtp.gmail.com'),
+            config.get('MAIL_PORT', 587),
+            username=config.get('MAIL_USERNAME'),
+            password=config.get('MAIL_PASSWORD'),
+            use_tls=config.get('MAIL_USE_TLS', True),
+            timeout=config.get('MAIL_TIMEOUT', 30)
+        )
+
+    def enqueue(self, subject, recipient, body, html_body=None):
+        """
+        Queue an email; it is sent after the current transaction commits.
+
+        The caller commits (normally together with the change the email is
+        about); nothing is stored if the transaction rolls back.
+
+        Args:
+            subject (str): The subject of the email.
+            recipient (str): The recipient's email address.
+            body (str): The plain text body of the email.
+            html_body (str, optional): The HTML body of the email.
+
+        Returns:
+            OutboundEmail: The pending row.
+        """
+        message = OutboundEmail(subject=subject[:200], recipient=recipient, body=body, html_body=html_body,
+                                status='queued', send_after=datetime.utcnow())
+        db.session.add(message)
+        db.session.info['mail_queued'] = True
+        logger.info(f"Email '{subject}' to {recipient} queued")
+        return message
+
+    def _before_request(self):
+        if self.enabled:
+            self._ensure_worker()
+
+    def _after_commit(self, session):
+        if session.info.pop('mail_queued', False) and self.enabled:
+            self._ensure_worker()
+            self._wake.set()
+
+    def _throttle(self):
+        if not self.rate_per_minute:
+            return
+        wait = self._last_send + 60.0 / self.rate_per_minute - time.monotonic()
+        if wait > 0:
+            self._stop.wait(wait)
+        self._last_send = time.monotonic()
+
+    def _requeue_stale(self):
+        """Put back messages claimed by a sender that died mid-batch."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.claim_timeout)
+        db.session.execute(
+            update(OutboundEmail).where(OutboundEmail.status == 'sending', OutboundEmail.claimed_at < cutoff)
+            .values(status='queued')
+        )
+        db.session.commit()
+
+    def _claim(self):
+        for _ in range(5):
+            message_id = db.session.execute(
+                db.select(OutboundEmail.id)
+                .where(OutboundEmail.status == 'queued', OutboundEmail.send_after <= datetime.utcnow())
+                .order_by(OutboundEmail.send_after, OutboundEmail.id).limit(1)
+            ).scalar()
+            if message_id is None:
+                return None
+            result = db.session.execute(
+                update(OutboundEmail).where(OutboundEmail.id == message_id, OutboundEmail.status == 'queued')
+                .values(status='sending', claimed_at=datetime.utcnow(), attempts=OutboundEmail.attempts + 1)
+            )
+            db.session.commit()
+            if result.rowcount == 1:
+                return db.session.get(OutboundEmail, message_id)
+        return None
+
+    def _finish(self, message, error=None, permanent=False):
+        message.error = error
+        if error is None:
+            message.status = 'sent'
+            message.sent_at = datetime.utcnow()
+        elif permanent or message.attempts >= self.max_attempts:
+            message.status = 'failed'
+        else:
+            # Exponential backoff: 1, 2, 4... times MAIL_RETRY_SECONDS
+            message.status = 'queued'
+            message.send_after = datetime.utcnow() + timedelta(seconds=self.retry_seconds * 2 ** (message.attempts - 1))
+        db.session.commit()
+
+    def send_pending(self, limit=None):
+        """
+        Send due messages over one SMTP connection.
+
+        Must run inside an application context.
+
+        Args:
+            limit (int, optional): Maximum messages to send (default `MAIL_BATCH_SIZE`).
+
+        Returns:
+            dict: Number of messages 'sent', 'retrying' and 'failed'.
+        """
+        result = {'sent': 0, 'retrying': 0, 'failed': 0}
+        if not self.sender:
+            return result
+        limit = limit or self.batch_size
+        with self._send_lock:
+            self._requeue_stale()
+            connection = self.connection()
+            try:
+                while result['sent'] + result['retrying'] + result['failed'] < limit and not self._stop.is_set():
+                    message = self._claim()
+                    if message is None:
+                        break
+                    self._throttle()
+                    mime = build_message(message.subject, self.sender, message.recipient,
+                                         message.body, message.html_body)
+                    try:
+                        connection.send(self.sender, message.recipient, mime)
+                    except (smtplib.SMTPException, OSError) as e:
+                        permanent = _is_permanent(e)
+                        self._finish(message, error=repr(e), permanent=permanent)
+                        result['failed' if message.status == 'failed' else 'retrying'] += 1
+                        print(f"=== MAIL: Sending to {message.recipient} failed ({message.status}): {e} ===")
+                        logger.warning(f"Email {message.id} to {message.recipient} attempt {message.attempts} "
+                                       f"failed, now {message.status}: {e}")
+                        if not isinstance(e, MESSAGE_ERRORS):
+                            # Server or connection trouble: leave the rest for the next run
+                            break
+                        continue
+                    self._finish(message)
+                    result['sent'] += 1
+                    logger.info(f"Email {message.id} '{message.subject}' sent to {message.recipient}")
+            finally:
+                connection.close()
+        with self._lock:
+            self.sent += result['sent']
+            self.failed += result['failed']
+        if any(result.values()):
+            print(f"=== MAIL: {result['sent']} sent, {result['retrying']} retrying, {result['failed']} failed ===")
+        return result
+
+    def retry_failed(self):
+        """Queue every failed message again with a fresh attempt count; returns how many."""
+        result = db.session.execute(
+            update(OutboundEmail).where(OutboundEmail.status == 'failed')
+            .values(status='queued', attempts=0, send_after=datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def status_counts(self):
+        """Return the number of queued emails in each status."""
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(db.session.query(OutboundEmail.status, func.count()).group_by(OutboundEmail.status).all())
+        return counts
+
+    def shutdown(self):
+        """Stop the sender thread (a batch in progress stops after its current message)."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=10)
+
+    def _ensure_worker(self):
+        """Start the sender thread lazily, and again after a fork."""
+        pid = os.getpid()
+        if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+                return
+            self._pid = pid
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='mail-sender', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    result = self.send_pending()
+            except Exception as e:
+                result = None
+                logger.error(f"Mail sender failed: {e}")
+            # Keep draining while full batches go out; otherwise sleep until woken
+            if result is None or result['sent'] < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+mailer = Mailer()
+
 
 def send_email(subject, recipient, body, html_body=None, sender_email=None, sender_password=None, smtp_server='smtp.gmail.com', smtp_port=587):
     """
-    Sends an email using SMTP.
-    
+    Sends an email using SMTP, synchronously.
+
+    Prefer `mailer.enqueue()`, which sends in the background with retries.
+
     Args:
         subject (str): The subject of the email.
         recipient (str): The recipient's email address.
@@ -16,7 +370,7 @@ def send_email(subject, recipient, body, html_body=None, sender_email=None, send
         sender_password (str, optional): The sender's password. Defaults to env var SMTP_PASSWORD.
         smtp_server (str, optional): The SMTP server address. Defaults to 'smtp.gmail.com'.
         smtp_port (int, optional): The SMTP port. Defaults to 587.
-    
+
     Returns:
         bool: True if email sent successfully, False otherwise.
     """
@@ -27,28 +381,13 @@ def send_email(subject, recipient, body, html_body=None, sender_email=None, send
         print("Error: SMTP credentials not provided.")
         return False
 
-    msg = MIMEMultipart('alternative')
-    msg['Subject'] = subject
-    msg['From'] = sender_email
-    msg['To'] = recipient
-
-    part1 = MIMEText(body, 'plain')
-    msg.attach(part1)
-
-    if html_body:
-        part2 = MIMEText(html_body, 'html')
-        msg.attach(part2)
-
+    connection = SMTPConnection(smtp_server, smtp_port, sender_email, sender_password)
     try:
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.ehlo()
-        server.starttls()
-        server.ehlo()
-        server.login(sender_email, sender_password)
-        server.sendmail(sender_email, recipient, msg.as_string())
-        server.close()
+        connection.send(sender_email, recipient, build_message(subject, sender_email, recipient, body, html_body))
         print(f"Email sent successfully to {recipient}")
         return True
     except Exception as e:
         print(f"Failed to send email: {e}")
         return False
+    finally:
+        connection.close()
@@ -0,0 +1,233 @@
+import logging
+import threading
+from collections import namedtuple
+
+from sqlalchemy import func
+
+from models import db, User, Attraction, Event, GalleryItem
+from utils.content_version import content_versions
+
+logger = logging.getLogger(__name__)
+
+Facet = namedtuple('Facet', ['value', 'count'])
+
+# Facet name -> (content tags it depends on, function returning (value, count) rows)
+FACETS = {}
+
+
+def facet(name, *tags):
+    """Register a facet computed from approved content of the given content tags."""
+    def decorator(build):
+        FACETS[name] = (tags, build)
+        return build
+    return decorator
+
+
+def _grouped(column, *criteria, join=None):
+    query = db.session.query(column, func.count()).filter(column != None, *criteria)
+    if join is not None:
+        query = query.join(*join)
+    return query.group_by(column).all()
+
+
+@facet('attraction_categories', 'attraction')
+def _attraction_categories():
+    return _grouped(Attraction.category, Attraction.status == 'approved')
+
+
+@facet('attraction_barangays', 'attraction')
+def _attraction_barangays():
+    return _grouped(Attraction.barangay, Attraction.status == 'approved')
+
+
+@facet('event_categories', 'event')
+def _event_categories():
+    return _grouped(Event.category, Event.status == 'approved')
+
+
+@facet('event_barangays', 'event')
+def _event_barangays():
+    return _grouped(Event.barangay, Event.status == 'approved')
+
+
+@facet('gallery_barangays', 'gallery', 'user')
+def _gallery_barangays():
+    return _grouped(User.barangay, GalleryItem.status == 'approved', join=(GalleryItem, GalleryItem.user_id == User.id))
+
+
+class FacetService:
+    """
+    In-memory category/barangay counts of approved content.
+
+    Each facet is computed with one GROUP BY query the first time it is
+    asked for and kept until one of its content tags changes, so the
+    public pages that show filter dropdowns do not query for them.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, *names):
+        """
+        Return facet values with counts, sorted by value.
+
+        Args:
+            *names: One or more registered facet names. Counts of several
+                facets are added up, e.g. attraction and event categories.
+
+        Returns:
+            list: Facet(value, count) tuples.
+        """
+        totals = {}
+        for name in names:
+            for value, count in self._counts(name):
+                totals[value] = totals.get(value, 0) + count
+        return [Facet(value, totals[value]) for value in sorted(totals)]
+
+    def counts(self, *names):
+        """Return the facet counts as a {value: count} dict."""
+        return {f.value: f.count for f in self.get(*names)}
+
+    def _counts(self, name):
+        tags, compute = FACETS[name]
+        version = content_versions.snapshot(*tags)
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        rows = [(value, count) for value, count in compute()]
+        with self._lock:
+            self._cache[name] = (version, rows)
+        logger.info(f"Facet {name} recomputed ({len(rows)} values)")
+        return rows
+
+
+facets = FacetService()
+
+
+FacetResult = namedtuple('FacetResult', ['hits', 'categories', 'barangays'])
+
+
+def popcount(bits):
+    """Return the number of set bits in an int (int.bit_count() needs Python 3.10+)."""
+    return bin(bits).count('1')
+
+
+class FacetIndex:
+    """
+    Bitset posting lists over the approved rows of one model.
+
+    Every approved row gets a bit position; each category and barangay
+    value has an int whose set bits are the rows with that value. Filter
+    and facet counts for a candidate set are then a handful of ANDs and
+    popcounts instead of one COUNT query per value.
+    """
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows (iterable): (id, category, barangay) tuples.
+        """
+        self.ids = []
+        self.position = {}
+        self.postings = {'category': {}, 'barangay': {}}
+        for i, (item_id, category, barangay) in enumerate(rows):
+            self.ids.append(item_id)
+            self.position[item_id] = i
+            for field, value in (('category', category), ('barangay', barangay)):
+                if value is not None:
+                    postings = self.postings[field]
+                    postings[value] = postings.get(value, 0) | (1 << i)
+        self.all = (1 << len(self.ids)) - 1
+
+    def bits(self, ids):
+        """Return the bitset of the given ids (ids not in the index are ignored)."""
+        result = 0
+        for item_id in ids:
+            i = self.position.get(item_id)
+            if i is not None:
+                result |= 1 << i
+        return result
+
+    def ids_of(self, bits):
+        """Return the ids whose bits are set."""
+        result = []
+        while bits:
+            low = bits & -bits
+            result.append(self.ids[low.bit_length() - 1])
+            bits ^= low
+        return result
+
+    def search(self, candidate_ids=None, category=None, barangay=None):
+        """
+        Filter a candidate set and count every facet value in the same pass.
+
+        Counts are disjunctive: the category counts apply the barangay
+        filter but not the category one (and vice versa), so each count is
+        the number of hits the user would get by picking that value.
+
+        Args:
+            candidate_ids (iterable, optional): Ids matching the text query;
+                None means every approved row.
+            category (str, optional): Selected category.
+            barangay (str, optional): Selected barangay.
+
+        Returns:
+            FacetResult: Hit ids plus {value: count} dicts for both facets.
+        """
+        base = self.all if candidate_ids is None else self.bits(candidate_ids)
+        category_bits = self.postings['category'].get(category, 0) if category else self.all
+        barangay_bits = self.postings['barangay'].get(barangay, 0) if barangay else self.all
+
+        in_barangay = base & barangay_bits
+        in_category = base & category_bits
+        return FacetResult(
+            hits=self.ids_of(in_barangay & category_bits),
+            categories={v: popcount(in_barangay & p) for v, p in self.postings['category'].items()},
+            barangays={v: popcount(in_category & p) for v, p in self.postings['barangay'].items()}
+        )
+
+
+# Models with a FacetIndex, and the content tag that invalidates it
+INDEXED = {
+    'attraction': (Attraction, 'attraction'),
+    'event': (Event, 'event'),
+}
+
+
+class FacetIndexes:
+    """FacetIndex per content type, rebuilt when its content tag changes."""
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind):
+        """Return the FacetIndex of 'attraction' or 'event' rows."""
+        model, tag = INDEXED[kind]
+        version = content_versions.get(tag)
+        with self._lock:
+            cached = self._indexes.get(kind)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        rows = db.session.query(model.id, model.category, model.barangay).filter(
+            model.status == 'approved'
+        ).order_by(model.id).all()
+        index = FacetIndex(rows)
+        with self._lock:
+            self._indexes[kind] = (version, index)
+        logger.info(f"Facet index for {kind} rebuilt ({len(rows)} rows)")
+        return index
+
+
+facet_indexes = FacetIndexes()
+
+
+def merge_counts(*counts):
+    """Add up several {value: count} dicts into a sorted list of Facets."""
+    totals = {}
+    for c in counts:
+        for value, count in c.items():
+            totals[value] = totals.get(value, 0) + count
+    return [Facet(value, totals[value]) for value in sorted(totals)]
@@ -0,0 +1,58 @@
+"""
+Stand-in for ffmpeg/ffprobe on machines without them (development, CI).
+
+Point both settings at it to exercise the media worker end to end:
+
+    FFMPEG_BINARY="python utils/ffmpeg_stub.py"
+    FFPROBE_BINARY="python utils/ffmpeg_stub.py"
+
+It understands only the invocations made by utils/media_jobs.py: probing
+prints fixed stream information, a .jpg output gets a small grey frame and
+any other output gets the first half of the input file. Setting
+FFMPEG_STUB_FAIL=1 makes every call fail, for testing retries.
+"""
+import json
+import os
+import shutil
+import sys
+
+WIDTH, HEIGHT, DURATION = 1280, 720, 12.5
+
+
+def main(args):
+    if os.environ.get('FFMPEG_STUB_FAIL'):
+        print('ffmpeg stub: failing as requested by FFMPEG_STUB_FAIL', file=sys.stderr)
+        return 1
+
+    if '-show_streams' in args:
+        print(json.dumps({
+            'streams': [
+                {'codec_type': 'video', 'codec_name': 'h264', 'width': WIDTH, 'height': HEIGHT,
+                 'duration': str(DURATION)},
+                {'codec_type': 'audio', 'codec_name': 'aac'},
+            ],
+            'format': {'duration': str(DURATION)},
+        }))
+        return 0
+
+    source, output = args[args.index('-i') + 1], args[-1]
+    if not os.path.exists(source):
+        print(f'{source}: No such file or directory', file=sys.stderr)
+        return 1
+
+    if output.endswith('.jpg'):
+        try:
+            from PIL import Image
+        except ImportError:
+            print('ffmpeg stub: Pillow is required to write poster frames', file=sys.stderr)
+            return 1
+        Image.new('RGB', (WIDTH // 4, HEIGHT // 4), (128, 128, 128)).save(output, 'JPEG')
+    else:
+        with open(source, 'rb') as src, open(output, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+            dst.truncate(max(1, os.path.getsize(source) // 2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,347 @@
+import hashlib
+import hmac
+import http.client
+import io
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+from flask import current_app, url_for
+
+from utils.uploads import _flatten
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Without Pillow external images are linked directly
+    Image = None
+    ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+
+# Read from the remote server per call; the size limit is checked as bytes arrive
+READ_BUFFER_BYTES = 64 * 1024
+
+# Per-URL work is serialized on one of this many locks, picked by the URL's hash
+LOCK_STRIPES = 64
+
+
+class ProxyError(Exception):
+    """A remote image that could not be fetched or decoded."""
+
+
+class _AllowlistRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Follow redirects only to allowlisted hosts, so the proxy cannot be bounced to internal addresses."""
+
+    def __init__(self, proxy):
+        super().__init__()
+        self.proxy = proxy
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if not self.proxy.allowed(newurl):
+            raise ProxyError(f"Redirect to a host that is not allowed: {newurl}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+class ImageProxy:
+    """
+    Local cache of external images (seed data links to placehold.co and
+    mangatarem.gov.ph), served from our own origin as resized WebP/JPEG.
+
+    Templates pass external URLs through the `proxied` filter (or the
+    `picture` macro), which turns URLs on an allowlisted host into signed
+    /img/ URLs. The first request for a URL downloads the original once;
+    each requested width and format is rendered from it on demand. All
+    files live under `IMAGE_PROXY_CACHE_DIR`, whose total size is kept
+    under `IMAGE_PROXY_CACHE_BYTES` by deleting the least recently used
+    files (every hit refreshes a file's mtime).
+
+    URLs carry an HMAC of the source URL, width and format, so the route
+    cannot be used as an open proxy or to fill the cache with arbitrary
+    widths. Without Pillow the filter leaves URLs unchanged.
+    """
+
+    def __init__(self, app=None):
+        self.folder = None
+        self.hosts = ()
+        self.widths = (320, 640, 1024, 1600)
+        self.max_bytes = 256 * 1024 * 1024
+        self._size = None
+        self._meta = {}
+        self._url_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the cache and register the `proxied` filter and the
+        `remote_image_variants` template helper.
+
+        Args:
+            app: The Flask application.
+        """
+        self.folder = app.config.get('IMAGE_PROXY_CACHE_DIR') or os.path.join(app.instance_path, 'image_proxy')
+        self.hosts = tuple(h.lower() for h in app.config.get('IMAGE_PROXY_HOSTS', ()))
+        self.widths = tuple(sorted(app.config.get('IMAGE_VARIANT_WIDTHS', self.widths)))
+        self.max_bytes = app.config.get('IMAGE_PROXY_CACHE_BYTES', self.max_bytes)
+        self.max_source_bytes = app.config.get('IMAGE_PROXY_MAX_SOURCE_BYTES', 20 * 1024 * 1024)
+        self.timeout = app.config.get('IMAGE_PROXY_TIMEOUT', 10)
+        self.error_ttl = app.config.get('IMAGE_PROXY_ERROR_TTL', 300)
+        self.webp_quality = app.config.get('IMAGE_WEBP_QUALITY', 80)
+        self.jpeg_quality = app.config.get('IMAGE_JPEG_QUALITY', 82)
+        self.enabled = app.config.get('IMAGE_PROXY_ENABLED', True) and Image is not None
+        os.makedirs(self.folder, exist_ok=True)
+        app.add_template_filter(self.proxied, 'proxied')
+        app.add_template_global(self.variants, 'remote_image_variants')
+        app.extensions['image_proxy'] = self
+
+    def allowed(self, url):
+        """Return True for http(s) URLs on an allowlisted host."""
+        if not url:
+            return False
+        parts = urlsplit(url)
+        return parts.scheme in ('http', 'https') and (parts.hostname or '').lower() in self.hosts
+
+    def signature(self, url, width, fmt):
+        """Return the HMAC that authorizes proxying `url` at this width and format."""
+        key = current_app.config['SECRET_KEY'].encode('utf-8')
+        message = f"{width}:{fmt}:{url}".encode('utf-8')
+        return hmac.new(key, message, hashlib.sha256).hexdigest()[:20]
+
+    def proxy_url(self, url, width, fmt='jpg'):
+        return url_for('images.proxy', sig=self.signature(url, width, fmt), width=width, fmt=fmt, url=url)
+
+    def proxied(self, url, width=None):
+        """
+        Template filter: route an external image through the proxy.
+
+        Args:
+            url (str): Image URL as stored on the model.
+            width (int, optional): Target width; rounded up to a configured
+                variant width. Defaults to the largest one.
+
+        Returns:
+            str: A /img/ URL for allowlisted external images, otherwise `url` unchanged.
+        """
+        if not self.enabled or not self.allowed(url):
+            return url
+        target = next((w for w in self.widths if width and w >= width), self.widths[-1])
+        return self.proxy_url(url, target)
+
+    def variants(self, url):
+        """
+        Return WebP and JPEG srcsets of an external image, for the `picture` macro.
+
+        Returns:
+            dict: 'webp' and 'jpeg' srcsets plus the original 'width' and
+            'height' once the image has been fetched (None before that),
+            or None if the URL is not proxied. Images the proxy passes
+            through unchanged (SVG) get empty srcsets.
+        """
+        if not self.enabled or not self.allowed(url):
+            return None
+        meta = self._read_meta(url) or {}
+        if meta.get('passthrough'):
+            return {'width': None, 'height': None, 'webp': '', 'jpeg': ''}
+        return {
+            'width': meta.get('width'),
+            'height': meta.get('height'),
+            'webp': ', '.join(f"{self.proxy_url(url, w, 'webp')} {w}w" for w in self.widths),
+            'jpeg': ', '.join(f"{self.proxy_url(url, w, 'jpg')} {w}w" for w in self.widths),
+        }
+
+    def _key(self, url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _path(self, url, suffix):
+        key = self._key(url)
+        return os.path.join(self.folder, key[:2], f"{key}{suffix}")
+
+    def _read_meta(self, url):
+        path = self._path(url, '.json')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._meta.get(url)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._meta[url] = (mtime, meta)
+        return meta
+
+    def _url_lock(self, url):
+        # A fixed pool: two URLs may share a lock, but memory does not grow per URL
+        return self._url_locks[int(self._key(url)[:8], 16) % LOCK_STRIPES]
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+
+    def _fetch(self, url):
+        opener = urllib.request.build_opener(_AllowlistRedirectHandler(self))
+        req = urllib.request.Request(url, headers={'User-Agent': 'Mangatarem-ImageProxy/1.0', 'Accept': 'image/*'})
+        try:
+            with opener.open(req, timeout=self.timeout) as response:
+                content_type = response.headers.get_content_type()
+                if not content_type.startswith('image/'):
+                    raise ProxyError(f"Not an image ({content_type})")
+                chunks = []
+                received = 0
+                while True:
+                    chunk = response.read(READ_BUFFER_BYTES)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                    if received > self.max_source_bytes:
+                        raise ProxyError(f"Larger than {self.max_source_bytes} bytes")
+                    chunks.append(chunk)
+        except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as e:
+            # HTTPException covers a connection cut mid-body (IncompleteRead)
+            raise ProxyError(str(e))
+        return b''.join(chunks), content_type
+
+    def _source(self, url):
+        """Return the cached original (downloading it on first use) and its metadata."""
+        path = self._path(url, '.src')
+        meta = self._read_meta(url)
+        if meta is not None and os.path.exists(path):
+            return path, meta
+
+        error_path = self._path(url, '.err')
+        try:
+            if time.time() - os.stat(error_path).st_mtime < self.error_ttl:
+                raise ProxyError('Recent fetch failed')
+        except FileNotFoundError:
+            pass
+
+        started = time.monotonic()
+        try:
+            data, content_type = self._fetch(url)
+            if content_type == 'image/svg+xml':
+                meta = {'passthrough': True, 'content_type': content_type}
+            else:
+                try:
+                    img = Image.open(io.BytesIO(data))
+                    img.load()
+                except (OSError, Image.DecompressionBombError) as e:
+                    raise ProxyError(f"Unreadable image: {e}")
+                width, height = ImageOps.exif_transpose(img).size
+                meta = {'width': width, 'height': height, 'content_type': content_type}
+        except ProxyError as e:
+            self._write(error_path, str(e).encode('utf-8'))
+            print(f"=== IMAGE PROXY: Fetching {url} failed: {e} ===")
+            logger.warning(f"Image proxy could not fetch {url}: {e}")
+            raise
+
+        self._write(path, data)
+        self._write(self._path(url, '.json'), json.dumps(meta).encode('utf-8'))
+        print(f"=== IMAGE PROXY: Fetched {url} ({len(data) / 1024:.0f} KB) ===")
+        logger.info(f"Image proxy fetched {url}: {len(data)} bytes in {time.monotonic() - started:.2f}s")
+        return path, meta
+
+    def render(self, url, width, fmt):
+        """
+        Return a cached rendition of an external image, creating it if needed.
+
+        Args:
+            url (str): Allowlisted source URL.
+            width (int): One of the configured variant widths.
+            fmt (str): 'webp' or 'jpg'.
+
+        Returns:
+            tuple: (path of the file to send, its mimetype).
+
+        Raises:
+            ProxyError: The source could not be fetched or decoded.
+        """
+        with self._url_lock(url):
+            source, meta = self._source(url)
+            if meta.get('passthrough'):
+                os.utime(source)
+                return source, meta['content_type']
+
+            path = self._path(url, f"-{width}.{fmt}")
+            if os.path.exists(path):
+                os.utime(path)
+                os.utime(source)
+                return path, FORMATS[fmt]
+
+            img = ImageOps.exif_transpose(Image.open(source))
+            if img.width > width:
+                img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+            buffer = io.BytesIO()
+            if fmt == 'webp':
+                img.save(buffer, 'WEBP', quality=self.webp_quality, method=4)
+            else:
+                _flatten(img).save(buffer, 'JPEG', quality=self.jpeg_quality, optimize=True, progressive=True)
+            self._write(path, buffer.getvalue())
+            os.utime(source)
+        self._evict()
+        return path, FORMATS[fmt]
+
+    def _files(self):
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        """Delete least recently used files until the cache is back under 90% of its budget."""
+        with self._lock:
+            if self._size is not None and self._size <= self.max_bytes:
+                return
+            files = sorted(self._files(), key=lambda f: f[2])
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            if total > self.max_bytes:
+                target = self.max_bytes * 0.9
+                for path, size, _ in files:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    removed += 1
+            self._size = total
+        if removed:
+            logger.info(f"Image proxy evicted {removed} files; cache now {total / 1024 / 1024:.1f} MB")
+
+    def stats(self):
+        """Return the number of cached files and their total size in bytes."""
+        files = list(self._files())
+        return {'files': len(files), 'bytes': sum(size for _, size, _ in files)}
+
+    def clear(self):
+        """Delete every cached file."""
+        for path, _, _ in list(self._files()):
+            os.remove(path)
+        self._meta.clear()
+        with self._lock:
+            self._size = 0
+
+
+image_proxy = ImageProxy()
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from flask import Response, jsonify, request
+
+from utils.content_version import content_versions
+
+
+class VersionedJSONCache:
+    """
+    LRU cache of serialized JSON payloads keyed by content version.
+
+    Each entry remembers the versions of the content tags it was built
+    from; when any of them has been bumped the payload is rebuilt on the
+    next request. Responses carry a strong ETag (a hash of the body) and
+    answer matching `If-None-Match` requests with `304 Not Modified`.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, tags, build):
+        """
+        Return the cached (etag, body) for a key, rebuilding it if stale.
+
+        Args:
+            key: Hashable cache key (e.g. endpoint name plus normalized args).
+            tags (tuple): Content tags the payload depends on.
+            build (callable): Returns the JSON-serializable payload.
+
+        Returns:
+            tuple: (etag, body bytes).
+        """
+        versions = content_versions.snapshot(*tags)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+
+        payload = build()
+        body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()[:32]
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (versions, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag, body
+
+    def response(self, key, tags, build, max_age=0, not_found=None):
+        """
+        Build a conditional JSON response for a cached payload.
+
+        Args:
+            key: Hashable cache key.
+            tags (tuple): Content tags the payload depends on.
+            build (callable): Returns the JSON-serializable payload.
+            max_age (int): Seconds clients may reuse the response without revalidating.
+            not_found (str, optional): Error message answered with 404 when
+                build() returns None (the miss is cached like any payload).
+
+        Returns:
+            Response: 200 with the payload, 304 if the client's ETag
+            matches, or 404 for a missing item.
+        """
+        etag, body = self.get(key, tags, build)
+        if not_found is not None and body == b'null':
+            response = jsonify({'error': not_found})
+            response.status_code = 404
+            return response
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        if max_age == 0:
+            response.cache_control.must_revalidate = True
+        return response.make_conditional(request)
@@ -0,0 +1,310 @@
+import json
+import logging
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, update
+
+from models import db, GalleryItem, MediaJob
+from utils.content_version import content_versions
+from utils.uploads import MEDIA_TAG, relative_path, store_file, upload_folder
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class MediaError(Exception):
+    """An ffmpeg/ffprobe run that failed or produced unusable output."""
+
+
+def _command(config_key, default):
+    return shlex.split(current_app.config.get(config_key) or default)
+
+
+def _run(args):
+    timeout = current_app.config.get('MEDIA_JOB_TIMEOUT_SECONDS', 1800)
+    try:
+        result = subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+    except FileNotFoundError:
+        raise MediaError(f"{args[0]} not found; set FFMPEG_BINARY/FFPROBE_BINARY")
+    except subprocess.TimeoutExpired:
+        raise MediaError(f"{os.path.basename(args[0])} timed out after {timeout}s")
+    if result.returncode != 0:
+        raise MediaError(f"{os.path.basename(args[0])} exited with {result.returncode}: {result.stderr.strip()[-500:]}")
+    return result.stdout
+
+
+def probe(path):
+    """
+    Read the duration and frame size of a video with ffprobe.
+
+    Args:
+        path (str): Video file.
+
+    Returns:
+        dict: 'duration' (seconds, may be None), 'width' and 'height'.
+    """
+    output = _run(_command('FFPROBE_BINARY', 'ffprobe') + [
+        '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path
+    ])
+    try:
+        info = json.loads(output)
+    except ValueError:
+        raise MediaError('ffprobe returned invalid JSON')
+    video = next((s for s in info.get('streams', []) if s.get('codec_type') == 'video'), None)
+    if video is None:
+        raise MediaError('No video stream found')
+    duration = video.get('duration') or info.get('format', {}).get('duration')
+    return {
+        'duration': float(duration) if duration else None,
+        'width': int(video['width']),
+        'height': int(video['height']),
+    }
+
+
+def extract_poster(path, output, at):
+    """Write the frame at `at` seconds as a JPEG."""
+    _run(_command('FFMPEG_BINARY', 'ffmpeg') + [
+        '-y', '-v', 'error', '-ss', f'{at:.2f}', '-i', path, '-frames:v', '1', '-q:v', '3', output
+    ])
+
+
+def transcode(path, output, height, crf):
+    """Write an H.264/AAC MP4 at most `height` pixels high, ready for progressive playback."""
+    _run(_command('FFMPEG_BINARY', 'ffmpeg') + [
+        '-y', '-v', 'error', '-i', path,
+        '-vf', f"scale=-2:'min({height},ih)'",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(crf),
+        '-c:a', 'aac', '-b:a', '96k', '-movflags', '+faststart', output
+    ])
+
+
+def wants_processing(item):
+    """Return True for gallery videos stored in the upload folder (not external URLs)."""
+    return item.type == 'video' and relative_path(item.url) is not None
+
+
+def enqueue(item):
+    """
+    Queue poster, rendition and metadata extraction for a gallery video.
+
+    Call it whenever an item's file changes. It first clears what an
+    earlier job recorded for the previous file, so pages never show a
+    stale poster or rendition. Commits the session.
+
+    Args:
+        item (GalleryItem): A committed gallery item.
+
+    Returns:
+        MediaJob: The queued job, or None if the item needs no processing.
+    """
+    item.poster_url = item.rendition_url = None
+    item.duration = item.width = item.height = None
+    if not wants_processing(item):
+        db.session.commit()
+        return None
+    job = MediaJob(kind='video', gallery_item_id=item.id, source_url=item.url, status='queued',
+                   run_after=datetime.utcnow())
+    db.session.add(job)
+    db.session.commit()
+    print(f"=== MEDIA: Queued job {job.id} for gallery item {item.id} ===")
+    logger.info(f"Media job {job.id} queued for gallery item {item.id}")
+    return job
+
+
+def requeue_stale():
+    """Put back jobs whose worker died while running them (older than MEDIA_JOB_TIMEOUT_SECONDS)."""
+    timeout = current_app.config.get('MEDIA_JOB_TIMEOUT_SECONDS', 1800)
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout + 60)
+    result = db.session.execute(
+        update(MediaJob).where(MediaJob.status == 'running', MediaJob.started_at < cutoff)
+        .values(status='queued', worker=None, run_after=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def claim(worker):
+    """
+    Atomically take the next due job.
+
+    The conditional UPDATE only succeeds for one worker even when several
+    processes pick the same row, so no external broker or lock is needed.
+
+    Args:
+        worker (str): Worker name recorded on the job.
+
+    Returns:
+        MediaJob: The claimed job, now 'running', or None if nothing is due.
+    """
+    for _ in range(5):
+        job_id = db.session.execute(
+            db.select(MediaJob.id).where(MediaJob.status == 'queued', MediaJob.run_after <= datetime.utcnow())
+            .order_by(MediaJob.run_after, MediaJob.id).limit(1)
+        ).scalar()
+        if job_id is None:
+            return None
+        result = db.session.execute(
+            update(MediaJob).where(MediaJob.id == job_id, MediaJob.status == 'queued')
+            .values(status='running', worker=worker, started_at=datetime.utcnow(), attempts=MediaJob.attempts + 1)
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return db.session.get(MediaJob, job_id)
+    return None
+
+
+def _finish(job, error=None):
+    job.worker = None
+    job.error = error
+    if error is None:
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+    elif job.attempts < current_app.config.get('MEDIA_JOB_MAX_ATTEMPTS', 3):
+        # Exponential backoff: 1, 2, 4... times MEDIA_JOB_RETRY_SECONDS
+        delay = current_app.config.get('MEDIA_JOB_RETRY_SECONDS', 60) * 2 ** (job.attempts - 1)
+        job.status = 'queued'
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+    else:
+        job.status = 'failed'
+        job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def process(job):
+    """
+    Run one video job: probe, poster frame and lower-bitrate rendition.
+
+    The poster and rendition go through the normal upload storage (content
+    addressing, dedup, image variants for the poster), and the results are
+    recorded on the GalleryItem. Jobs for deleted items, or for a file that
+    has since been replaced, finish without doing anything.
+
+    Args:
+        job (MediaJob): A job claimed by this worker.
+    """
+    item = db.session.get(GalleryItem, job.gallery_item_id)
+    if item is None or item.url != job.source_url:
+        _finish(job)
+        logger.info(f"Media job {job.id} skipped: gallery item deleted or file replaced")
+        return
+
+    print(f"=== MEDIA: Processing job {job.id} (gallery item {item.id}, attempt {job.attempts}) ===")
+    started = time.monotonic()
+    try:
+        source = os.path.join(upload_folder(), relative_path(item.url))
+        if not os.path.exists(source):
+            raise MediaError(f"Source file missing: {item.url}")
+        info = probe(source)
+        height = current_app.config.get('MEDIA_RENDITION_HEIGHT', 720)
+        crf = current_app.config.get('MEDIA_RENDITION_CRF', 28)
+
+        with tempfile.TemporaryDirectory(prefix='media-job-') as workdir:
+            poster_path = os.path.join(workdir, 'poster.jpg')
+            at = min(1.0, info['duration'] / 2) if info['duration'] else 0
+            extract_poster(source, poster_path, at)
+            if not os.path.getsize(poster_path):
+                raise MediaError('ffmpeg wrote an empty poster frame')
+            poster_url = store_file(poster_path, 'jpg')
+
+            rendition_path = os.path.join(workdir, 'rendition.mp4')
+            transcode(source, rendition_path, height, crf)
+            # Keep the rendition only if it actually saves bandwidth
+            rendition_url = None
+            if 0 < os.path.getsize(rendition_path) < os.path.getsize(source):
+                rendition_url = store_file(rendition_path, 'mp4')
+
+        item.poster_url = poster_url
+        item.rendition_url = rendition_url
+        item.duration = info['duration']
+        item.width = info['width']
+        item.height = info['height']
+        _finish(job)
+        content_versions.bump(MEDIA_TAG)
+        elapsed = time.monotonic() - started
+        print(f"=== MEDIA: Job {job.id} done in {elapsed:.1f}s ===")
+        logger.info(f"Media job {job.id} done in {elapsed:.1f}s: {info['width']}x{info['height']}, "
+                    f"{info['duration']}s, rendition {'kept' if rendition_url else 'skipped'}")
+    except Exception as e:
+        db.session.rollback()
+        error = str(e) if isinstance(e, MediaError) else repr(e)
+        _finish(job, error=error)
+        print(f"=== MEDIA: Job {job.id} failed ({job.status}): {error} ===")
+        logger.warning(f"Media job {job.id} attempt {job.attempts} failed, now {job.status}: {error}")
+
+
+def run_worker(once=False, name=None):
+    """
+    Process media jobs until stopped (SIGINT/SIGTERM finish the current job first).
+
+    Args:
+        once (bool): Exit as soon as the queue has no due job.
+        name (str, optional): Worker name; defaults to host:pid.
+
+    Returns:
+        int: Number of jobs processed.
+    """
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    poll = current_app.config.get('MEDIA_WORKER_POLL_SECONDS', 5)
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        logger.info(f"Media worker {name} stopping after the current job")
+
+    previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+    processed = 0
+    logger.info(f"Media worker {name} started")
+    try:
+        requeue_stale()
+        while not stopping:
+            job = claim(name)
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll)
+                requeue_stale()
+                continue
+            # store_file() builds URLs with url_for, which needs a request context
+            with current_app.test_request_context():
+                process(job)
+            processed += 1
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    logger.info(f"Media worker {name} exiting after {processed} jobs")
+    return processed
+
+
+def retry_failed():
+    """Queue every failed job again with a fresh attempt count; returns how many."""
+    result = db.session.execute(
+        update(MediaJob).where(MediaJob.status == 'failed')
+        .values(status='queued', attempts=0, run_after=datetime.utcnow(), finished_at=None)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def enqueue_missing():
+    """Queue uploaded videos that have no poster and no queued or running job; returns how many."""
+    pending = db.select(MediaJob.gallery_item_id).where(MediaJob.status.in_(('queued', 'running')))
+    items = GalleryItem.query.filter(
+        GalleryItem.type == 'video', GalleryItem.poster_url.is_(None), GalleryItem.id.not_in(pending)
+    ).all()
+    return sum(enqueue(item) is not None for item in items)
+
+
+def status_counts():
+    """Return the number of media jobs in each status."""
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(db.session.query(MediaJob.status, func.count()).group_by(MediaJob.status).all())
+    return counts
@@ -0,0 +1,331 @@
+import logging
+
+from sqlalchemy import create_engine, inspect, text
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Ordered list of (version, description, function). `db.create_all()` only
+# creates missing tables, so anything that changes an existing table (new
+# columns, indexes, triggers, virtual tables) goes here instead. The
+# current version is stored in SQLite's `PRAGMA user_version`. Migrations
+# must be idempotent because fresh databases already get new tables,
+# columns and indexes from `db.create_all()` before they run. They spell
+# out their own DDL instead of reading the models, which keep changing
+# after a migration is written: an index declared today may need a column
+# that only a later migration adds.
+MIGRATIONS = []
+
+# Tables as they were before the first migration (schema version 0), used
+# by check_upgrade() to replay the whole migration history.
+BASELINE_SCHEMA = [
+    """CREATE TABLE user (
+        id INTEGER NOT NULL,
+        username VARCHAR(80) NOT NULL,
+        email VARCHAR(120) NOT NULL,
+        password_hash VARCHAR(128),
+        role VARCHAR(20),
+        barangay VARCHAR(100),
+        is_approved BOOLEAN,
+        PRIMARY KEY (id),
+        UNIQUE (username),
+        UNIQUE (email)
+    )""",
+    """CREATE TABLE attraction (
+        id INTEGER NOT NULL,
+        name VARCHAR(100) NOT NULL,
+        description TEXT NOT NULL,
+        category VARCHAR(50) NOT NULL,
+        barangay VARCHAR(100),
+        lat FLOAT NOT NULL,
+        lng FLOAT NOT NULL,
+        image_url VARCHAR(200),
+        status VARCHAR(20),
+        user_id INTEGER,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES user (id)
+    )""",
+    """CREATE TABLE event (
+        id INTEGER NOT NULL,
+        title VARCHAR(100) NOT NULL,
+        description TEXT NOT NULL,
+        date DATETIME NOT NULL,
+        location VARCHAR(100) NOT NULL,
+        barangay VARCHAR(100),
+        image_url VARCHAR(200),
+        user_id INTEGER,
+        status VARCHAR(20),
+        category VARCHAR(50) NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES user (id)
+    )""",
+    """CREATE TABLE gallery_item (
+        id INTEGER NOT NULL,
+        type VARCHAR(20) NOT NULL,
+        url VARCHAR(200) NOT NULL,
+        caption VARCHAR(200),
+        user_id INTEGER,
+        status VARCHAR(20),
+        uploaded_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES user (id)
+    )""",
+    """CREATE TABLE barangay_info (
+        id INTEGER NOT NULL,
+        barangay_name VARCHAR(100) NOT NULL,
+        history TEXT,
+        cultural_assets TEXT,
+        traditions TEXT,
+        local_practices TEXT,
+        unique_features TEXT,
+        user_id INTEGER,
+        updated_at DATETIME,
+        PRIMARY KEY (id),
+        UNIQUE (barangay_name),
+        FOREIGN KEY(user_id) REFERENCES user (id)
+    )""",
+    """CREATE TABLE page_view (
+        id INTEGER NOT NULL,
+        view_type VARCHAR(50) NOT NULL,
+        item_id INTEGER,
+        page_name VARCHAR(100),
+        timestamp DATETIME,
+        user_id INTEGER,
+        PRIMARY KEY (id)
+    )""",
+]
+
+
+def migration(version, description):
+    """Register a schema migration function under a version number."""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def current_version(conn):
+    """Return the schema version recorded in the database."""
+    return conn.execute(text('PRAGMA user_version')).scalar() or 0
+
+
+def latest_version():
+    """Return the version the code expects."""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def add_column_if_missing(conn, table, column, ddl):
+    """
+    Add a column to an existing table unless it is already there.
+
+    Args:
+        conn: SQLAlchemy connection.
+        table (str): Table name.
+        column (str): Column name.
+        ddl (str): Column type and constraints, e.g. 'VARCHAR(200)'.
+    """
+    columns = {c['name'] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def create_index(conn, name, table, *columns):
+    """
+    Create an index unless one with the same name exists.
+
+    Args:
+        conn: SQLAlchemy connection.
+        name (str): Index name, matching the one declared on the model.
+        table (str): Table name.
+        *columns (str): Indexed columns, in order.
+    """
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})'))
+
+
+def upgrade(engine=None):
+    """
+    Apply all pending migrations, one transaction per migration.
+
+    Args:
+        engine: Database to upgrade (default: the app's database).
+
+    Returns:
+        list: Versions that were applied.
+    """
+    engine = engine or db.engine
+    applied = []
+    with engine.begin() as conn:
+        version = current_version(conn)
+
+    for target, description, func in MIGRATIONS:
+        if target <= version:
+            continue
+        with engine.begin() as conn:
+            func(conn)
+            conn.execute(text(f'PRAGMA user_version = {int(target)}'))
+        print(f"Applied migration {target}: {description}")
+        logger.info(f"Applied schema migration {target}: {description}")
+        applied.append(target)
+        version = target
+
+    return applied
+
+
+def check_upgrade():
+    """
+    Upgrade a scratch database from the version 0 schema and compare it with the models.
+
+    Replays what startup does on an old database: `create_all()` adds the
+    tables that did not exist yet, then every migration runs in order.
+
+    Returns:
+        list: Columns and indexes declared on the models but missing after
+            the upgrade; empty if the upgrade is complete.
+    """
+    engine = create_engine('sqlite://')
+    try:
+        with engine.begin() as conn:
+            for statement in BASELINE_SCHEMA:
+                conn.execute(text(statement))
+        db.metadata.create_all(engine)
+        upgrade(engine)
+
+        problems = []
+        inspector = inspect(engine)
+        for table in db.metadata.sorted_tables:
+            columns = {c['name'] for c in inspector.get_columns(table.name)}
+            problems += [f"{table.name}.{c.name}: column missing" for c in table.columns if c.name not in columns]
+            indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            problems += [f"{table.name}.{i.name}: index missing" for i in table.indexes if i.name not in indexes]
+        return problems
+    finally:
+        engine.dispose()
+
+
+@migration(1, 'Composite indexes on status/barangay/user/date access paths')
+def _composite_indexes(conn):
+    create_index(conn, 'ix_user_barangay_role', 'user', 'barangay', 'role', 'is_approved')
+    create_index(conn, 'ix_attraction_status_barangay', 'attraction', 'status', 'barangay')
+    create_index(conn, 'ix_attraction_status_created', 'attraction', 'status', 'created_at')
+    create_index(conn, 'ix_attraction_user_created', 'attraction', 'user_id', 'created_at')
+    create_index(conn, 'ix_attraction_created', 'attraction', 'created_at')
+    create_index(conn, 'ix_event_status_date', 'event', 'status', 'date')
+    create_index(conn, 'ix_event_barangay_status_date', 'event', 'barangay', 'status', 'date')
+    create_index(conn, 'ix_event_user_date', 'event', 'user_id', 'date')
+    create_index(conn, 'ix_gallery_item_status_uploaded', 'gallery_item', 'status', 'uploaded_at')
+    create_index(conn, 'ix_gallery_item_user_uploaded', 'gallery_item', 'user_id', 'uploaded_at')
+    create_index(conn, 'ix_page_view_type_item', 'page_view', 'view_type', 'item_id')
+    create_index(conn, 'ix_page_view_timestamp', 'page_view', 'timestamp')
+
+
+@migration(2, 'R*Tree spatial index on attraction coordinates')
+def _attraction_rtree(conn):
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS attraction_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)",
+        """CREATE TRIGGER IF NOT EXISTS attraction_rtree_insert AFTER INSERT ON attraction BEGIN
+            INSERT OR REPLACE INTO attraction_rtree VALUES (new.id, new.lat, new.lat, new.lng, new.lng);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS attraction_rtree_update AFTER UPDATE OF lat, lng ON attraction BEGIN
+            INSERT OR REPLACE INTO attraction_rtree VALUES (new.id, new.lat, new.lat, new.lng, new.lng);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS attraction_rtree_delete AFTER DELETE ON attraction BEGIN
+            DELETE FROM attraction_rtree WHERE id = old.id;
+        END""",
+        """INSERT OR REPLACE INTO attraction_rtree (id, min_lat, max_lat, min_lng, max_lng)
+            SELECT id, lat, lat, lng, lng FROM attraction""",
+    ]
+    try:
+        conn.execute(text("CREATE VIRTUAL TABLE temp.rtree_probe USING rtree(id, a, b)"))
+        conn.execute(text("DROP TABLE temp.rtree_probe"))
+    except Exception as e:
+        # SQLite builds without the R*Tree module use the in-memory grid in utils/spatial.py
+        print(f"R*Tree module unavailable, using in-memory spatial index: {e}")
+        logger.warning(f"R*Tree module unavailable, using in-memory spatial index: {e}")
+        return
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+# Rows of the search index are keyed by rowid = item id * 4 + kind, so
+# triggers and queries can address one source row without a table scan.
+# The kind codes must match SEARCH_KINDS in utils/search.py.
+SEARCH_SOURCES = {
+    'attraction': (0, "new.name",
+                   "coalesce(new.description, '')",
+                   "coalesce(new.category, '') || ' ' || coalesce(new.barangay, '')",
+                   "name, description, category, barangay"),
+    'event': (1, "new.title",
+              "coalesce(new.description, '')",
+              "coalesce(new.category, '') || ' ' || coalesce(new.location, '') || ' ' || coalesce(new.barangay, '')",
+              "title, description, category, location, barangay"),
+    'gallery_item': (2, "coalesce(new.caption, '')", "''", "new.type", "caption, type"),
+    'barangay_info': (3, "new.barangay_name",
+                      "coalesce(new.history, '') || ' ' || coalesce(new.cultural_assets, '') || ' ' || "
+                      "coalesce(new.traditions, '') || ' ' || coalesce(new.local_practices, '') || ' ' || "
+                      "coalesce(new.unique_features, '')",
+                      "''",
+                      "barangay_name, history, cultural_assets, traditions, local_practices, unique_features"),
+}
+
+
+@migration(3, 'FTS5 search index over attractions, events, gallery captions and barangay info')
+def _search_index(conn):
+    try:
+        conn.execute(text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(a)"))
+        conn.execute(text("DROP TABLE temp.fts5_probe"))
+    except Exception as e:
+        # utils/search.py falls back to LIKE queries without the index
+        print(f"FTS5 module unavailable, search will use LIKE queries: {e}")
+        logger.warning(f"FTS5 module unavailable, search will use LIKE queries: {e}")
+        return
+
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "title, body, tags, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ))
+    for table, (kind, title, body, tags, columns) in SEARCH_SOURCES.items():
+        values = f"(new.id * 4 + {kind}, {title}, {body}, {tags})"
+        conn.execute(text(f"""CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO search_index (rowid, title, body, tags) VALUES {values};
+        END"""))
+        conn.execute(text(f"""CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {columns} ON {table} BEGIN
+            DELETE FROM search_index WHERE rowid = old.id * 4 + {kind};
+            INSERT INTO search_index (rowid, title, body, tags) VALUES {values};
+        END"""))
+        conn.execute(text(f"""CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM search_index WHERE rowid = old.id * 4 + {kind};
+        END"""))
+        select_values = values.replace('new.', '')
+        conn.execute(text(
+            f"INSERT OR IGNORE INTO search_index (rowid, title, body, tags) "
+            f"SELECT {select_values[1:-1]} FROM {table} WHERE id * 4 + {kind} NOT IN (SELECT rowid FROM search_index)"
+        ))
+
+
+@migration(4, 'Poster, rendition and video metadata columns on gallery_item')
+def _gallery_video_columns(conn):
+    add_column_if_missing(conn, 'gallery_item', 'poster_url', 'VARCHAR(200)')
+    add_column_if_missing(conn, 'gallery_item', 'rendition_url', 'VARCHAR(200)')
+    add_column_if_missing(conn, 'gallery_item', 'duration', 'FLOAT')
+    add_column_if_missing(conn, 'gallery_item', 'width', 'INTEGER')
+    add_column_if_missing(conn, 'gallery_item', 'height', 'INTEGER')
+
+
+@migration(5, 'Registration time on user, pending-event index for the moderation queue')
+def _moderation_queue(conn):
+    add_column_if_missing(conn, 'user', 'created_at', 'DATETIME')
+    create_index(conn, 'ix_event_status_created', 'event', 'status', 'created_at')
+
+
+@migration(6, 'Date index on event for the paginated admin event list')
+def _event_date_index(conn):
+    create_index(conn, 'ix_event_date', 'event', 'date')
+
+
+@migration(7, 'Pending-user index for the moderation queue')
+def _pending_user_index(conn):
+    create_index(conn, 'ix_user_role_approved_created', 'user', 'role', 'is_approved', 'created_at')
@@ -0,0 +1,251 @@
+import base64
+import binascii
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app, render_template
+from sqlalchemy import func, literal, null, tuple_, union_all
+
+from models import db, User, Attraction, Event, GalleryItem
+from utils.email_sender import mailer
+
+logger = logging.getLogger(__name__)
+
+# Sort key for rows without a submission time (users registered before it was tracked)
+EPOCH = datetime(1970, 1, 1)
+
+ACTIONS = ('approve', 'reject')
+
+
+class ModerationError(Exception):
+    """A moderation request that cannot be applied, with the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _pending_users():
+    return db.select(
+        literal('user').label('kind'), User.id.label('id'), User.username.label('title'),
+        func.coalesce(User.created_at, EPOCH).label('submitted_at'), User.id.label('user_id'),
+        null().label('image_url')
+    ).where(User.role == 'contributor', User.is_approved.is_(False))
+
+
+def _pending_attractions():
+    return db.select(
+        literal('attraction').label('kind'), Attraction.id, Attraction.name,
+        func.coalesce(Attraction.created_at, EPOCH), Attraction.user_id, Attraction.image_url
+    ).where(Attraction.status == 'pending')
+
+
+def _pending_events():
+    return db.select(
+        literal('event').label('kind'), Event.id, Event.title,
+        func.coalesce(Event.created_at, EPOCH), Event.user_id, Event.image_url
+    ).where(Event.status == 'pending')
+
+
+def _pending_gallery():
+    return db.select(
+        literal('gallery').label('kind'), GalleryItem.id, func.coalesce(GalleryItem.caption, GalleryItem.type),
+        func.coalesce(GalleryItem.uploaded_at, EPOCH), GalleryItem.user_id,
+        func.coalesce(GalleryItem.poster_url, GalleryItem.url)
+    ).where(GalleryItem.status == 'pending')
+
+
+# Content type -> (model, select of its pending rows in the common queue shape)
+QUEUES = {
+    'user': (User, _pending_users),
+    'attraction': (Attraction, _pending_attractions),
+    'event': (Event, _pending_events),
+    'gallery': (GalleryItem, _pending_gallery),
+}
+
+
+def encode_cursor(row):
+    """Return the opaque cursor that continues after a queue row."""
+    key = json.dumps([row.submitted_at.isoformat(), row.kind, row.id])
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (submitted_at, kind, id) key encoded in a cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        submitted_at, kind, id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(submitted_at), str(kind), int(id)
+    except (ValueError, TypeError, binascii.Error):
+        raise ModerationError('Invalid cursor.')
+
+
+def pending_counts(kinds=None):
+    """Return the number of pending items of each content type."""
+    return {kind: db.session.execute(db.select(func.count()).select_from(QUEUES[kind][1]().subquery())).scalar()
+            for kind in (kinds or QUEUES)}
+
+
+def queue_query(kinds=None, after=None):
+    """
+    Return the moderation queue as one UNION ALL select, oldest first.
+
+    Args:
+        kinds (list, optional): Content types to include (default: all).
+        after (tuple, optional): (submitted_at, kind, id) key to continue after.
+
+    Returns:
+        Select: Rows with kind, id, title, submitted_at, user_id and image_url.
+    """
+    queue = union_all(*(QUEUES[kind][1]() for kind in (kinds or QUEUES))).subquery()
+    query = db.select(queue)
+    if after is not None:
+        query = query.where(tuple_(queue.c.submitted_at, queue.c.kind, queue.c.id) > after)
+    return query.order_by(queue.c.submitted_at, queue.c.kind, queue.c.id)
+
+
+def pending_page(kinds=None, cursor=None, limit=50):
+    """
+    Return one page of the moderation queue, oldest submissions first.
+
+    Pending users, attractions, events and gallery items are merged in a
+    single UNION ALL query ordered by (submitted_at, kind, id). The cursor
+    is that key of the last row, so each page costs the same however deep
+    into the backlog it is.
+
+    Args:
+        kinds (list, optional): Content types to include (default: all).
+        cursor (str, optional): `next_cursor` of the previous page.
+        limit (int): Page size.
+
+    Returns:
+        dict: 'items' (dicts with type, id, title, submitted_at, image_url
+        and the submitter) and 'next_cursor' (None on the last page).
+    """
+    query = queue_query(kinds, decode_cursor(cursor) if cursor else None)
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    page = rows[:limit]
+
+    user_ids = {row.user_id for row in page if row.user_id is not None}
+    users = {u.id: u for u in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+    items = []
+    for row in page:
+        submitter = users.get(row.user_id)
+        item = {
+            'type': row.kind,
+            'id': row.id,
+            'title': row.title,
+            'submitted_at': row.submitted_at.isoformat() if row.submitted_at != EPOCH else None,
+            'image_url': row.image_url,
+            'submitted_by': submitter.username if submitter else None,
+            'barangay': submitter.barangay if submitter else None,
+        }
+        if row.kind == 'user' and submitter is not None:
+            item['email'] = submitter.email
+        items.append(item)
+
+    return {
+        'items': items,
+        'next_cursor': encode_cursor(page[-1]) if len(rows) > limit else None
+    }
+
+
+def notify_user_approved(user):
+    """Queue the "account approved" email; it is sent once the caller commits."""
+    mailer.enqueue('Your GoMangatarem contributor account is approved', user.email,
+                   render_template('email/user_approved.txt', user=user))
+
+
+def notify_attraction_approved(attraction):
+    """Queue the "attraction approved" email to the contributor who submitted it."""
+    submitter = db.session.get(User, attraction.user_id) if attraction.user_id else None
+    if submitter is not None and submitter.role != 'admin':
+        mailer.enqueue(f'Your attraction "{attraction.name}" is approved', submitter.email,
+                       render_template('email/attraction_approved.txt', user=submitter, attraction=attraction))
+
+
+def _is_pending(obj):
+    if isinstance(obj, User):
+        return obj.role == 'contributor' and not obj.is_approved
+    return obj.status == 'pending'
+
+
+def _approve(obj):
+    if isinstance(obj, User):
+        obj.is_approved = True
+        notify_user_approved(obj)
+    else:
+        obj.status = 'approved'
+        if isinstance(obj, Attraction):
+            notify_attraction_approved(obj)
+
+
+def apply_bulk(action, items):
+    """
+    Approve or reject many pending submissions in one transaction.
+
+    Rejecting deletes the submission, as the single-item reject routes do.
+    Items that are no longer pending (handled by another admin meanwhile)
+    are skipped rather than failing the batch. Everything is committed
+    once, so caches see a single invalidation per content type.
+
+    Args:
+        action (str): 'approve' or 'reject'.
+        items (list): Dicts with 'type' (user, attraction, event, gallery) and 'id'.
+
+    Returns:
+        dict: 'applied', 'skipped' (no longer pending) and 'missing' lists
+        of {'type', 'id'} dicts.
+
+    Raises:
+        ModerationError: Unknown action or type, malformed ids, or more
+            items than `MODERATION_BULK_MAX`.
+    """
+    if action not in ACTIONS:
+        raise ModerationError(f"Action must be one of: {', '.join(ACTIONS)}.")
+    if not isinstance(items, list) or not items:
+        raise ModerationError('Provide a non-empty list of items.')
+    max_items = current_app.config.get('MODERATION_BULK_MAX', 500)
+    if len(items) > max_items:
+        raise ModerationError(f"At most {max_items} items per request.", 413)
+
+    ids = defaultdict(set)
+    for item in items:
+        kind = item.get('type') if isinstance(item, dict) else None
+        if kind not in QUEUES:
+            raise ModerationError(f"Unknown item type: {kind!r}.")
+        try:
+            ids[kind].add(int(item.get('id')))
+        except (TypeError, ValueError):
+            raise ModerationError(f"Invalid id for {kind}: {item.get('id')!r}.")
+
+    result = {'applied': [], 'skipped': [], 'missing': []}
+    try:
+        for kind, wanted in ids.items():
+            model = QUEUES[kind][0]
+            found = {obj.id: obj for obj in model.query.filter(model.id.in_(wanted))}
+            for id in sorted(wanted):
+                obj = found.get(id)
+                if obj is None:
+                    result['missing'].append({'type': kind, 'id': id})
+                elif not _is_pending(obj):
+                    result['skipped'].append({'type': kind, 'id': id})
+                else:
+                    if action == 'approve':
+                        _approve(obj)
+                    else:
+                        db.session.delete(obj)
+                    result['applied'].append({'type': kind, 'id': id})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    print(f"=== MODERATION: Bulk {action} of {len(result['applied'])} items "
+          f"({len(result['skipped'])} skipped, {len(result['missing'])} missing) ===")
+    logger.info(f"Bulk {action}: {len(result['applied'])} applied, {len(result['skipped'])} skipped, "
+                f"{len(result['missing'])} missing")
+    return result
@@ -0,0 +1,327 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request, session
+from flask_login import current_user
+from markupsafe import Markup
+
+from utils.content_version import content_versions
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """In-process LRU cache with a cap on both entry count and total bytes."""
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, size):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old['size']
+            entry['size'] = size
+            self._entries[key] = entry
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted['size']
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class FileSystemBackend:
+    """
+    One pickle file per entry; shared by every worker process on the host.
+
+    The files are kept under `max_bytes` in total by deleting the least
+    recently used ones (every hit refreshes a file's mtime).
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache')
+
+    def get(self, key):
+        path = self._file(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path)
+            return entry
+        except (OSError, pickle.PickleError, EOFError):
+            return None
+
+    def set(self, key, entry, size):
+        path = self._file(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += os.path.getsize(path)
+        self._evict()
+
+    def _files(self):
+        for name in os.listdir(self.path):
+            if not name.endswith('.cache'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except FileNotFoundError:
+                continue
+            yield os.path.join(self.path, name), st.st_size, st.st_mtime
+
+    def _evict(self):
+        """Delete least recently used entries until the folder is back under 90% of its budget."""
+        with self._lock:
+            # Other processes write here too, so the running total is only
+            # an estimate; the folder is rescanned whenever it goes over
+            if self._size is not None and self._size <= self.max_bytes:
+                return
+            files = sorted(self._files(), key=lambda f: f[2])
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            if total > self.max_bytes:
+                target = self.max_bytes * 0.9
+                for path, size, _ in files:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    removed += 1
+            self._size = total
+        if removed:
+            logger.info(f"Page cache evicted {removed} files; cache now {total / 1024 / 1024:.1f} MB")
+
+    def clear(self):
+        for path, _, _ in list(self._files()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._size = 0
+
+
+class RedisBackend:
+    """Redis (or any Redis-compatible server); requires the optional `redis` package."""
+
+    def __init__(self, url, prefix='page_cache:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return pickle.loads(data) if data else None
+
+    def set(self, key, entry, size):
+        ttl = max(int(entry['expires'] - time.time()), 1)
+        self.client.set(self.prefix + key, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL), ex=ttl)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class PageCache:
+    """
+    Cache of rendered public pages and page fragments.
+
+    Entries are keyed by host, path and the query arguments the page reads
+    plus who is asking (anonymous, or the logged-in user's id) and remember
+    the content versions of the tags they were rendered from; an approval,
+    edit or delete bumps a tag (see utils/content_version.py) and every
+    entry built from it becomes a miss. A TTL bounds how long anything else
+    that a page shows (e.g. "upcoming" dates) can go stale.
+
+    Requests with pending flash messages are never cached, since the
+    flashes are rendered into the page and consumed by it. Requests with
+    other query arguments (e.g. ?utm_source=...) are served the cached
+    page, but a page rendered for one is not stored: it would carry the
+    arguments in its canonical URL, and any client could otherwise fill
+    the cache with one entry per made-up argument.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.enabled = True
+        self.default_ttl = 300
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Create the configured backend.
+
+        Config:
+            PAGE_CACHE_ENABLED (bool): Turn the cache off entirely.
+            PAGE_CACHE_BACKEND (str): 'memory' (default), 'filesystem' or 'redis'.
+            PAGE_CACHE_TTL (int): Seconds an entry may be served.
+            PAGE_CACHE_MAX_ENTRIES (int): Memory backend entry limit.
+            PAGE_CACHE_MAX_BYTES (int): Memory and filesystem backend size limit.
+            PAGE_CACHE_DIR (str): Filesystem backend folder (default instance/page_cache).
+            PAGE_CACHE_REDIS_URL (str): Redis backend URL.
+        """
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        self.default_ttl = app.config.get('PAGE_CACHE_TTL', 300)
+        backend = app.config.get('PAGE_CACHE_BACKEND', 'memory')
+        if backend == 'filesystem':
+            self.backend = FileSystemBackend(
+                app.config.get('PAGE_CACHE_DIR') or os.path.join(app.instance_path, 'page_cache'),
+                max_bytes=app.config.get('PAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+            )
+        elif backend == 'redis':
+            try:
+                self.backend = RedisBackend(app.config.get('PAGE_CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+            except ImportError:
+                print("=== PAGE CACHE: redis package not installed, using in-memory cache ===")
+                logger.warning("PAGE_CACHE_BACKEND is 'redis' but the redis package is not installed")
+                backend = 'memory'
+        if backend == 'memory':
+            self.backend = MemoryBackend(
+                max_entries=app.config.get('PAGE_CACHE_MAX_ENTRIES', 512),
+                max_bytes=app.config.get('PAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+            )
+        app.extensions['page_cache'] = self
+        logger.info(f"Page cache using {type(self.backend).__name__}")
+
+    def _request_key(self, name=None, args=()):
+        user = f"user:{current_user.get_id()}" if current_user.is_authenticated else 'anonymous'
+        args = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)) if k in args)
+        return f"{name or ''}|{request.host_url}{request.path}?{args}|{user}"
+
+    def _storable(self, args):
+        return '_flashes' not in session and all(k in args for k in request.args)
+
+    def _usable(self):
+        return self.enabled and self.backend is not None and '_flashes' not in session
+
+    def _lookup(self, key, tags):
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Page cache read failed: {e}")
+            return None
+        if entry is None or entry['expires'] < time.time() or entry['versions'] != content_versions.snapshot(*tags):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def _store(self, key, versions, ttl, entry, size):
+        entry['expires'] = time.time() + (ttl or self.default_ttl)
+        entry['versions'] = versions
+        try:
+            self.backend.set(key, entry, size)
+        except Exception as e:
+            logger.warning(f"Page cache write failed: {e}")
+
+    def page(self, tags, render, ttl=None, args=()):
+        """
+        Return the cached response for this request, or render and cache it.
+
+        Args:
+            tags (tuple): Content tags the page is built from.
+            render (callable): Builds the page; may return a string or a
+                Response. Only 200 responses are cached.
+            ttl (int, optional): Seconds to keep the entry.
+            args (tuple): Query arguments the page reads; other ones are
+                left out of the key.
+
+        Returns:
+            Response: The page.
+        """
+        # Read versions before rendering, so a change committed mid-render
+        # is stored as stale rather than hiding behind a newer version
+        versions = content_versions.snapshot(*tags)
+        if not self._usable():
+            return render()
+
+        key = self._request_key(args=args)
+        entry = self._lookup(key, tags)
+        if entry is not None:
+            response = Response(entry['body'], status=200, mimetype=entry['mimetype'])
+            response.headers['X-Page-Cache'] = 'HIT'
+            return response
+
+        result = render()
+        response = result if isinstance(result, Response) else Response(result, mimetype='text/html')
+        if response.status_code == 200 and not response.direct_passthrough and self._storable(args):
+            body = response.get_data()
+            self._store(key, versions, ttl, {'body': body, 'mimetype': response.mimetype}, len(body))
+        response.headers['X-Page-Cache'] = 'MISS'
+        return response
+
+    def fragment(self, name, tags, render, ttl=None, per_request=False, args=()):
+        """
+        Return a cached HTML fragment, or render and cache it.
+
+        Args:
+            name (str): Fragment name, unique across the app.
+            tags (tuple): Content tags the fragment is built from.
+            render (callable): Returns the fragment's HTML.
+            ttl (int, optional): Seconds to keep the entry.
+            per_request (bool): Key the fragment by path, query arguments
+                and user like a page; by default it is shared by all pages.
+            args (tuple): Query arguments a per-request fragment reads.
+
+        Returns:
+            Markup: The fragment.
+        """
+        if not self.enabled or self.backend is None:
+            return Markup(render())
+        key = self._request_key(name, args) if per_request else f"fragment:{name}"
+        entry = self._lookup(key, tags)
+        if entry is not None:
+            return Markup(entry['body'])
+        versions = content_versions.snapshot(*tags)
+        html = str(render())
+        if not per_request or self._storable(args):
+            self._store(key, versions, ttl, {'body': html, 'mimetype': 'text/html'}, len(html))
+        return Markup(html)
+
+    def clear(self):
+        """Drop every cached page and fragment."""
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        """Return hit/miss counters for this process."""
+        return {'hits': self.hits, 'misses': self.misses, 'backend': type(self.backend).__name__}
+
+
+page_cache = PageCache()
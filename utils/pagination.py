@@ -0,0 +1,218 @@
+import base64
+import binascii
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import abort, current_app, request
+from sqlalchemy import DateTime, tuple_
+
+from utils.content_version import content_versions
+
+
+class Page:
+    """One page of a keyset-paginated listing, as passed to templates."""
+
+    def __init__(self, items, total, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.total = total
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(item, columns):
+    """Return the opaque cursor holding an item's values of the sort columns."""
+    values = []
+    for column in columns:
+        value = getattr(item, column.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """
+    Return the sort-column values encoded in a cursor.
+
+    Raises:
+        ValueError: The cursor is malformed or was made for other columns.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode((cursor + '=' * (-len(cursor) % 4)).encode('ascii')))
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(str(e))
+    if not isinstance(values, list) or len(values) != len(columns) or None in values:
+        raise ValueError('cursor does not match the sort columns')
+    return tuple(datetime.fromisoformat(v) if isinstance(c.type, DateTime) else v
+                 for v, c in zip(values, columns))
+
+
+def keyset_query(query, columns, values=None, descending=False, backwards=False):
+    """
+    Order a query by `columns` and start it just past a position.
+
+    Rows are selected with a row-value comparison on the sort key, e.g.
+    `(created_at, id) < (:created_at, :id)`, which an index on the sort
+    columns answers by seeking straight to the position. Unlike OFFSET,
+    the cost does not grow with how deep the page is.
+
+    Args:
+        query: ORM query with its filters applied, not yet ordered.
+        columns (tuple): Sort columns, e.g. (Attraction.created_at, Attraction.id).
+        values (tuple, optional): Sort key to continue from (default: the start).
+        descending (bool): Sort newest/largest first.
+        backwards (bool): Read the rows before `values`, nearest first.
+
+    Returns:
+        The filtered and ordered query.
+    """
+    key = tuple_(*columns)
+    if values is not None:
+        query = query.filter(key < values if descending != backwards else key > values)
+    reverse = descending != backwards
+    return query.order_by(*(c.desc() if reverse else c.asc() for c in columns))
+
+
+def keyset_page(query, columns, descending=False, after=None, before=None, per_page=25, total=None):
+    """
+    Fetch one page of a query ordered by `columns`, continuing from a cursor.
+
+    The last sort column must be unique (normally the primary key) so every
+    row has its own position, and none of them may be NULL.
+
+    Args:
+        query: ORM query with its filters applied, not yet ordered.
+        columns (tuple): Sort columns, e.g. (Attraction.created_at, Attraction.id).
+        descending (bool): Sort newest/largest first.
+        after (str, optional): Cursor of the last row of the previous page.
+        before (str, optional): Cursor of the first row of the following
+            page, to go back; ignored if `after` is given.
+        per_page (int): Page size.
+        total (int, optional): Row count shown by the pager; see cached_count().
+
+    Returns:
+        Page: The rows plus cursors for the next and previous pages.
+
+    Raises:
+        ValueError: Malformed cursor.
+    """
+    backwards = before is not None and after is None
+    cursor = before if backwards else after
+    values = decode_cursor(cursor, columns) if cursor is not None else None
+
+    # Walking back reads the rows nearest the cursor first, then flips them
+    rows = keyset_query(query, columns, values, descending, backwards).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    items = rows[:per_page]
+    if backwards:
+        items.reverse()
+
+    if not items:
+        return Page(items, total, per_page)
+    if backwards:
+        next_cursor = encode_cursor(items[-1], columns)
+        prev_cursor = encode_cursor(items[0], columns) if more else None
+    else:
+        next_cursor = encode_cursor(items[-1], columns) if more else None
+        prev_cursor = encode_cursor(items[0], columns) if after is not None else None
+    return Page(items, total, per_page, next_cursor, prev_cursor)
+
+
+def paginate(query, columns, descending=False, total=None, per_page=None):
+    """
+    keyset_page() driven by the request's `after`/`before` arguments.
+
+    A malformed cursor answers 400 instead of raising.
+
+    Args:
+        query: ORM query with its filters applied, not yet ordered.
+        columns (tuple): Sort columns, ending with a unique one.
+        descending (bool): Sort newest/largest first.
+        total (int, optional): Row count for the pager.
+        per_page (int, optional): Page size (default `LIST_PAGE_SIZE`).
+
+    Returns:
+        Page: The requested page.
+    """
+    per_page = per_page or current_app.config.get('LIST_PAGE_SIZE', 25)
+    try:
+        return keyset_page(query, columns, descending=descending, after=request.args.get('after'),
+                           before=request.args.get('before'), per_page=per_page, total=total)
+    except ValueError:
+        abort(400)
+
+
+class CountCache:
+    """
+    Row counts that are only recomputed after the content they count changes.
+
+    Each count is stored with the content versions (see
+    utils/content_version.py) of the tags it depends on. While no approval,
+    edit or delete bumps one of them, listing pages reuse the stored number
+    instead of running COUNT(*) over a growing table. Entries are kept
+    per process in a small LRU.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, key, query, *tags):
+        """
+        Return the number of rows of `query`, cached until one of `tags` changes.
+
+        Args:
+            key (str): Unique name of the count, including any filter
+                values (e.g. "attractions:user:5").
+            query: ORM query to count.
+            *tags: Content tags the rows come from.
+
+        Returns:
+            int: The row count.
+        """
+        versions = content_versions.snapshot(*tags)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        total = query.order_by(None).count()
+        with self._lock:
+            self._entries[key] = (versions, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache()
+
+
+def cached_count(key, query, *tags):
+    """Shortcut for `count_cache.count()`."""
+    return count_cache.count(key, query, *tags)
@@ -0,0 +1,180 @@
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.dialects import sqlite
+
+from models import db, User, Attraction, Event, GalleryItem, BarangayInfo, PageView, PageViewRollup
+from utils.barangays import directory_query
+from utils.moderation import queue_query
+from utils.pagination import keyset_query
+
+# Representative hot-path queries, checked by `flask check-query-plans`.
+# Each entry maps a name to a function that builds the query; add new
+# entries next to the code that introduces a new access path.
+QUERY_PLAN_CHECKS = {}
+
+# "SCAN attraction" (or "SCAN TABLE attraction" on older SQLite) without a
+# "USING ... INDEX" suffix means SQLite reads every row of the table.
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$')
+
+
+def register(name):
+    """Register a query builder for the query-plan check."""
+    def decorator(func):
+        QUERY_PLAN_CHECKS[name] = func
+        return func
+    return decorator
+
+
+def explain(query):
+    """
+    Return the EXPLAIN QUERY PLAN rows for a query.
+
+    Args:
+        query: A SQLAlchemy ORM query or Core statement.
+
+    Returns:
+        list: Plan detail strings.
+    """
+    statement = getattr(query, 'statement', query)
+    sql = str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).all()
+    return [row[-1] for row in rows]
+
+
+def check_all():
+    """
+    Run EXPLAIN QUERY PLAN on every registered query.
+
+    Returns:
+        list: (name, plan lines, full-scanned tables) tuples.
+    """
+    results = []
+    for name, build in QUERY_PLAN_CHECKS.items():
+        plan = explain(build())
+        # Scans of subqueries and CTEs ("SCAN anon_1") read already-filtered rows
+        scans = [m.group('table') for m in (FULL_SCAN.match(line) for line in plan)
+                 if m and m.group('table') in db.metadata.tables]
+        results.append((name, plan, scans))
+    return results
+
+
+@register('public.featured_attractions')
+def _featured_attractions():
+    return Attraction.query.filter_by(status='approved').limit(3)
+
+
+@register('public.barangay_attractions')
+def _barangay_attractions():
+    return Attraction.query.filter_by(barangay='Poblacion', status='approved')
+
+
+@register('public.barangay_directory')
+def _barangay_directory():
+    return directory_query()
+
+
+@register('public.events')
+def _public_events():
+    return Event.query.filter_by(status='approved').order_by(Event.date.asc())
+
+
+@register('public.barangay_events')
+def _barangay_events():
+    return Event.query.filter_by(barangay='Poblacion', status='approved').order_by(Event.date.asc())
+
+
+@register('public.gallery')
+def _public_gallery():
+    return GalleryItem.query.filter_by(status='approved').order_by(GalleryItem.uploaded_at.desc())
+
+
+@register('public.barangay_gallery')
+def _barangay_gallery():
+    return GalleryItem.query.join(User).filter(
+        User.barangay == 'Poblacion',
+        GalleryItem.status == 'approved'
+    ).order_by(GalleryItem.uploaded_at.desc())
+
+
+@register('public.barangay_info')
+def _barangay_info():
+    return BarangayInfo.query.filter_by(barangay_name='Poblacion')
+
+
+@register('auth.barangay_representative')
+def _barangay_representative():
+    return User.query.filter_by(barangay='Poblacion', role='contributor', is_approved=True)
+
+
+@register('admin.pending_attractions')
+def _pending_attractions():
+    return keyset_query(Attraction.query.filter_by(status='pending'), (Attraction.created_at, Attraction.id)).limit(10)
+
+
+@register('admin.pending_events')
+def _pending_events():
+    return keyset_query(Event.query.filter_by(status='pending'), (Event.created_at, Event.id)).limit(10)
+
+
+@register('admin.pending_users')
+def _pending_users():
+    return keyset_query(User.query.filter_by(is_approved=False, role='contributor'), (User.created_at, User.id)).limit(10)
+
+
+@register('admin.pending_gallery')
+def _pending_gallery():
+    return keyset_query(GalleryItem.query.filter_by(status='pending'),
+                        (GalleryItem.uploaded_at, GalleryItem.id)).limit(10)
+
+
+# Listing pages continue from a keyset cursor (utils/pagination.py); check
+# a page in the middle of the list, which must seek rather than scan.
+CURSOR_TIME = datetime(2025, 1, 1)
+
+
+@register('admin.moderation_queue')
+def _moderation_queue():
+    return queue_query(after=(CURSOR_TIME, 'attraction', 1)).limit(51)
+
+
+@register('admin.all_attractions')
+def _all_attractions():
+    return keyset_query(Attraction.query, (Attraction.created_at, Attraction.id), (CURSOR_TIME, 1),
+                        descending=True).limit(25)
+
+
+@register('admin.all_events')
+def _all_events():
+    return keyset_query(Event.query, (Event.date, Event.id), (CURSOR_TIME, 1)).limit(25)
+
+
+@register('barangay.attractions')
+def _contributor_attractions():
+    return keyset_query(Attraction.query.filter_by(user_id=1), (Attraction.created_at, Attraction.id),
+                        (CURSOR_TIME, 1), descending=True).limit(25)
+
+
+@register('barangay.events')
+def _contributor_events():
+    return keyset_query(Event.query.filter_by(user_id=1), (Event.date, Event.id), (CURSOR_TIME, 1)).limit(25)
+
+
+@register('barangay.gallery')
+def _contributor_gallery():
+    return keyset_query(GalleryItem.query.filter_by(user_id=1), (GalleryItem.uploaded_at, GalleryItem.id),
+                        (CURSOR_TIME, 1), descending=True).limit(25)
+
+
+@register('analytics.attraction_views')
+def _attraction_views():
+    return PageView.query.filter_by(view_type='attraction', item_id=1)
+
+
+@register('analytics.daily_rollups')
+def _daily_rollups():
+    return PageViewRollup.query.filter(
+        PageViewRollup.granularity == 'day',
+        PageViewRollup.bucket >= '2024-01-01'
+    )
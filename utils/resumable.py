@@ -0,0 +1,324 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from models import db, GalleryItem, UploadSession
+from utils import media_jobs
+from utils.uploads import allowed_file, is_video, store_file
+
+try:
+    import fcntl
+except ImportError:  # Windows dev servers: no cross-process lock, single writer assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = '1.0.0'
+
+# Algorithms accepted in the Upload-Checksum header
+CHECKSUM_ALGORITHMS = ('sha1', 'sha256', 'md5')
+
+# Bytes read from the request per write; memory use does not grow with the upload
+COPY_BUFFER_BYTES = 64 * 1024
+
+
+class UploadError(Exception):
+    """A request the upload protocol rejects, with the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def session_folder():
+    """Return the folder holding partial uploads (`UPLOAD_SESSION_DIR`, default instance/upload_sessions)."""
+    folder = current_app.config.get('UPLOAD_SESSION_DIR') or os.path.join(current_app.instance_path, 'upload_sessions')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def part_path(upload):
+    """Return the path of an upload session's partial file."""
+    return os.path.join(session_folder(), upload.id + '.part')
+
+
+def parse_metadata(header):
+    """
+    Decode a tus Upload-Metadata header.
+
+    Args:
+        header (str): Comma-separated "key base64value" pairs.
+
+    Returns:
+        dict: Key -> decoded string.
+    """
+    metadata = {}
+    for pair in (header or '').split(','):
+        parts = pair.strip().split(' ', 1)
+        if not parts[0]:
+            continue
+        try:
+            metadata[parts[0]] = base64.b64decode(parts[1]).decode('utf-8') if len(parts) == 2 else ''
+        except (binascii.Error, UnicodeDecodeError):
+            raise UploadError(f"Invalid Upload-Metadata value for '{parts[0]}'.")
+    return metadata
+
+
+def expire_sessions(user_id=None):
+    """
+    Expire active sessions idle for longer than `UPLOAD_SESSION_EXPIRY_HOURS`.
+
+    Their partial files are deleted and they stop counting towards the
+    per-user limit.
+
+    Args:
+        user_id (int, optional): Only expire this user's sessions.
+
+    Returns:
+        int: Number of sessions expired.
+    """
+    hours = current_app.config.get('UPLOAD_SESSION_EXPIRY_HOURS', 24)
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    query = UploadSession.query.filter(UploadSession.status == 'active', UploadSession.updated_at < cutoff)
+    if user_id is not None:
+        query = query.filter(UploadSession.user_id == user_id)
+    expired = query.all()
+    for upload in expired:
+        upload.status = 'expired'
+        _remove_part(upload)
+    if expired:
+        db.session.commit()
+        logger.info(f"Expired {len(expired)} idle upload sessions")
+    return len(expired)
+
+
+def _remove_part(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def create_session(user, length, metadata):
+    """
+    Start a resumable upload for a gallery item.
+
+    Args:
+        user (User): The contributor uploading.
+        length (int): Total size of the file in bytes (Upload-Length).
+        metadata (dict): Decoded Upload-Metadata; 'filename' is required,
+            'caption' is optional.
+
+    Returns:
+        UploadSession: The new session.
+
+    Raises:
+        UploadError: Missing or disallowed file name (400), file too large
+            (413) or too many uploads in progress for this user (429).
+    """
+    filename = metadata.get('filename', '')
+    if not filename or not allowed_file(filename):
+        raise UploadError('A filename with an allowed extension is required in Upload-Metadata.')
+    max_bytes = current_app.config.get('UPLOAD_MAX_BYTES', 512 * 1024 * 1024)
+    if length < 0:
+        raise UploadError('Upload-Length must not be negative.')
+    if length > max_bytes:
+        raise UploadError(f"Uploads are limited to {max_bytes // (1024 * 1024)} MB.", 413)
+
+    expire_sessions(user_id=user.id)
+    limit = current_app.config.get('UPLOAD_MAX_CONCURRENT_PER_USER', 3)
+    active = UploadSession.query.filter_by(user_id=user.id, status='active').count()
+    if active >= limit:
+        raise UploadError(f"You already have {active} uploads in progress; finish or cancel one first.", 429)
+
+    upload = UploadSession(
+        id=secrets.token_hex(16),
+        user_id=user.id,
+        filename=filename[:200],
+        caption=(metadata.get('caption') or '')[:200] or None,
+        upload_length=length,
+        received=0,
+        status='active'
+    )
+    open(part_path(upload), 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+
+    print(f"=== UPLOADS: Session {upload.id} started by {user.username} ({length} bytes) ===")
+    logger.info(f"Upload session {upload.id} created by {user.username} for {filename} ({length} bytes)")
+    return upload
+
+
+def _checksum(header):
+    if not header:
+        return None, None
+    try:
+        algorithm, encoded = header.split(' ', 1)
+        expected = base64.b64decode(encoded.strip())
+    except (ValueError, binascii.Error):
+        raise UploadError('Malformed Upload-Checksum header.')
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise UploadError(f"Unsupported checksum algorithm '{algorithm}'.")
+    return hashlib.new(algorithm), expected
+
+
+def append(upload, stream, offset, content_length, checksum=None):
+    """
+    Write one chunk of an upload to its partial file.
+
+    The chunk is copied from the request stream in small buffers, so
+    memory use is constant whatever the chunk size. With an
+    Upload-Checksum the chunk is verified and discarded on mismatch;
+    without one, whatever arrived before a dropped connection is kept and
+    the client resumes from the new offset.
+
+    Args:
+        upload (UploadSession): An active session of the current user.
+        stream: The request body stream.
+        offset (int): Upload-Offset sent by the client.
+        content_length (int): Size of this chunk.
+        checksum (str, optional): Upload-Checksum header ("sha256 <base64>").
+
+    Returns:
+        UploadSession: The session with its new offset; its status is
+        'complete' (and gallery_item_id set) after the last chunk.
+
+    Raises:
+        UploadError: Offset mismatch (409), chunk beyond the announced
+            length (413), session busy in another request (423) or
+            checksum mismatch (460).
+    """
+    if upload.status != 'active':
+        raise UploadError(f"Upload is {upload.status}.", 410 if upload.status in ('aborted', 'expired') else 409)
+    if offset != upload.received:
+        raise UploadError(f"Upload-Offset {offset} does not match the current offset {upload.received}.", 409)
+    if content_length is None:
+        raise UploadError('Content-Length is required.', 411)
+    if offset + content_length > upload.upload_length:
+        raise UploadError('Chunk goes past the announced Upload-Length.', 413)
+    hasher, expected = _checksum(checksum)
+
+    written = 0
+    interrupted = None
+    with open(part_path(upload), 'r+b') as f:
+        if fcntl is not None:
+            try:
+                # One writer per session, across threads and worker processes
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadError('Another request is writing to this upload.', 423)
+            # A request that held the lock may have moved the offset since we loaded the row
+            db.session.refresh(upload)
+            if upload.status != 'active' or offset != upload.received:
+                raise UploadError(f"Upload-Offset {offset} does not match the current offset {upload.received}.", 409)
+        # Drop bytes of an earlier chunk that was written but never committed
+        f.truncate(offset)
+        f.seek(offset)
+        try:
+            while written < content_length:
+                data = stream.read(min(COPY_BUFFER_BYTES, content_length - written))
+                if not data:
+                    break
+                f.write(data)
+                if hasher is not None:
+                    hasher.update(data)
+                written += len(data)
+        except Exception as e:
+            # Client went away mid-chunk (werkzeug ClientDisconnected)
+            interrupted = e
+        if hasher is not None and (written != content_length or hasher.digest() != expected):
+            f.truncate(offset)
+            if interrupted is None:
+                raise UploadError('Checksum mismatch.', 460)
+            written = 0
+        f.flush()
+        os.fsync(f.fileno())
+
+        upload.received = offset + written
+        upload.updated_at = datetime.utcnow()
+        db.session.commit()
+        # Still holding the lock, so the last chunk is finalized exactly once
+        if interrupted is None and upload.received == upload.upload_length:
+            finalize(upload)
+
+    if interrupted is not None:
+        logger.info(f"Upload {upload.id} interrupted at {upload.received} bytes")
+        raise interrupted
+    return upload
+
+
+def finalize(upload):
+    """
+    Turn a fully received upload into a pending GalleryItem.
+
+    The file goes through the normal storage path (content addressing,
+    dedup and image variants; see utils/uploads.py); videos are queued
+    for the media worker.
+
+    Args:
+        upload (UploadSession): A session whose bytes have all arrived.
+
+    Returns:
+        GalleryItem: The new gallery item awaiting approval.
+    """
+    extension = upload.filename.rsplit('.', 1)[1]
+    url = store_file(part_path(upload), extension)
+    item = GalleryItem(
+        type='video' if is_video(upload.filename) else 'photo',
+        url=url,
+        caption=upload.caption,
+        user_id=upload.user_id,
+        status='pending'
+    )
+    db.session.add(item)
+    db.session.flush()
+    upload.gallery_item_id = item.id
+    upload.status = 'complete'
+    db.session.commit()
+    media_jobs.enqueue(item)
+
+    print(f"=== UPLOADS: Session {upload.id} complete, gallery item {item.id} ({item.type}) ===")
+    logger.info(f"Upload session {upload.id} finalized into gallery item {item.id}")
+    return item
+
+
+def abort(upload):
+    """
+    Cancel an upload and delete what was received (tus termination).
+
+    Takes the same lock as append(), so a chunk being written (possibly
+    the last one, about to be finalized) is never deleted underneath it.
+
+    Raises:
+        UploadError: A chunk is being written to the upload right now (423).
+    """
+    if upload.status != 'active':
+        return
+    try:
+        f = open(part_path(upload), 'rb')
+    except FileNotFoundError:
+        f = None
+    try:
+        if f is not None and fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadError('Another request is writing to this upload.', 423)
+            # The request that held the lock may have completed the upload meanwhile
+            db.session.refresh(upload)
+            if upload.status != 'active':
+                return
+        _remove_part(upload)
+        upload.status = 'aborted'
+        db.session.commit()
+        logger.info(f"Upload session {upload.id} aborted")
+    finally:
+        if f is not None:
+            f.close()
@@ -0,0 +1,153 @@
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, text
+
+from models import db, PageView, PageViewRollup
+from utils import analytics
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ('id', 'view_type', 'item_id', 'page_name', 'timestamp', 'user_id')
+
+
+def archive_path():
+    """
+    Return the path of the page view archive database.
+
+    Uses `PAGEVIEW_ARCHIVE_PATH` when configured, otherwise
+    `pageview_archive.db` next to the main database in the instance folder.
+    """
+    return current_app.config.get('PAGEVIEW_ARCHIVE_PATH') or os.path.join(
+        current_app.instance_path, 'pageview_archive.db'
+    )
+
+
+def archive_table_name(timestamp):
+    """Return the per-month archive table for a timestamp, e.g. page_view_2024_06."""
+    return f"page_view_{timestamp.year:04d}_{timestamp.month:02d}"
+
+
+def compact_views(retain_days=None, archive=True, batch_size=5000):
+    """
+    Roll raw page views older than the retention window into aggregates and delete them.
+
+    The rollup tables are brought up to date first, so no counts are lost.
+    When `archive` is True the raw rows are copied into per-month tables of
+    the archive database before being deleted from the main database.
+    The cutoff is aligned to the start of a day so a day is never split
+    between raw rows and compacted aggregates.
+
+    Args:
+        retain_days (int, optional): Days of raw views to keep. Defaults to
+            `PAGEVIEW_RETENTION_DAYS`.
+        archive (bool): Copy the raw rows into the archive database first.
+        batch_size (int): Rows moved per transaction.
+
+    Returns:
+        dict: 'cutoff', 'archived' and 'deleted' counts.
+    """
+    if retain_days is None:
+        retain_days = current_app.config.get('PAGEVIEW_RETENTION_DAYS', 90)
+    cutoff = analytics.bucket_start(datetime.utcnow() - timedelta(days=retain_days), 'day')
+
+    analytics.backfill_rollups()
+
+    archive_conn = sqlite3.connect(archive_path()) if archive else None
+    known_tables = set()
+    archived = 0
+    deleted = 0
+    try:
+        while True:
+            rows = db.session.query(
+                PageView.id, PageView.view_type, PageView.item_id,
+                PageView.page_name, PageView.timestamp, PageView.user_id
+            ).filter(PageView.timestamp < cutoff).order_by(PageView.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            if archive_conn is not None:
+                by_table = {}
+                for row in rows:
+                    by_table.setdefault(archive_table_name(row.timestamp), []).append(
+                        (row.id, row.view_type, row.item_id, row.page_name,
+                         row.timestamp.isoformat(sep=' '), row.user_id)
+                    )
+                for table, values in by_table.items():
+                    if table not in known_tables:
+                        archive_conn.execute(
+                            f"CREATE TABLE IF NOT EXISTS {table} ("
+                            "id INTEGER PRIMARY KEY, view_type VARCHAR(50) NOT NULL, item_id INTEGER, "
+                            "page_name VARCHAR(100), timestamp DATETIME, user_id INTEGER)"
+                        )
+                        known_tables.add(table)
+                    # INSERT OR IGNORE keeps re-runs idempotent if a previous run
+                    # archived a batch but died before deleting it
+                    archive_conn.executemany(
+                        f"INSERT OR IGNORE INTO {table} ({', '.join(ARCHIVE_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                        values
+                    )
+                archive_conn.commit()
+                archived += len(rows)
+
+            ids = [row.id for row in rows]
+            PageView.query.filter(PageView.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += len(ids)
+    finally:
+        if archive_conn is not None:
+            archive_conn.close()
+
+    logger.info(f"Compacted {deleted} page views older than {cutoff.date()} ({archived} archived)")
+    return {'cutoff': cutoff, 'archived': archived, 'deleted': deleted}
+
+
+def vacuum():
+    """Rebuild the main database file to give freed pages back to the filesystem."""
+    db.session.remove()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text('VACUUM'))
+
+
+def storage_report():
+    """
+    Report the size of the main and archive databases.
+
+    Returns:
+        dict: File sizes in bytes, free pages, and row counts for the
+        page view tables.
+    """
+    page_size = db.session.execute(text('PRAGMA page_size')).scalar()
+    page_count = db.session.execute(text('PRAGMA page_count')).scalar()
+    freelist = db.session.execute(text('PRAGMA freelist_count')).scalar()
+
+    oldest, newest = db.session.query(func.min(PageView.timestamp), func.max(PageView.timestamp)).one()
+    report = {
+        'database_bytes': page_size * page_count,
+        'free_bytes': page_size * freelist,
+        'page_views': PageView.query.count(),
+        'oldest_view': oldest,
+        'newest_view': newest,
+        'rollups': PageViewRollup.query.count(),
+        'archive_path': archive_path(),
+        'archive_bytes': 0,
+        'archive_tables': {}
+    }
+
+    path = archive_path()
+    if os.path.exists(path):
+        report['archive_bytes'] = os.path.getsize(path)
+        conn = sqlite3.connect(path)
+        try:
+            tables = [r[0] for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'page_view_%' ORDER BY name"
+            )]
+            for table in tables:
+                report['archive_tables'][table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            conn.close()
+
+    return report
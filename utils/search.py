@@ -0,0 +1,163 @@
+import logging
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import Float, Integer, String, or_, text
+
+from models import db, Attraction, Event, GalleryItem, BarangayInfo
+
+logger = logging.getLogger(__name__)
+
+# Kind codes of the rowids in the `search_index` FTS5 table (migration 3)
+SEARCH_KINDS = {
+    'attraction': 0,
+    'event': 1,
+    'gallery': 2,
+    'barangay_info': 3,
+}
+
+# BM25 weights of the (title, body, tags) columns
+COLUMN_WEIGHTS = (10.0, 1.0, 2.0)
+
+# Control characters marking matches in snippets, replaced after escaping
+_MARK_START, _MARK_END = '\x02', '\x03'
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# Columns searched with LIKE when the database has no FTS5 index
+FALLBACK_COLUMNS = {
+    'attraction': (Attraction.name, Attraction.description),
+    'event': (Event.title, Event.description),
+    'gallery': (GalleryItem.caption,),
+    'barangay_info': (BarangayInfo.barangay_name, BarangayInfo.history, BarangayInfo.cultural_assets,
+                      BarangayInfo.traditions, BarangayInfo.local_practices, BarangayInfo.unique_features),
+}
+
+_fts = None
+
+
+def fts_available():
+    """Return True if the `search_index` FTS5 table exists in the database."""
+    global _fts
+    if _fts is None:
+        _fts = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'search_index'"
+        )).first() is not None
+    return _fts
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word must appear; each word is quoted so user input can never
+    be parsed as FTS5 syntax, and the last one also matches as a prefix
+    so results update while the user is still typing.
+
+    Args:
+        query (str): The user's search text.
+
+    Returns:
+        str: The MATCH expression, or None if the query has no words.
+    """
+    words = _TOKEN.findall(query or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    """Return an FTS5 snippet as HTML-safe markup with matches wrapped in <mark>."""
+    if not snippet:
+        return None
+    html = str(escape(snippet))
+    return Markup(html.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def hits(kind, query):
+    """
+    Return a ranked subquery of index hits for one kind of content.
+
+    Args:
+        kind (str): A key of SEARCH_KINDS.
+        query (str): The user's search text.
+
+    Returns:
+        Subquery with `item_id`, `rank` (lower is better) and `snippet`
+        columns, or None if the query has no searchable words.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return None
+    weights = ', '.join(str(w) for w in COLUMN_WEIGHTS)
+    return text(
+        f"SELECT rowid >> 2 AS item_id, bm25(search_index, {weights}) AS rank, "
+        f"snippet(search_index, -1, '{_MARK_START}', '{_MARK_END}', '…', 16) AS snippet "
+        "FROM search_index WHERE search_index MATCH :expression AND rowid & 3 = :kind"
+    ).bindparams(expression=expression, kind=SEARCH_KINDS[kind]).columns(
+        item_id=Integer, rank=Float, snippet=String
+    ).subquery(f'{kind}_hits')
+
+
+def search(kind, query, base_query):
+    """
+    Restrict a query of one content type to rows matching the search text.
+
+    With the FTS5 index the results are ordered by BM25 relevance (titles
+    weigh most) and come with highlighted snippets. Without it, the rows
+    are filtered with case-insensitive LIKE over the same text columns.
+
+    Args:
+        kind (str): A key of SEARCH_KINDS.
+        query (str): The user's search text.
+        base_query: ORM query of the matching model with any other filters
+            (status, category, barangay) already applied.
+
+    Returns:
+        tuple: (list of model instances, dict of item id -> snippet Markup).
+    """
+    if not fts_available():
+        columns = FALLBACK_COLUMNS[kind]
+        items = base_query.filter(or_(*(column.ilike(f'%{query}%') for column in columns))).all()
+        return items, {}
+
+    subquery = hits(kind, query)
+    if subquery is None:
+        return [], {}
+    model = base_query.column_descriptions[0]['entity']
+    rows = base_query.join(subquery, subquery.c.item_id == model.id).add_columns(
+        subquery.c.snippet
+    ).order_by(None).order_by(subquery.c.rank).all()
+    items = [row[0] for row in rows]
+    snippets = {row[0].id: highlight(row.snippet) for row in rows}
+    return items, snippets
+
+
+def matches(kind, query):
+    """
+    Return the ids of all rows of one kind matching the search text, best first.
+
+    Unlike search(), no other filters are applied, so the ids can be fed
+    to the facet engine (utils/facets.py) to count every filter value.
+
+    Args:
+        kind (str): A key of SEARCH_KINDS.
+        query (str): The user's search text.
+
+    Returns:
+        tuple: (list of ids ordered by relevance, dict of id -> snippet Markup).
+    """
+    if not fts_available():
+        columns = FALLBACK_COLUMNS[kind]
+        model = columns[0].class_
+        rows = db.session.query(model.id).filter(
+            or_(*(column.ilike(f'%{query}%') for column in columns))
+        ).order_by(model.id).all()
+        return [row.id for row in rows], {}
+
+    subquery = hits(kind, query)
+    if subquery is None:
+        return [], {}
+    rows = db.session.query(subquery.c.item_id, subquery.c.snippet).order_by(subquery.c.rank).all()
+    return [row.item_id for row in rows], {row.item_id: highlight(row.snippet) for row in rows}
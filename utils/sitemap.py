@@ -0,0 +1,208 @@
+import gzip
+import hashlib
+import logging
+import os
+import subprocess
+import threading
+from datetime import datetime
+
+from flask import current_app, render_template, request, url_for
+from sqlalchemy import func, union_all
+
+from models import db, User, Attraction, Event, GalleryItem, BarangayInfo
+from utils.content_version import content_versions
+
+logger = logging.getLogger(__name__)
+
+# Production checkout whose last commit marks the deploy date
+SOURCE_REPO = "/home/GoMangatarem/Interactive-Digital-Cultural-Map-and-Local-Tourism-Information-system-for-Mangatarem--Pangasinan"
+
+SITEMAP_TAGS = ('attraction', 'event', 'gallery', 'barangay_info', 'user')
+
+STATIC_ENDPOINTS = [
+    'public.index',
+    'public.map_view',
+    'public.events',
+    'public.gallery',
+    'public.routes',
+    'public.barangays'
+]
+
+_deploy_date = None
+_deploy_lock = threading.Lock()
+
+
+def deploy_date():
+    """
+    Return the date of the last commit, read from git once per process.
+
+    Attempts to read from the production source repository path first,
+    then falls back to the current directory (for dev environment).
+    Returns today's date if the git command fails. A deploy restarts the
+    app, so the value is refreshed on every deploy.
+    """
+    global _deploy_date
+    with _deploy_lock:
+        if _deploy_date is None:
+            cmd = ['git', 'log', '-1', '--format=%cd', '--date=short']
+            if os.path.exists(SOURCE_REPO):
+                cmd = ['git', '-C', SOURCE_REPO, 'log', '-1', '--format=%cd', '--date=short']
+            try:
+                result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=5)
+                _deploy_date = result.stdout.strip() or datetime.now().date().isoformat()
+            except Exception as e:
+                logger.warning(f"Could not read deploy date from git: {e}")
+                _deploy_date = datetime.now().date().isoformat()
+        return _deploy_date
+
+
+def barangay_lastmod():
+    """
+    Return the newest content timestamp of every barangay in one query.
+
+    Considers approved attractions and events, approved gallery items (by
+    their contributor's barangay) and the barangay's info page.
+
+    Returns:
+        dict: Barangay name -> datetime.
+    """
+    latest = union_all(
+        db.select(Attraction.barangay.label('name'), func.max(Attraction.created_at).label('ts'))
+        .where(Attraction.status == 'approved').group_by(Attraction.barangay),
+        db.select(Event.barangay.label('name'), func.max(Event.created_at).label('ts'))
+        .where(Event.status == 'approved').group_by(Event.barangay),
+        db.select(User.barangay.label('name'), func.max(GalleryItem.uploaded_at).label('ts'))
+        .join(GalleryItem, GalleryItem.user_id == User.id)
+        .where(GalleryItem.status == 'approved').group_by(User.barangay),
+        db.select(BarangayInfo.barangay_name.label('name'), func.max(BarangayInfo.updated_at).label('ts'))
+        .group_by(BarangayInfo.barangay_name),
+    ).subquery()
+    rows = db.session.execute(
+        db.select(latest.c.name, func.max(latest.c.ts)).where(latest.c.name != None).group_by(latest.c.name)
+    ).all()
+    result = {}
+    for name, ts in rows:
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts)
+        result[name] = ts
+    return result
+
+
+def _date(value, fallback):
+    return value.date().isoformat() if value else fallback
+
+
+def sitemap_sections():
+    """
+    Build the sitemap entries grouped by type.
+
+    Returns:
+        dict: Section name ('pages', 'attractions', 'barangays') -> list of
+        page dicts with 'loc', 'lastmod', 'changefreq' and 'priority'.
+    """
+    last_update = deploy_date()
+    sections = {'pages': [], 'attractions': [], 'barangays': []}
+
+    for endpoint in STATIC_ENDPOINTS:
+        sections['pages'].append({
+            'loc': url_for(endpoint, _external=True),
+            'lastmod': last_update,
+            'changefreq': 'weekly',
+            'priority': '0.8' if endpoint == 'public.index' else '0.5'
+        })
+
+    attractions = db.session.query(Attraction.id, Attraction.created_at).filter(
+        Attraction.status == 'approved'
+    ).order_by(Attraction.id).all()
+    for attraction in attractions:
+        sections['attractions'].append({
+            'loc': url_for('public.attraction_detail', id=attraction.id, _external=True),
+            'lastmod': _date(attraction.created_at, last_update),
+            'changefreq': 'monthly',
+            'priority': '0.6'
+        })
+
+    barangay_names = db.session.query(User.barangay).filter(
+        User.role == 'contributor',
+        User.is_approved == True,
+        User.barangay != None
+    ).distinct().order_by(User.barangay).all()
+    lastmod = barangay_lastmod()
+    for (name,) in barangay_names:
+        sections['barangays'].append({
+            'loc': url_for('public.barangay_profile', name=name, _external=True),
+            'lastmod': _date(lastmod.get(name), last_update),
+            'changefreq': 'weekly',
+            'priority': '0.7'
+        })
+    return sections
+
+
+class SitemapCache:
+    """
+    Rendered sitemap documents, kept until content changes or the app restarts.
+
+    Small sites get a single `sitemap.xml` urlset. Once there are more than
+    `SITEMAP_SPLIT_THRESHOLD` URLs, `sitemap.xml` becomes a sitemap index
+    pointing at one `sitemap-<section>[-<n>].xml` per section, each holding
+    at most `SITEMAP_MAX_URLS` URLs. Every document is stored both plain
+    and gzip-compressed.
+    """
+
+    def __init__(self):
+        self._key = None
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def documents(self):
+        """
+        Return all sitemap documents for the current host and content.
+
+        Returns:
+            dict: Filename -> (xml bytes, gzip bytes, etag).
+        """
+        key = (request.host_url, deploy_date(), content_versions.snapshot(*SITEMAP_TAGS))
+        with self._lock:
+            if self._key == key:
+                return self._documents
+        documents = self._build()
+        with self._lock:
+            self._key = key
+            self._documents = documents
+        return documents
+
+    def _build(self):
+        sections = sitemap_sections()
+        total = sum(len(pages) for pages in sections.values())
+        split_threshold = current_app.config.get('SITEMAP_SPLIT_THRESHOLD', 1000)
+        max_urls = current_app.config.get('SITEMAP_MAX_URLS', 50000)
+
+        xml = {}
+        if total <= split_threshold:
+            pages = [page for section in sections.values() for page in section]
+            xml['sitemap.xml'] = render_template('sitemap.xml', pages=pages)
+        else:
+            sitemaps = []
+            for section, pages in sections.items():
+                chunks = [pages[i:i + max_urls] for i in range(0, len(pages), max_urls)]
+                for n, chunk in enumerate(chunks, start=1):
+                    name = f"sitemap-{section}.xml" if len(chunks) == 1 else f"sitemap-{section}-{n}.xml"
+                    xml[name] = render_template('sitemap.xml', pages=chunk)
+                    sitemaps.append({
+                        'loc': url_for('public.sitemap_section', name=name[len('sitemap-'):-len('.xml')],
+                                       _external=True),
+                        'lastmod': max(page['lastmod'] for page in chunk)
+                    })
+            xml['sitemap.xml'] = render_template('sitemap_index.xml', sitemaps=sitemaps)
+
+        documents = {}
+        for name, text in xml.items():
+            data = text.encode('utf-8')
+            documents[name] = (data, gzip.compress(data, mtime=0), hashlib.sha256(data).hexdigest()[:32])
+
+        print(f"=== SITEMAP: Generated {len(documents)} documents with {total} URLs ===")
+        logger.info(f"Sitemap generated: {total} URLs in {len(documents)} documents")
+        return documents
+
+
+sitemap_cache = SitemapCache()
@@ -0,0 +1,247 @@
+import logging
+import math
+import threading
+from collections import defaultdict
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table, and_, select, text
+
+from models import db, Attraction
+from utils.content_version import content_versions
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+# SQLite R*Tree virtual table over Attraction.lat/lng, kept in sync by
+# triggers created in migration 2 (utils/migrations.py). Declared on its
+# own MetaData so db.create_all() never tries to create it.
+rtree = Table(
+    'attraction_rtree', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('min_lat', Float), Column('max_lat', Float),
+    Column('min_lng', Float), Column('max_lng', Float),
+)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Return the great-circle distance between two points in kilometres."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def degrees_for_km(lat, km):
+    """Return the (lat, lng) half-widths in degrees of a box `km` around a latitude."""
+    dlat = km / KM_PER_DEGREE_LAT
+    dlng = km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+    return dlat, dlng
+
+
+class GridIndex:
+    """
+    In-memory uniform grid over (lat, lng) points.
+
+    Used when SQLite lacks the R*Tree module, and for small ad-hoc point
+    sets such as barangay centroids.
+    """
+
+    def __init__(self, points, cell_size=0.05):
+        """
+        Args:
+            points (iterable): (key, lat, lng) tuples.
+            cell_size (float): Grid cell size in degrees.
+        """
+        self.cell_size = cell_size
+        self.points = {}
+        self.cells = defaultdict(list)
+        for key, lat, lng in points:
+            self.points[key] = (lat, lng)
+            self.cells[self._cell(lat, lng)].append(key)
+
+    def _cell(self, lat, lng):
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lng / self.cell_size))
+
+    def bbox(self, min_lat, min_lng, max_lat, max_lng):
+        """Return the keys of all points inside a bounding box."""
+        lo_row, lo_col = self._cell(min_lat, min_lng)
+        hi_row, hi_col = self._cell(max_lat, max_lng)
+        if (hi_row - lo_row + 1) * (hi_col - lo_col + 1) > len(self.cells):
+            candidates = self.points.keys()
+        else:
+            candidates = [
+                key
+                for row in range(lo_row, hi_row + 1)
+                for col in range(lo_col, hi_col + 1)
+                for key in self.cells.get((row, col), ())
+            ]
+        result = []
+        for key in candidates:
+            lat, lng = self.points[key]
+            if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+                result.append(key)
+        return result
+
+    def nearest(self, lat, lng, k=5, max_km=None, exclude=None):
+        """
+        Return the k nearest points as (key, distance_km), closest first.
+
+        Searches rings of grid cells outwards from the query point and
+        stops once the k-th best distance is inside the searched radius.
+        """
+        if not self.points:
+            return []
+        row, col = self._cell(lat, lng)
+        cell_km = self.cell_size * KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01)
+        max_ring = max(max(abs(r - row), abs(c - col)) for r, c in self.cells)
+
+        found = []
+        for ring in range(max_ring + 1):
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue
+                    for key in self.cells.get((r, c), ()):
+                        if key == exclude:
+                            continue
+                        p_lat, p_lng = self.points[key]
+                        found.append((key, haversine_km(lat, lng, p_lat, p_lng)))
+            found.sort(key=lambda f: f[1])
+            searched_km = ring * cell_km
+            if len(found) >= k and found[k - 1][1] <= searched_km:
+                break
+            if max_km is not None and searched_km > max_km:
+                break
+
+        if max_km is not None:
+            found = [f for f in found if f[1] <= max_km]
+        return found[:k]
+
+
+class SpatialIndex:
+    """
+    Bounding-box and nearest-neighbour queries over approved attractions.
+
+    Uses the `attraction_rtree` virtual table when the database has it,
+    otherwise an in-memory GridIndex rebuilt whenever the attraction
+    content version changes.
+    """
+
+    def __init__(self):
+        self._grid = None
+        self._grid_version = None
+        self._rtree = None
+        self._lock = threading.Lock()
+
+    def uses_rtree(self):
+        """Return True if the R*Tree virtual table exists in the database."""
+        if self._rtree is None:
+            self._rtree = db.session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = 'attraction_rtree'"
+            )).first() is not None
+        return self._rtree
+
+    def grid(self):
+        """Return the in-memory grid of approved attractions, rebuilding it if stale."""
+        version = content_versions.get('attraction')
+        with self._lock:
+            if self._grid is None or self._grid_version != version:
+                rows = db.session.query(Attraction.id, Attraction.lat, Attraction.lng).filter(
+                    Attraction.status == 'approved'
+                ).all()
+                self._grid = GridIndex(rows)
+                self._grid_version = version
+            return self._grid
+
+    def bbox_clause(self, min_lat, min_lng, max_lat, max_lng):
+        """
+        Return a SQLAlchemy filter restricting Attraction rows to a bounding box.
+
+        With the R*Tree this is an indexed sub-select; with the fallback it is
+        an IN list of ids from the grid.
+        """
+        if self.uses_rtree():
+            ids = select(rtree.c.id).where(and_(
+                rtree.c.min_lat <= max_lat, rtree.c.max_lat >= min_lat,
+                rtree.c.min_lng <= max_lng, rtree.c.max_lng >= min_lng
+            ))
+            return Attraction.id.in_(ids)
+        return Attraction.id.in_(self.grid().bbox(min_lat, min_lng, max_lat, max_lng))
+
+    def bbox(self, min_lat, min_lng, max_lat, max_lng):
+        """
+        Return the ids of approved attractions inside a bounding box.
+
+        Args:
+            min_lat, min_lng, max_lat, max_lng (float): Box bounds in degrees.
+
+        Returns:
+            list: Attraction ids.
+        """
+        if not self.uses_rtree():
+            return self.grid().bbox(min_lat, min_lng, max_lat, max_lng)
+        rows = db.session.query(Attraction.id).filter(
+            Attraction.status == 'approved',
+            self.bbox_clause(min_lat, min_lng, max_lat, max_lng)
+        ).all()
+        return [r[0] for r in rows]
+
+    def nearest(self, lat, lng, k=5, max_km=50.0, exclude_id=None):
+        """
+        Return the k approved attractions closest to a point.
+
+        With the R*Tree the search box starts at 1 km and doubles until it
+        holds k attractions within the box's inscribed circle (so nothing
+        outside the box can be closer) or reaches `max_km`.
+
+        Args:
+            lat, lng (float): Query point.
+            k (int): Number of neighbours.
+            max_km (float): Search radius limit.
+            exclude_id (int, optional): Attraction to leave out (e.g. the one being viewed).
+
+        Returns:
+            list: (attraction id, distance in km) tuples, closest first.
+        """
+        if not self.uses_rtree():
+            return self.grid().nearest(lat, lng, k=k, max_km=max_km, exclude=exclude_id)
+
+        radius = 1.0
+        while True:
+            radius = min(radius, max_km)
+            dlat, dlng = degrees_for_km(lat, radius)
+            rows = db.session.query(Attraction.id, Attraction.lat, Attraction.lng).filter(
+                Attraction.status == 'approved',
+                self.bbox_clause(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+            ).all()
+            found = sorted(
+                ((r.id, haversine_km(lat, lng, r.lat, r.lng)) for r in rows if r.id != exclude_id),
+                key=lambda f: f[1]
+            )
+            within = [f for f in found if f[1] <= radius]
+            # Written as "not <" so a NaN limit ends the search too
+            if len(within) >= k or not radius < max_km:
+                return within[:k]
+            radius *= 2
+
+
+spatial_index = SpatialIndex()
+
+
+def nearby_attractions(attraction, k=4, max_km=50.0):
+    """
+    Return the approved attractions closest to an attraction.
+
+    Args:
+        attraction (Attraction): The reference attraction.
+        k (int): Number of neighbours.
+        max_km (float): Search radius in kilometres.
+
+    Returns:
+        list: (Attraction, distance_km) tuples, closest first.
+    """
+    neighbours = spatial_index.nearest(attraction.lat, attraction.lng, k=k, max_km=max_km, exclude_id=attraction.id)
+    if not neighbours:
+        return []
+    by_id = {a.id: a for a in Attraction.query.filter(Attraction.id.in_([n[0] for n in neighbours])).all()}
+    return [(by_id[i], distance) for i, distance in neighbours if i in by_id]
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+
+from flask import current_app
+
+from models import db, Attraction, BarangayInfo
+from utils import barangays as barangays_util
+from utils import tiles
+from utils.content_version import content_versions
+from utils.sitemap import SITEMAP_TAGS, sitemap_cache
+
+logger = logging.getLogger(__name__)
+
+# Marks the export's own requests so they are not counted as page views
+EXPORT_ENVIRON_KEY = 'mangatarem.static_export'
+
+MANIFEST_NAME = '.export-manifest.json'
+
+# Pages and API payloads that do not depend on a row id, with the content
+# tags they are built from. Attraction, barangay, per-id API pages and
+# split sitemaps are listed by export_targets().
+STATIC_TARGETS = [
+    ('/', ('attraction',)),
+    ('/map', ('attraction',)),
+    ('/events', ('event',)),
+    ('/gallery', ('gallery', 'user', 'media')),
+    ('/routes', ()),
+    ('/barangays', ('attraction', 'user')),
+    ('/sitemap.xml', SITEMAP_TAGS),
+    ('/api/attractions', ('attraction',)),
+]
+
+ALL_TAGS = ('attraction', 'event', 'gallery', 'barangay_info', 'user', 'media')
+
+
+def export_folder():
+    """Return the default export folder (`STATIC_EXPORT_DIR`, or export/ next to the app)."""
+    return current_app.config.get('STATIC_EXPORT_DIR') or os.path.join(current_app.root_path, 'export')
+
+
+def output_path(folder, url):
+    """
+    Map a URL to the file a static host should serve for it.
+
+    Pages become `<path>/index.html`, API payloads `<path>.json` and URLs
+    with an extension (sitemap.xml) keep their name. With
+    nginx: `try_files $uri $uri/index.html $uri.json @flask;`.
+    """
+    path = url.strip('/')
+    if not path:
+        return os.path.join(folder, 'index.html')
+    if path.startswith('api/'):
+        return os.path.join(folder, path + '.json')
+    if os.path.splitext(path)[1]:
+        return os.path.join(folder, path)
+    return os.path.join(folder, path, 'index.html')
+
+
+def export_targets(base_url):
+    """
+    Return every public URL to export with the content tags it depends on.
+
+    Args:
+        base_url (str): Site URL, needed to list the per-type sitemaps.
+
+    Returns:
+        list: (url, tags) tuples.
+    """
+    targets = list(STATIC_TARGETS)
+    with current_app.test_request_context('/', base_url=base_url):
+        for name in sitemap_cache.documents():
+            if name != 'sitemap.xml':
+                targets.append((f'/{name}', SITEMAP_TAGS))
+
+    ids = [row.id for row in db.session.query(Attraction.id).filter(Attraction.status == 'approved')]
+    for attraction_id in ids:
+        # Detail pages show the nearest attractions, so any attraction change can affect them
+        targets.append((f'/attraction/{attraction_id}', ('attraction', 'media')))
+        targets.append((f'/api/attractions/{attraction_id}', ('attraction',)))
+        targets.append((f'/api/attractions/{attraction_id}/nearby', ('attraction',)))
+
+    names = {b['name'] for b in barangays_util.directory()}
+    names.update(row.barangay_name for row in db.session.query(BarangayInfo.barangay_name))
+    for name in sorted(names):
+        targets.append((f'/barangay/{name}', ALL_TAGS))
+    return targets
+
+
+def _load_manifest(folder):
+    try:
+        with open(os.path.join(folder, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'versions': {}, 'files': {}}
+
+
+def _write_if_changed(path, data):
+    """Write `data` to `path` unless it already has that content; return True if written."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def _sync_tree(source, destination):
+    """Copy a directory tree, skipping files whose size and mtime already match."""
+    copied = 0
+    for root, _, files in os.walk(source):
+        target_root = os.path.join(destination, os.path.relpath(root, source))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            src = os.path.join(root, name)
+            dst = os.path.join(target_root, name)
+            try:
+                s, d = os.stat(src), os.stat(dst)
+                if s.st_size == d.st_size and int(s.st_mtime) == int(d.st_mtime):
+                    continue
+            except FileNotFoundError:
+                pass
+            shutil.copy2(src, dst)
+            copied += 1
+    return copied
+
+
+def export_site(folder=None, full=False, base_url=None, with_assets=False):
+    """
+    Render the public site and its read-only API payloads into static files.
+
+    Pages are rendered through the app itself (a test client), so the
+    output is exactly what Flask would serve. A manifest in the export
+    folder records the content versions of the last run: unless `full` is
+    set, only URLs depending on a content tag that changed since then are
+    rendered again, files whose content did not change are left untouched
+    (keeping their mtime for CDN revalidation), and files of URLs that no
+    longer exist (e.g. an unapproved attraction) are deleted.
+
+    Endpoints driven by query strings (viewport and cluster queries,
+    /api/suggest, /search, the /img/ external image proxy) cannot be
+    pre-rendered and stay on Flask.
+
+    Args:
+        folder (str, optional): Output folder. Defaults to export_folder().
+        full (bool): Render every URL regardless of the manifest.
+        base_url (str, optional): Scheme and host the pages are rendered
+            for (canonical URLs, sitemap). Defaults to `SITE_URL`.
+        with_assets (bool): Also copy static/ and the attraction tiles.
+
+    Returns:
+        dict: Counts of 'rendered', 'written', 'unchanged', 'skipped',
+        'removed' and 'failed' URLs, and the number of 'assets' copied.
+    """
+    folder = folder or export_folder()
+    base_url = base_url or current_app.config.get('SITE_URL') or 'http://localhost'
+    os.makedirs(folder, exist_ok=True)
+
+    manifest = _load_manifest(folder)
+    versions = {tag: content_versions.get(tag) for tag in ALL_TAGS}
+    changed = {tag for tag in ALL_TAGS if manifest['versions'].get(tag) != versions[tag]}
+    if manifest.get('base_url') != base_url:
+        full = True
+
+    result = {'rendered': 0, 'written': 0, 'unchanged': 0, 'skipped': 0, 'removed': 0, 'failed': 0, 'assets': 0}
+    files = {}
+    client = current_app.test_client()
+    for url, tags in export_targets(base_url):
+        previous = manifest['files'].get(url)
+        path = output_path(folder, url)
+        up_to_date = previous is not None and not changed.intersection(tags) and os.path.exists(path)
+        if up_to_date and not full:
+            files[url] = previous
+            result['skipped'] += 1
+            continue
+
+        result['rendered'] += 1
+        try:
+            response = client.get(url, base_url=base_url, environ_overrides={EXPORT_ENVIRON_KEY: True})
+            error = None if response.status_code == 200 else f"status {response.status_code}"
+        except Exception as e:
+            # Debug/testing apps propagate view errors instead of returning a 500
+            error = repr(e)
+        if error:
+            print(f"=== EXPORT: {url} failed ({error}), skipped ===")
+            logger.warning(f"Static export of {url} failed: {error}")
+            # Keeps its last good copy, listed without a hash so the next run retries it
+            files[url] = None
+            result['failed'] += 1
+            continue
+
+        data = response.get_data()
+        if _write_if_changed(path, data):
+            result['written'] += 1
+        else:
+            result['unchanged'] += 1
+        files[url] = hashlib.sha256(data).hexdigest()[:16]
+
+    # Remove pages of content that is gone
+    for url in set(manifest['files']) - set(files):
+        path = output_path(folder, url)
+        if os.path.exists(path):
+            os.remove(path)
+            result['removed'] += 1
+
+    if with_assets:
+        tiles.ensure_fresh()
+        result['assets'] = _sync_tree(current_app.static_folder, os.path.join(folder, 'static'))
+
+    _write_if_changed(os.path.join(folder, MANIFEST_NAME), json.dumps({
+        'exported_at': datetime.utcnow().isoformat(),
+        'base_url': base_url,
+        'versions': versions,
+        'files': files
+    }, indent=1, sort_keys=True).encode('utf-8'))
+
+    print(f"=== EXPORT: {result['rendered']} rendered, {result['written']} written, {result['skipped']} skipped ===")
+    logger.info(f"Static export to {folder}: {result}")
+    return result
@@ -0,0 +1,227 @@
+import bisect
+import logging
+import threading
+import unicodedata
+
+from sqlalchemy import union
+
+from models import db, User, Attraction, Event, BarangayInfo
+from utils.content_version import content_versions
+
+logger = logging.getLogger(__name__)
+
+# Suggestion types in the order they are listed for equally good matches
+TYPE_ORDER = {'attraction': 0, 'barangay': 1, 'event': 2, 'category': 3}
+
+# Queries shorter than this are never typo-corrected (too many neighbours)
+MIN_FUZZY_LENGTH = 3
+
+
+def normalize(value):
+    """
+    Lower-case text and strip diacritics, so "Niñgas" and "ningas" index the same.
+
+    Args:
+        value (str): Text to normalize.
+
+    Returns:
+        str: Normalized text with single spaces between words.
+    """
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.lower().split())
+
+
+def _load_attractions():
+    rows = db.session.query(
+        Attraction.id, Attraction.name, Attraction.category, Attraction.barangay,
+        Attraction.lat, Attraction.lng, Attraction.image_url
+    ).filter(Attraction.status == 'approved').all()
+    return [
+        (r.name, 'attraction', {'id': r.id, 'category': r.category, 'barangay': r.barangay,
+                                'lat': r.lat, 'lng': r.lng, 'image': r.image_url})
+        for r in rows
+    ]
+
+
+def _load_events():
+    rows = db.session.query(Event.id, Event.title, Event.date).filter(Event.status == 'approved').all()
+    return [(r.title, 'event', {'id': r.id, 'date': r.date.isoformat() if r.date else None}) for r in rows]
+
+
+def _load_categories():
+    rows = db.session.execute(union(
+        db.select(Attraction.category).where(Attraction.status == 'approved'),
+        db.select(Event.category).where(Event.status == 'approved')
+    )).all()
+    return [(r[0], 'category', {}) for r in rows if r[0]]
+
+
+def _load_barangays():
+    rows = db.session.execute(union(
+        db.select(Attraction.barangay).where(Attraction.status == 'approved'),
+        db.select(Event.barangay).where(Event.status == 'approved'),
+        db.select(User.barangay).where(User.role == 'contributor', User.is_approved == True),
+        db.select(BarangayInfo.barangay_name)
+    )).all()
+    return [(r[0], 'barangay', {}) for r in rows if r[0]]
+
+
+# Each source is reloaded only when one of its content tags changes
+SOURCES = (
+    ('attractions', ('attraction',), _load_attractions),
+    ('events', ('event',), _load_events),
+    ('categories', ('attraction', 'event'), _load_categories),
+    ('barangays', ('attraction', 'event', 'user', 'barangay_info'), _load_barangays),
+)
+
+
+class SuggestIndex:
+    """
+    Sorted prefix index over attraction names, event titles, categories and barangays.
+
+    Every suggestion is indexed under its full normalized text and under
+    the text starting at each later word, so "spring" finds "Manleluag
+    Spring". A lookup is a binary search for the query followed by a
+    short walk over the keys that share its prefix. When there are not
+    enough prefix matches, every string one edit away from the query
+    (deletion, insertion, substitution or transposition) is looked up the
+    same way, which catches most typos in Filipino place names.
+    """
+
+    def __init__(self):
+        self._sources = {}
+        # (sorted keys, matching (rank, entry) pairs), swapped in as one object
+        # so lookups running during a rebuild never pair new keys with old entries
+        self._index = ([], [])
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload the sources whose content tags changed and rebuild the sorted keys."""
+        with self._lock:
+            changed = False
+            for name, tags, load in SOURCES:
+                version = content_versions.snapshot(*tags)
+                cached = self._sources.get(name)
+                if cached is None or cached[0] != version:
+                    self._sources[name] = (version, load())
+                    changed = True
+            if changed or not self._index[0]:
+                self._rebuild()
+
+    def _rebuild(self):
+        pairs = []
+        for _, items in self._sources.values():
+            for text, kind, payload in items:
+                normalized = normalize(text)
+                if not normalized:
+                    continue
+                entry = (text, kind, payload)
+                words = normalized.split(' ')
+                for i in range(len(words)):
+                    # Rank 0 for the start of the text, 1 for a later word
+                    pairs.append((' '.join(words[i:]), min(i, 1), entry))
+        pairs.sort(key=lambda p: p[0])
+        keys = [p[0] for p in pairs]
+        entries = [(p[1], p[2]) for p in pairs]
+        self._index = (keys, entries)
+        logger.info(f"Suggest index rebuilt with {len(keys)} keys")
+
+    @staticmethod
+    def _prefix(index, prefix, limit):
+        keys, entries = index
+        start = bisect.bisect_left(keys, prefix)
+        result = []
+        for i in range(start, min(start + limit, len(keys))):
+            if not keys[i].startswith(prefix):
+                break
+            result.append((keys[i], entries[i]))
+        return result
+
+    @staticmethod
+    def _next_chars(keys, prefix):
+        """Return the distinct characters that follow `prefix` in the index keys."""
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + '\uffff', lo)
+        chars = []
+        i = lo
+        while i < hi:
+            key = keys[i]
+            if len(key) == len(prefix):
+                i += 1
+                continue
+            ch = key[len(prefix)]
+            chars.append(ch)
+            i = bisect.bisect_left(keys, prefix + chr(ord(ch) + 1), i, hi)
+        return chars
+
+    def _edits(self, keys, word):
+        """
+        Return the strings one edit away from `word` that prefix at least one key.
+
+        Walks the sorted keys like a trie: a substitution or insertion after
+        `word[:i]` only tries the characters that actually follow `word[:i]`
+        in some key, and once `word[:i]` prefixes nothing no later edit can
+        match either.
+        """
+        edits = set()
+        for i in range(len(word) + 1):
+            left, right = word[:i], word[i:]
+            following = self._next_chars(keys, left)
+            if not following and i < len(word):
+                # Only dropping the final character can still match
+                edits.add(left + right[1:])
+                break
+            if right:
+                edits.add(left + right[1:])
+            if len(right) > 1:
+                edits.add(left + right[1] + right[0] + right[2:])
+            for ch in following:
+                if right:
+                    edits.add(left + ch + right[1:])
+                edits.add(left + ch + right)
+        edits.discard(word)
+        return edits
+
+    def lookup(self, query, k=8, types=None):
+        """
+        Return the top suggestions for what the user has typed so far.
+
+        Args:
+            query (str): The partial text.
+            k (int): Maximum number of suggestions.
+            types (set, optional): Only return these suggestion types.
+
+        Returns:
+            list: (text, type, payload, fuzzy) tuples, best first.
+        """
+        self.refresh()
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        # One reference for the whole lookup; a concurrent rebuild swaps in a new index
+        index = self._index
+        scan = max(k * 8, 64)
+        candidates = {}
+
+        def collect(matches, fuzzy):
+            for key, (rank, entry) in matches:
+                text, kind, payload = entry
+                if types and kind not in types:
+                    continue
+                identity = (kind, payload.get('id', text))
+                score = (fuzzy, rank, key != prefix, TYPE_ORDER.get(kind, 9), len(text), text)
+                if identity not in candidates or score < candidates[identity][0]:
+                    candidates[identity] = (score, text, kind, payload)
+
+        collect(self._prefix(index, prefix, scan), 0)
+        if len(candidates) < k and len(prefix) >= MIN_FUZZY_LENGTH:
+            for variant in self._edits(index[0], prefix):
+                collect(self._prefix(index, variant, k * 2), 1)
+
+        best = sorted(candidates.values(), key=lambda c: c[0])[:k]
+        return [(text, kind, payload, bool(score[0])) for score, text, kind, payload in best]
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,283 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import current_app
+
+from models import db, Attraction
+from utils.clustering import project
+from utils.content_version import content_versions
+
+logger = logging.getLogger(__name__)
+
+EMPTY_TILE = b'{"type":"FeatureCollection","features":[]}'
+
+# "{y}.{digest}.geojson": a content-addressed copy of a tile
+HASHED_TILE = re.compile(r'^(?P<y>\d+)\.(?P<digest>[0-9a-f]{16})\.geojson$')
+
+
+def tiles_folder():
+    """Return the folder the attraction tiles are written to (inside static/ by default)."""
+    return current_app.config.get('TILES_FOLDER') or os.path.join(current_app.static_folder, 'tiles', 'attractions')
+
+
+def zoom_range():
+    """Return the (min, max) zoom levels tiles are generated for."""
+    return current_app.config.get('TILE_MIN_ZOOM', 10), current_app.config.get('TILE_MAX_ZOOM', 16)
+
+
+def tile_for(lat, lng, zoom):
+    """Return the (x, y) tile containing a point at a zoom level."""
+    tiles = 2 ** zoom
+    x, y = project(lat, lng)
+    return min(int(x * tiles), tiles - 1), min(int(y * tiles), tiles - 1)
+
+
+def _feature(row):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [row.lng, row.lat]},
+        'properties': {
+            'id': row.id,
+            'name': row.name,
+            'category': row.category,
+            'barangay': row.barangay,
+            'image': row.image_url
+        }
+    }
+
+
+def _encode(obj):
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+EMPTY_MANIFEST = {'content_version': None, 'zooms': None, 'tiles': {}, 'points': {}, 'superseded': {}}
+
+# (file identity, parsed manifest), replaced as a whole so readers never see a mix
+_manifest_cache = (None, None)
+_manifest_lock = threading.Lock()
+
+
+def load_manifest():
+    """
+    Return the current tile manifest, or an empty one if tiles were never built.
+
+    The parsed manifest is kept in memory and only read again once the
+    file changes (after a rebuild by this or another process), so serving
+    a tile does not re-parse the per-attraction `points` map. Callers must
+    not modify the returned dict.
+    """
+    global _manifest_cache
+    path = os.path.join(tiles_folder(), 'manifest.json')
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return EMPTY_MANIFEST
+    key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached_key, manifest = _manifest_cache
+    if cached_key == key:
+        return manifest
+
+    with _manifest_lock:
+        cached_key, manifest = _manifest_cache
+        if cached_key == key:
+            return manifest
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return EMPTY_MANIFEST
+        _manifest_cache = (key, manifest)
+    return manifest
+
+
+def prune_tiles(tiles, superseded, grace_seconds=None):
+    """
+    Delete hashed tile files that were superseded more than a grace period ago.
+
+    Every edit writes tiles under a new content hash; the old files are
+    kept for a while because clients holding an older manifest (or a CDN)
+    may still request them. The grace period runs from when a file stopped
+    being current, as recorded in the manifest's `superseded` map; a stray
+    file the map does not know about is added to it and kept as well.
+
+    Args:
+        tiles (dict): The manifest's "z/x/y" -> current digest map.
+        superseded (dict): "z/x/y.digest" -> Unix time it was replaced;
+            updated in place.
+        grace_seconds (int, optional): How long superseded files are kept
+            (default `TILE_PRUNE_GRACE_SECONDS`).
+
+    Returns:
+        int: Number of files deleted.
+    """
+    if grace_seconds is None:
+        grace_seconds = current_app.config.get('TILE_PRUNE_GRACE_SECONDS', 86400)
+    folder = tiles_folder()
+    now = int(time.time())
+    pruned = 0
+    seen = set()
+    for dirpath, _, filenames in os.walk(folder):
+        relative = os.path.relpath(dirpath, folder).replace(os.sep, '/')
+        for filename in filenames:
+            match = HASHED_TILE.match(filename)
+            if not match:
+                continue
+            name = f"{relative}/{match.group('y')}"
+            if tiles.get(name) == match.group('digest'):
+                continue
+            key = f"{name}.{match.group('digest')}"
+            seen.add(key)
+            if superseded.setdefault(key, now) > now - grace_seconds:
+                continue
+            try:
+                os.remove(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            del superseded[key]
+            pruned += 1
+    # Entries whose file is already gone
+    for key in set(superseded) - seen:
+        del superseded[key]
+    return pruned
+
+
+def build_tiles(full=False):
+    """
+    Write z/x/y GeoJSON tiles of the approved attractions.
+
+    Each tile is written twice: `{z}/{x}/{y}.geojson` (always the latest)
+    and `{z}/{x}/{y}.{hash}.geojson`, named by a hash of its content so it
+    can be cached forever. `manifest.json` maps every non-empty tile to
+    its current hash, records a fingerprint of each attraction and when
+    each older hash was superseded.
+
+    Unless `full` is set, only the tiles that contain an attraction whose
+    fingerprint changed (at its old or new position) are rewritten.
+
+    Hashed files superseded more than `TILE_PRUNE_GRACE_SECONDS` ago
+    are deleted afterwards (see prune_tiles()).
+
+    Args:
+        full (bool): Rewrite every tile and drop files of tiles that are gone.
+
+    Returns:
+        dict: Number of 'written' and 'removed' tiles and 'pruned' files.
+    """
+    folder = tiles_folder()
+    min_zoom, max_zoom = zoom_range()
+    version = content_versions.get('attraction')
+    manifest = load_manifest()
+    if manifest.get('zooms') != [min_zoom, max_zoom]:
+        full = True
+
+    rows = db.session.query(
+        Attraction.id, Attraction.name, Attraction.category, Attraction.barangay,
+        Attraction.lat, Attraction.lng, Attraction.image_url
+    ).filter(Attraction.status == 'approved').order_by(Attraction.id).all()
+
+    features = {}
+    points = {}
+    for row in rows:
+        feature = _feature(row)
+        features[row.id] = feature
+        points[str(row.id)] = [row.lat, row.lng, hashlib.sha1(_encode(feature)).hexdigest()[:12]]
+
+    old_points = manifest.get('points', {})
+    if full:
+        touched_points = [p[:2] for p in points.values()] + [p[:2] for p in old_points.values()]
+    else:
+        touched_points = []
+        for key in set(points) | set(old_points):
+            old, new = old_points.get(key), points.get(key)
+            if old != new:
+                touched_points.extend(p[:2] for p in (old, new) if p)
+
+    touched = set()
+    for lat, lng in touched_points:
+        for zoom in range(min_zoom, max_zoom + 1):
+            touched.add((zoom,) + tile_for(lat, lng, zoom))
+
+    contents = {}
+    for row in rows:
+        for zoom in range(min_zoom, max_zoom + 1):
+            key = (zoom,) + tile_for(row.lat, row.lng, zoom)
+            if key in touched:
+                contents.setdefault(key, []).append(features[row.id])
+
+    tiles = {} if full else dict(manifest.get('tiles', {}))
+    written = removed = 0
+    for zoom, x, y in touched:
+        name = f"{zoom}/{x}/{y}"
+        tile_features = contents.get((zoom, x, y))
+        if not tile_features:
+            if tiles.pop(name, None) is not None or full:
+                latest = os.path.join(folder, f"{name}.geojson")
+                if os.path.exists(latest):
+                    os.remove(latest)
+                    removed += 1
+            continue
+        data = _encode({'type': 'FeatureCollection', 'features': tile_features})
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        if tiles.get(name) == digest and os.path.exists(os.path.join(folder, f"{name}.{digest}.geojson")):
+            continue
+        _write_atomic(os.path.join(folder, f"{name}.{digest}.geojson"), data)
+        _write_atomic(os.path.join(folder, f"{name}.geojson"), data)
+        tiles[name] = digest
+        written += 1
+
+    now = int(time.time())
+    superseded = dict(manifest.get('superseded', {}))
+    for name, digest in manifest.get('tiles', {}).items():
+        if tiles.get(name) != digest:
+            superseded.setdefault(f"{name}.{digest}", now)
+    pruned = prune_tiles(tiles, superseded)
+
+    _write_atomic(os.path.join(folder, 'manifest.json'), _encode({
+        'content_version': version,
+        'zooms': [min_zoom, max_zoom],
+        'tiles': tiles,
+        'points': points,
+        'superseded': superseded
+    }))
+
+    print(f"=== TILES: {written} tiles written, {removed} removed, {pruned} old files pruned ===")
+    logger.info(f"Attraction tiles rebuilt: {written} written, {removed} removed, {pruned} pruned ({len(tiles)} total)")
+    return {'written': written, 'removed': removed, 'pruned': pruned}
+
+
+_build_lock = threading.Lock()
+
+
+def ensure_fresh():
+    """
+    Bring the tiles up to date if attractions changed since the last build.
+
+    Returns:
+        dict: The current manifest.
+    """
+    def is_fresh(manifest):
+        return manifest.get('content_version') == content_versions.get('attraction') \
+            and manifest.get('zooms') == list(zoom_range())
+
+    manifest = load_manifest()
+    if is_fresh(manifest):
+        return manifest
+    with _build_lock:
+        manifest = load_manifest()
+        if not is_fresh(manifest):
+            build_tiles()
+            manifest = load_manifest()
+    return manifest
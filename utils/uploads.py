@@ -0,0 +1,573 @@
+import atexit
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, request, url_for
+from sqlalchemy import func, union_all
+
+from models import db, Attraction, Event, GalleryItem
+from utils.content_version import content_versions
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; uploads are then stored as-is
+    Image = None
+    ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'wmv'}
+
+# Formats Pillow re-encodes into width variants (GIFs may be animated and are left alone)
+RESIZABLE_FORMATS = {'JPEG', 'PNG', 'WEBP', 'MPO'}
+
+# Subfolder of UPLOAD_FOLDER holding the variants and their manifests
+VARIANTS_DIR = 'variants'
+
+# Content tag bumped when variants of an upload become available
+MEDIA_TAG = 'media'
+
+UPLOAD_URL_PREFIX = '/static/uploads/'
+
+# Stored uploads are named by the SHA-256 of their content and sharded by its
+# first two byte pairs: uploads/ab/cd/abcd...ef.jpg (variants mirror the layout)
+HASHED_PATH = re.compile(r'^(?:variants/)?[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+(?:-\d+w\.[a-z]+)?$')
+
+# Model columns holding upload URLs; a stored file is live while any row points at it
+URL_COLUMNS = (Attraction.image_url, Event.image_url, GalleryItem.url,
+               GalleryItem.poster_url, GalleryItem.rendition_url)
+
+ONE_YEAR = 31536000
+
+TEMP_PREFIX = '.incoming-'
+
+
+def allowed_file(filename):
+    """
+    Check if a file has an allowed extension.
+
+    Args:
+        filename: The name of the file to check.
+
+    Returns:
+        bool: True if the file extension is allowed, False otherwise.
+    """
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def is_video(filename):
+    """Return True if the file name has a video extension."""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in VIDEO_EXTENSIONS
+
+
+def upload_folder(app=None):
+    """Return the absolute upload folder (`UPLOAD_FOLDER`, relative to the app root)."""
+    app = app or current_app
+    return os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
+
+
+def relative_path(url):
+    """
+    Return the path of an upload URL relative to the upload folder.
+
+    Args:
+        url (str): A URL as stored on a model.
+
+    Returns:
+        str: e.g. 'ab/cd/<hash>.jpg', or None for external URLs, variants
+        and anything that would escape the upload folder.
+    """
+    if not url or not url.startswith(UPLOAD_URL_PREFIX):
+        return None
+    path = url[len(UPLOAD_URL_PREFIX):]
+    parts = path.split('/')
+    if not path or parts[0] == VARIANTS_DIR or any(p in ('', '.', '..') or p.startswith('.') for p in parts):
+        return None
+    return path
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_file(path, extension):
+    """
+    Move a finished upload into content-addressed storage.
+
+    EXIF metadata is stripped first (see ImagePipeline.prepare), so the
+    name is the hash of exactly the bytes that will be served and the
+    file never changes afterwards. If a file with that hash is already
+    stored the new copy is dropped and the existing one reused; otherwise
+    its variants are queued on the pipeline's worker threads.
+
+    Args:
+        path (str): Temporary file; it is moved or deleted.
+        extension (str): File extension, e.g. 'jpg'.
+
+    Returns:
+        str: The public URL of the stored file.
+    """
+    extension = extension.lower()
+    if extension == 'jpeg':
+        extension = 'jpg'
+    if not is_video('.' + extension):
+        image_pipeline.prepare(path)
+
+    digest = _file_digest(path)
+    relpath = f"{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+    target = os.path.join(upload_folder(), relpath)
+    if os.path.exists(target):
+        os.remove(path)
+        # Refresh the mtime so the garbage collector's grace period restarts
+        os.utime(target)
+        print(f"=== UPLOAD: Duplicate of {relpath}, reusing stored file ===")
+        logger.info(f"Upload deduplicated: {relpath}")
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.chmod(path, 0o644)
+        shutil.move(path, target)
+        print(f"=== UPLOAD: Stored {relpath} ===")
+        logger.info(f"Upload stored: {relpath}")
+    if not is_video(relpath) and not image_pipeline.has_manifest(relpath):
+        image_pipeline.submit(target)
+    return url_for('static', filename='uploads/' + relpath)
+
+
+def save_upload(file):
+    """
+    Store an uploaded file and queue its image variants.
+
+    The request returns as soon as the file is stored; resizing and
+    re-encoding happen on the pipeline's worker threads (see ImagePipeline).
+
+    Args:
+        file: The werkzeug FileStorage from request.files.
+
+    Returns:
+        str: The public URL of the stored file.
+    """
+    folder = upload_folder()
+    os.makedirs(folder, exist_ok=True)
+    extension = file.filename.rsplit('.', 1)[1]
+    fd, tmp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            file.save(f)
+        return store_file(tmp_path, extension)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def reference_counts():
+    """
+    Count the rows pointing at each stored upload, in one query.
+
+    Returns:
+        dict: Path relative to the upload folder -> number of references.
+    """
+    urls = union_all(*(
+        db.select(column.label('url')).where(column.like(UPLOAD_URL_PREFIX + '%'))
+        for column in URL_COLUMNS
+    )).subquery()
+    counts = {}
+    for url, count in db.session.execute(db.select(urls.c.url, func.count()).group_by(urls.c.url)):
+        relpath = relative_path(url)
+        if relpath:
+            counts[relpath] = counts.get(relpath, 0) + count
+    return counts
+
+
+def stored_files(folder):
+    """Yield the paths (relative to `folder`) of every original in the upload folder."""
+    for root, dirs, files in os.walk(folder):
+        if root == folder:
+            dirs[:] = [d for d in dirs if d != VARIANTS_DIR]
+        for name in files:
+            if not name.startswith('.'):
+                yield os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/')
+
+
+def collect_garbage(grace_seconds=86400, dry_run=False):
+    """
+    Delete stored uploads that no Attraction, Event or GalleryItem references.
+
+    Files are only removed once they are older than `grace_seconds`, so an
+    upload whose row has not been committed yet (or a form the user is
+    still filling in) is never lost. Variants and manifests go with their
+    original; leftover temporary files of aborted uploads are removed too.
+
+    Args:
+        grace_seconds (int): Minimum age of an unreferenced file.
+        dry_run (bool): Only report what would be deleted.
+
+    Returns:
+        dict: 'removed' files, 'bytes' freed, 'kept' referenced files and
+        'recent' unreferenced files inside the grace period.
+    """
+    folder = upload_folder()
+    result = {'removed': 0, 'bytes': 0, 'kept': 0, 'recent': 0}
+    if not os.path.isdir(folder):
+        return result
+    references = reference_counts()
+    cutoff = time.time() - grace_seconds
+
+    for relpath in list(stored_files(folder)):
+        if references.get(relpath):
+            result['kept'] += 1
+            continue
+        path = os.path.join(folder, relpath)
+        stat = os.stat(path)
+        if stat.st_mtime > cutoff:
+            result['recent'] += 1
+            continue
+        result['removed'] += 1
+        result['bytes'] += stat.st_size + image_pipeline.variants_size(relpath)
+        if not dry_run:
+            image_pipeline.remove_variants(relpath)
+            os.remove(path)
+        logger.info(f"Upload {'would be ' if dry_run else ''}removed: {relpath}")
+
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.startswith(TEMP_PREFIX) and os.stat(path).st_mtime <= cutoff and not dry_run:
+            os.remove(path)
+
+    if not dry_run:
+        # Drop shard folders left empty
+        for root, dirs, files in os.walk(folder, topdown=False):
+            if root != folder and not os.listdir(root) and os.path.basename(root) != VARIANTS_DIR:
+                os.rmdir(root)
+
+    print(f"=== UPLOADS GC: {result['removed']} removed, {result['kept']} referenced, {result['recent']} recent ===")
+    logger.info(f"Upload garbage collection ({'dry run' if dry_run else 'applied'}): {result}")
+    return result
+
+
+def _strip_metadata(img, path):
+    """
+    Rewrite an original without its EXIF block (GPS position, camera serials).
+
+    The EXIF orientation is applied to the pixels first so the image does
+    not turn sideways once the tag is gone. JPEGs that need no rotation
+    keep their compressed data (quality='keep') to avoid a lossy re-encode.
+    """
+    if not img.info.get('exif') or img.format not in RESIZABLE_FORMATS:
+        return img
+    orientation = img.getexif().get(0x0112, 1)
+    rotated = ImageOps.exif_transpose(img) if orientation != 1 else img
+    options = {'icc_profile': img.info.get('icc_profile')}
+    if img.format in ('JPEG', 'MPO'):
+        options['quality'] = 'keep' if rotated is img else 90
+        fmt = 'JPEG'
+    else:
+        fmt = img.format
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    rotated.save(tmp_path, fmt, **{k: v for k, v in options.items() if v is not None})
+    os.replace(tmp_path, path)
+    return rotated
+
+
+def _flatten(img):
+    """Return an RGB copy of the image, compositing transparency onto white (for JPEG)."""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def _cache_headers(response):
+    """Mark content-addressed uploads and their variants as immutable for a year."""
+    if request.endpoint == 'static' and response.status_code in (200, 206, 304) and request.view_args:
+        filename = request.view_args.get('filename', '')
+        if filename.startswith('uploads/') and HASHED_PATH.match(filename[len('uploads/'):]):
+            # Flask's static view sends no-cache by default (SEND_FILE_MAX_AGE_DEFAULT)
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = ONE_YEAR
+            response.cache_control.immutable = True
+    return response
+
+
+class ImagePipeline:
+    """
+    Background generation of responsive image variants for uploads.
+
+    For every uploaded image a worker thread writes a WebP and a JPEG copy
+    at each configured width below the original's (and at the original
+    width, capped at the largest configured one), and records the original
+    size and the variants in a JSON manifest under
+    `<UPLOAD_FOLDER>/variants/`. Templates read the manifests through
+    `image_variants()` to emit `srcset`/`sizes`; until a manifest exists
+    the original is shown.
+
+    Config:
+        IMAGE_VARIANT_WIDTHS (tuple): Variant widths in pixels.
+        IMAGE_WEBP_QUALITY, IMAGE_JPEG_QUALITY (int): Encoder quality.
+        UPLOAD_WORKERS (int): Worker threads per process.
+        UPLOAD_PROCESS_ASYNC (bool): False processes images inside the
+            request (for hosts that freeze background threads).
+
+    Without Pillow installed uploads are stored unchanged and no variants
+    are generated.
+    """
+
+    def __init__(self, app=None):
+        self.folder = None
+        self.widths = (320, 640, 1024, 1600)
+        self.webp_quality = 80
+        self.jpeg_quality = 82
+        self.workers = 2
+        self.run_async = True
+        self.processed = 0
+        self.failed = 0
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._manifests = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the pipeline, register the `image_variants` template
+        helper and the cache headers of content-addressed uploads.
+
+        Args:
+            app: The Flask application.
+        """
+        self.folder = upload_folder(app)
+        self.widths = tuple(sorted(app.config.get('IMAGE_VARIANT_WIDTHS', self.widths)))
+        self.webp_quality = app.config.get('IMAGE_WEBP_QUALITY', 80)
+        self.jpeg_quality = app.config.get('IMAGE_JPEG_QUALITY', 82)
+        self.workers = app.config.get('UPLOAD_WORKERS', 2)
+        self.run_async = app.config.get('UPLOAD_PROCESS_ASYNC', True)
+        app.add_template_global(self.variants, 'image_variants')
+        app.after_request(_cache_headers)
+        app.extensions['image_pipeline'] = self
+        atexit.register(self.shutdown)
+        if Image is None:
+            logger.warning("Pillow is not installed; uploaded images are stored without variants")
+
+    @property
+    def available(self):
+        """True if Pillow is installed."""
+        return Image is not None
+
+    def _pool(self):
+        # Worker threads do not survive a fork, so each worker process gets its own pool
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-pipeline')
+                self._pid = os.getpid()
+            return self._executor
+
+    def prepare(self, path):
+        """
+        Strip EXIF metadata from an upload before it is stored.
+
+        Runs in the request so the stored file, and the hash it is named
+        by, never change afterwards. Only JPEGs with a rotation tag are
+        re-encoded; other files are left alone or rewritten losslessly.
+
+        Args:
+            path (str): The uploaded file.
+        """
+        if not self.available:
+            return
+        try:
+            img = Image.open(path)
+            img.load()
+        except (OSError, Image.DecompressionBombError):
+            return
+        _strip_metadata(img, path)
+
+    def submit(self, path):
+        """
+        Queue an uploaded image for processing.
+
+        Args:
+            path (str): Absolute path of the original in the upload folder.
+        """
+        if not self.available:
+            return
+        if self.run_async:
+            self._pool().submit(self._run, path)
+        else:
+            self._run(path)
+
+    def _run(self, path):
+        try:
+            if self.process(path) is not None:
+                content_versions.bump(MEDIA_TAG)
+        except Exception as e:
+            self.failed += 1
+            print(f"=== IMAGE PIPELINE: Failed to process {os.path.basename(path)}: {e} ===")
+            logger.exception(f"Image processing failed for {path}")
+
+    def _manifest_path(self, relpath):
+        return os.path.join(self.folder, VARIANTS_DIR, relpath + '.json')
+
+    def has_manifest(self, relpath):
+        """Return True if variants of the upload at `relpath` have been generated."""
+        return os.path.exists(self._manifest_path(relpath))
+
+    def _variant_files(self, relpath):
+        pattern = os.path.join(self.folder, VARIANTS_DIR, glob.escape(relpath))
+        return glob.glob(pattern + '-*w.*') + glob.glob(pattern + '.json')
+
+    def variants_size(self, relpath):
+        """Return the bytes used by the variants and manifest of an upload."""
+        return sum(os.path.getsize(p) for p in self._variant_files(relpath))
+
+    def remove_variants(self, relpath):
+        """Delete the variants and manifest of an upload."""
+        for path in self._variant_files(relpath):
+            os.remove(path)
+
+    def process(self, path):
+        """
+        Strip metadata from an original and write its variants and manifest.
+
+        Args:
+            path (str): Absolute path of the original in the upload folder.
+
+        Returns:
+            dict: The manifest, or None if the file is not an image Pillow can read.
+        """
+        relpath = os.path.relpath(path, self.folder).replace(os.sep, '/')
+        try:
+            img = Image.open(path)
+            img.load()
+        except (OSError, Image.DecompressionBombError) as e:
+            logger.warning(f"Not processing {relpath}: {e}")
+            return None
+
+        fmt = img.format
+        # No-op for new uploads; strips files stored before prepare() existed
+        img = _strip_metadata(img, path)
+        width, height = img.size
+        manifest = {'width': width, 'height': height, 'variants': []}
+
+        if fmt in RESIZABLE_FORMATS:
+            out_dir = os.path.dirname(self._manifest_path(relpath))
+            os.makedirs(out_dir, exist_ok=True)
+            # Every configured width below the original, plus the original
+            # size itself (capped at the largest width) as the top candidate
+            targets = [w for w in self.widths if w < width]
+            targets.append(min(width, self.widths[-1]))
+            for target in sorted(set(targets)):
+                if target == width:
+                    resized = img
+                else:
+                    resized = img.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+                variant = {'width': target}
+                for ext, save in (('webp', self._save_webp), ('jpg', self._save_jpeg)):
+                    name = f"{relpath}-{target}w.{ext}"
+                    save(resized, os.path.join(self.folder, VARIANTS_DIR, name))
+                    variant[ext] = name
+                manifest['variants'].append(variant)
+
+        manifest_path = self._manifest_path(relpath)
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+        self.processed += 1
+        print(f"=== IMAGE PIPELINE: {relpath} {width}x{height}, {len(manifest['variants'])} variants ===")
+        logger.info(f"Image variants generated for {relpath}: {[v['width'] for v in manifest['variants']]}")
+        return manifest
+
+    def _save_webp(self, img, path):
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+        img.save(path, 'WEBP', quality=self.webp_quality, method=4)
+
+    def _save_jpeg(self, img, path):
+        _flatten(img).save(path, 'JPEG', quality=self.jpeg_quality, optimize=True, progressive=True)
+
+    def variants(self, url):
+        """
+        Return the responsive image data of an uploaded image, for templates.
+
+        Args:
+            url (str): The image URL as stored on the model.
+
+        Returns:
+            dict: 'width' and 'height' of the original plus 'webp' and
+            'jpeg' srcset strings (empty for formats that get no variants,
+            e.g. GIF), or None if the URL is not a processed upload.
+        """
+        relpath = relative_path(url)
+        if relpath is None or self.folder is None:
+            return None
+        path = self._manifest_path(relpath)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        cached = self._manifests.get(relpath)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        base = UPLOAD_URL_PREFIX + VARIANTS_DIR + '/'
+        data = {
+            'width': manifest['width'],
+            'height': manifest['height'],
+            'webp': ', '.join(f"{base}{v['webp']} {v['width']}w" for v in manifest['variants']),
+            'jpeg': ', '.join(f"{base}{v['jpg']} {v['width']}w" for v in manifest['variants']),
+        }
+        self._manifests[relpath] = (mtime, data)
+        return data
+
+    def uploads(self, pending_only=True):
+        """
+        Return the paths of uploaded images in the upload folder.
+
+        Args:
+            pending_only (bool): Only images that have no manifest yet
+                (uploaded before the pipeline existed, or that failed).
+
+        Returns:
+            list: Absolute paths.
+        """
+        if self.folder is None or not os.path.isdir(self.folder):
+            return []
+        return [
+            os.path.join(self.folder, relpath) for relpath in sorted(stored_files(self.folder))
+            if not is_video(relpath) and not (pending_only and self.has_manifest(relpath))
+        ]
+
+    def shutdown(self):
+        """Wait for queued images to finish (called at interpreter exit)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=True)
+
+
+image_pipeline = ImagePipeline()
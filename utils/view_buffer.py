@@ -0,0 +1,196 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+
+from models import db, PageView
+from utils.analytics import apply_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class ViewBuffer:
+    """
+    In-process buffer for PageView rows.
+
+    Page views are queued in memory and written by a background flusher
+    thread as a single multi-row INSERT, either when `VIEW_BUFFER_BATCH_SIZE`
+    events are waiting or every `VIEW_BUFFER_FLUSH_MS` milliseconds,
+    whichever comes first. The queue is bounded by `VIEW_BUFFER_SIZE`; when
+    it is full new events are dropped and counted instead of blocking the
+    request. Remaining events are flushed at interpreter shutdown. Each
+    batch also updates the PageViewRollup counts in the same transaction.
+
+    Set `VIEW_BUFFER_ENABLED` to False to write every view synchronously
+    (useful on hosts that freeze background threads between requests).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.max_size = 10000
+        self.batch_size = 200
+        self.flush_interval = 2.0
+        self.dropped = 0
+        self.flushed = 0
+        self.batches = 0
+        self._queue = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the buffer from the application config.
+
+        Args:
+            app: The Flask application.
+        """
+        self.app = app
+        self.enabled = app.config.get('VIEW_BUFFER_ENABLED', True)
+        self.max_size = app.config.get('VIEW_BUFFER_SIZE', 10000)
+        self.batch_size = app.config.get('VIEW_BUFFER_BATCH_SIZE', 200)
+        self.flush_interval = app.config.get('VIEW_BUFFER_FLUSH_MS', 2000) / 1000.0
+        self._queue = queue.Queue(maxsize=self.max_size)
+        app.extensions['view_buffer'] = self
+        atexit.register(self.shutdown)
+
+    def record(self, view_type, item_id=None, page_name=None, user_id=None):
+        """
+        Queue a page view for the next batch write.
+
+        Args:
+            view_type (str): 'attraction', 'event' or 'page'.
+            item_id (int, optional): ID of the viewed item.
+            page_name (str, optional): Name of the viewed page.
+            user_id (int, optional): ID of the logged in user.
+
+        Returns:
+            bool: True if the view was accepted, False if it was dropped.
+        """
+        row = {
+            'view_type': view_type,
+            'item_id': item_id,
+            'page_name': page_name,
+            'user_id': user_id,
+            'timestamp': datetime.utcnow()
+        }
+
+        if not self.enabled:
+            self._write([row])
+            return True
+
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"View buffer full, {dropped} page views dropped so far")
+            return False
+
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        """
+        Write every queued page view to the database.
+
+        Returns:
+            int: Number of rows written.
+        """
+        if self._queue is None:
+            return 0
+
+        written = 0
+        with self._flush_lock:
+            while True:
+                rows = []
+                while len(rows) < self.batch_size:
+                    try:
+                        rows.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not rows:
+                    break
+                if self._write(rows):
+                    written += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+        return written
+
+    def stats(self):
+        """
+        Return buffer counters for monitoring.
+
+        Returns:
+            dict: queued, flushed, batches and dropped counts.
+        """
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'flushed': self.flushed,
+            'batches': self.batches,
+            'dropped': self.dropped
+        }
+
+    def shutdown(self):
+        """Stop the flusher thread and write whatever is still queued."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=max(self.flush_interval * 2, 5))
+        self.flush()
+
+    def _write(self, rows):
+        """Insert a batch of rows in one transaction, counting failures as drops."""
+        with self.app.app_context():
+            try:
+                db.session.execute(PageView.__table__.insert(), rows)
+                apply_rollups(rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                with self._lock:
+                    self.dropped += len(rows)
+                print(f"Error recording views: {e}")
+                logger.error(f"Failed to write {len(rows)} buffered page views: {e}")
+                return False
+        with self._lock:
+            self.flushed += len(rows)
+            self.batches += 1
+        return True
+
+    def _ensure_worker(self):
+        """Start the flusher thread lazily, and again after a fork."""
+        pid = os.getpid()
+        if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+                return
+            self._pid = pid
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='view-buffer-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"View buffer flush failed: {e}")
+
+
+view_buffer = ViewBuffer()